@@ -3,17 +3,27 @@ import os
 import pandas as pd
 import json, re
 import html
+import uuid
+import altair as alt
 
 from logic.db_ops import (
-    insert_contacts,
+    bulk_insert_contacts,
     ingest_lancedb,
     search_lancedb,
+    get_contact_summaries,
     add_to_queue,
-    fetch_queue,
+    page_queue,
+    predraft_queue,
 )
 from logic.exa_search import run_exa
-from logic.llm_ops import draft_outreach, chat_refine
+from logic.llm_ops import chat_refine_stream, draft_outreach_stream
+from logic.draft_cache import get_cached_draft, store_draft, OUTREACH_PURPOSE
 from logic.email_ops import gmail_send_email
+from logic.retention import start_maintenance_scheduler
+from logic.db_models import init_db
+from logic.resilience import CircuitOpenError
+from logic import telemetry, rate_limit, resilience
+from logic.embeddings import cache_stats
 
 
 # -------------------------------------------------------
@@ -47,6 +57,30 @@ st.set_page_config(page_title="Agent Carter", layout="wide")
 st.title("🕵️ Agent Carter — Networking Assistant")
 
 
+# Create tables / apply schema migrations once per server process
+@st.cache_resource
+def _database():
+    return init_db()
+
+_database()
+
+
+# One archival thread per server process (not per session)
+@st.cache_resource
+def _maintenance_thread():
+    return start_maintenance_scheduler()
+
+_maintenance_thread()
+
+
+# Prometheus /metrics endpoint when METRICS_PORT is set (once per process)
+@st.cache_resource
+def _metrics_server():
+    return telemetry.start_metrics_server() if telemetry.METRICS_PORT else None
+
+_metrics_server()
+
+
 # -------------------------------------------------------
 # MULTI-USER SUPPORT
 # -------------------------------------------------------
@@ -76,6 +110,14 @@ if "updated_email_body" not in st.session_state:
 if "updated_dm_text" not in st.session_state:
     st.session_state.updated_dm_text = None
 
+# Tags this session's request traces (the debug panel shows only those)
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+# Cursors of the queue pages visited so far (None = first page)
+if "queue_cursors" not in st.session_state:
+    st.session_state.queue_cursors = [None]
+
 
 # -------------------------------------------------------
 # LAYOUT
@@ -100,12 +142,19 @@ with left:
         else:
             safe_query = sanitize_text(query)
 
-            with st.spinner("Searching for candidates"):
+            with st.spinner("Searching for candidates"), \
+                    telemetry.span("app.search", session_id=st.session_state.session_id):
 
                 profiles = run_exa(safe_query)
-                insert_contacts(profiles, user_id=st.session_state.user_id)
+                new_ids = bulk_insert_contacts(profiles, user_id=st.session_state.user_id)
 
-                ingest_lancedb(user_id=st.session_state.user_id)
+                # Only new contacts need embedding; search re-syncs if stale
+                if new_ids:
+                    try:
+                        ingest_lancedb(user_id=st.session_state.user_id)
+                    except (CircuitOpenError, TimeoutError) as e:
+                        # Search still covers the vectors already stored
+                        telemetry.log("search.ingest_skipped", level="warning", error=str(e))
 
                 df = search_lancedb(safe_query, user_id=st.session_state.user_id, n=10)
                 st.session_state.search_results = df
@@ -145,6 +194,11 @@ with left:
                     st.caption("" if headline in (None, "None") else headline)
                     st.link_button("Open LinkedIn", linkedin)
 
+                    # Summary text is only read (and decompressed) when opened
+                    if st.toggle("Profile summary", key=f"summary_{idx}"):
+                        summaries = get_contact_summaries([row["id"]], user_id=st.session_state.user_id)
+                        st.write(sanitize_text(summaries.get(str(row["id"]), "")) or "No summary.")
+
                     colA, colB = st.columns(2)
 
                     with colA:
@@ -200,9 +254,28 @@ with right:
         if candidate.get("linkedin"):
             st.link_button("LinkedIn", candidate["linkedin"])
 
-        # Generate outreach
-        with st.spinner("Generating drafts…"):
-            raw = draft_outreach("networking outreach", candidate)
+        # Generate outreach (cached per candidate; reruns don't call the LLM)
+        regenerate = st.button("🔄 Regenerate drafts", key="regenerate_drafts")
+        if regenerate:
+            st.session_state.updated_dm_text = None
+            st.session_state.updated_email_body = None
+
+        raw = None if regenerate else get_cached_draft(OUTREACH_PURPOSE, candidate)
+        if raw is None:
+            # Stream fields into a placeholder as they arrive, then cache
+            preview = st.empty()
+            try:
+                for raw in draft_outreach_stream(OUTREACH_PURPOSE, candidate):
+                    preview.markdown(
+                        "\n".join(f"- {r}" for r in raw["reason"])
+                        + f"\n\n**DM:** {raw['drafted_dm']}\n\n**Email:** {raw['email_body']}"
+                    )
+            except (CircuitOpenError, TimeoutError):
+                raw = None
+                st.warning("Drafting is temporarily unavailable. Try Regenerate in a moment.")
+            preview.empty()
+            if raw is not None:
+                store_draft(OUTREACH_PURPOSE, candidate, raw)
 
         drafts = parse_outreach(raw)
 
@@ -233,7 +306,8 @@ with right:
             if not recipient_email:
                 st.error("Enter a valid email address.")
             else:
-                with st.spinner("Sending via Gmail…"):
+                with st.spinner("Sending via Gmail…"), \
+                        telemetry.span("app.send_email", session_id=st.session_state.session_id):
                     try:
                         gmail_send_email(
                             to_email=recipient_email,
@@ -270,23 +344,26 @@ with right:
         if st.button("Send to Carter", use_container_width=True, key="refine_button"):
             safe_q = sanitize_text(user_question)
 
-            with st.spinner("Thinking…"):
-                reply = chat_refine(
-                    safe_q,
-                    {
-                        "name": candidate["name"],
-                        "headline": candidate["headline"],
-                        "linkedin": candidate["linkedin"],
-                        "dm": dm_text,
-                        "email_subject": email_subject,
-                        "email_body": email_body,
-                        "tone": tone,
-                    }
-                )
-
-            st.session_state.chat_history.append(("user", user_question))
-            st.session_state.chat_history.append(("bot", reply))
-            st.rerun()
+            try:
+                with st.chat_message("assistant"):
+                    reply = st.write_stream(chat_refine_stream(
+                        safe_q,
+                        {
+                            "name": candidate["name"],
+                            "headline": candidate["headline"],
+                            "linkedin": candidate["linkedin"],
+                            "dm": dm_text,
+                            "email_subject": email_subject,
+                            "email_body": email_body,
+                            "tone": tone,
+                        }
+                    ))
+            except (CircuitOpenError, TimeoutError):
+                st.warning("Carter is temporarily unavailable. Please try again shortly.")
+            else:
+                st.session_state.chat_history.append(("user", user_question))
+                st.session_state.chat_history.append(("bot", reply))
+                st.rerun()
 
         # CHAT HISTORY
         if st.session_state.chat_history:
@@ -327,11 +404,25 @@ with right:
 st.divider()
 st.header("🗂️ Queue")
 
-rows = fetch_queue(user_id=st.session_state.user_id, limit=10)
+QUEUE_PAGE_SIZE = 10
+
+rows, next_cursor = page_queue(
+    user_id=st.session_state.user_id,
+    cursor=st.session_state.queue_cursors[-1],
+    limit=QUEUE_PAGE_SIZE,
+)
 
 if not rows:
     st.write("Queue is empty.")
 else:
+    st.caption(f"Page {len(st.session_state.queue_cursors)}")
+
+    if st.button("✍️ Pre-draft queue", key="queue_predraft"):
+        with st.spinner("Drafting queued candidates…"), \
+                telemetry.span("app.predraft", session_id=st.session_state.session_id):
+            res = predraft_queue(st.session_state.user_id)
+        st.success(f"Drafted {res['drafted']} candidates" + (f", {res['failed']} failed." if res["failed"] else "."))
+
     for r in rows:
         with st.container():
             st.markdown(f"**{r.full_name}**")
@@ -345,3 +436,58 @@ else:
                     "linkedin": r.linkedin_url,
                 }
                 st.rerun()
+
+colPrev, colNext = st.columns(2)
+
+with colPrev:
+    if len(st.session_state.queue_cursors) > 1 and st.button("◀ Previous", key="queue_prev", use_container_width=True):
+        st.session_state.queue_cursors.pop()
+        st.rerun()
+
+with colNext:
+    if next_cursor and st.button("Next ▶", key="queue_next", use_container_width=True):
+        st.session_state.queue_cursors.append(next_cursor)
+        st.rerun()
+
+
+# -------------------------------------------------------
+# DEBUG PANEL (latency waterfall of the last request)
+# -------------------------------------------------------
+def _waterfall(trace):
+    spans = pd.DataFrame(trace["spans"])
+    spans["duration_ms"] = spans["duration_ms"].fillna(0)
+    spans["end_ms"] = spans["start_ms"] + spans["duration_ms"]
+    spans["stage"] = [f"{i + 1:02d} {'· ' * d}{n}" for i, (d, n) in enumerate(zip(spans["depth"], spans["name"]))]
+    spans["details"] = spans["attrs"].map(lambda a: json.dumps(a, default=str) if a else "")
+    spans["status"] = spans["error"].fillna("ok")
+    return alt.Chart(spans).mark_bar().encode(
+        x=alt.X("start_ms:Q", title="ms since request start"),
+        x2="end_ms:Q",
+        y=alt.Y("stage:N", sort=None, title=None),
+        color=alt.Color("status:N", legend=None),
+        tooltip=["name", "duration_ms", "details", "status"],
+    )
+
+
+if st.sidebar.checkbox("Debug panel", value=os.getenv("DEBUG_PANEL") == "1"):
+    st.divider()
+    st.header("🐞 Debug")
+
+    # Other sessions' traces share this process; never show those
+    recent = telemetry.recent_traces(limit=1, session_id=st.session_state.session_id)
+    trace = recent[0] if recent else None
+
+    if trace is None:
+        st.write("No requests traced yet.")
+    else:
+        st.caption(f"{trace['name']} · {trace['duration_ms']} ms · trace {trace['trace_id']}")
+        st.altair_chart(_waterfall(trace), use_container_width=True)
+
+    with st.expander("Counters, rate limits and circuit breakers"):
+        st.json({
+            "counters": telemetry.counters(),
+            "latency": telemetry.latency_stats(),
+            "rate_limit": rate_limit.metrics(),
+            "resilience": resilience.stats(),
+            "embedding_cache": cache_stats(),
+        })
@@ -0,0 +1,279 @@
+# Scaling benchmark for the contact → vector → search pipeline.
+#
+#   python benchmark.py                                  # 1k, 10k, 100k, 1M
+#   python benchmark.py --scales 1000,10000 --out bench/$(git rev-parse --short HEAD).json
+#   python benchmark.py --compare bench/old.json bench/new.json
+#
+# Each scale runs in its own subprocess against a throwaway SQLite file,
+# Lance directory and embedding cache, with the deterministic "hash"
+# embedder (no network, no model), so timings only reflect this code.
+# Peak RSS is the subprocess's high-water mark after each stage.
+# --compare exits with status 1 when a stage got slower than --threshold.
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+DEFAULT_SCALES = [1_000, 10_000, 100_000, 1_000_000]
+BENCH_USER = "bench_user"
+INSERT_BATCH = 10_000
+QUEUE_ROWS = 10_000          # queue size is capped; it doesn't grow with contacts
+SEARCH_QUERIES = 20
+REPEAT = 20
+PREPARE_REPEAT = 5
+# Stages faster than this are noise, not regressions
+MIN_COMPARE_SECONDS = 0.005
+
+FIRST_NAMES = ["Ada", "Ben", "Chen", "Dana", "Eli", "Fatima", "Gabe", "Hana", "Ivan", "Jo",
+               "Kofi", "Lena", "Mateo", "Nia", "Omar", "Priya", "Quinn", "Rosa", "Sam", "Tariq"]
+LAST_NAMES = ["Adams", "Brooks", "Costa", "Diaz", "Evans", "Fischer", "Garcia", "Huang", "Ito", "Jones",
+              "Khan", "Lopez", "Müller", "Nguyen", "Okafor", "Patel", "Rossi", "Smith", "Tanaka", "Weber"]
+ROLES = ["product manager", "software engineer", "data scientist", "designer", "founder",
+         "recruiter", "sales lead", "marketing director", "investor", "consultant"]
+INDUSTRIES = ["fintech", "healthcare", "climate", "edtech", "gaming", "logistics",
+              "retail", "biotech", "security", "media"]
+VOCAB = ["strategy", "growth", "analytics", "leadership", "startup", "enterprise", "platform",
+         "mobile", "cloud", "machine", "learning", "payments", "research", "operations", "brand",
+         "customers", "scaling", "teams", "mentoring", "open", "source", "python", "design",
+         "systems", "hiring", "partnerships", "revenue", "experiments", "roadmap", "community"]
+
+
+# ---------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------
+
+def synthetic_profiles(start, count, seed=0):
+    """Deterministic fake profiles; profile i is the same in every run."""
+    out = []
+    for i in range(start, start + count):
+        rng = random.Random(seed * 10_000_019 + i)
+        role, industry = rng.choice(ROLES), rng.choice(INDUSTRIES)
+        words = " ".join(rng.choice(VOCAB) for _ in range(40))
+        out.append({
+            "full_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "linkedin_url": f"https://www.linkedin.com/in/bench-{i:07d}",
+            "headline": f"{role.title()} at a {industry} company",
+            "text": f"{role} in {industry} with {rng.randint(1, 30)} years of experience. {words}",
+        })
+    return out
+
+
+def search_queries(n):
+    rng = random.Random(42)
+    return [f"{rng.choice(ROLES)} in {rng.choice(INDUSTRIES)} {rng.choice(VOCAB)}" for _ in range(n)]
+
+
+# ---------------------------------------------------------
+# Measurement helpers
+# ---------------------------------------------------------
+
+def peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def timed(fn, repeat=1):
+    """Run fn `repeat` times → {"seconds": median, "p95", "runs"}."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {
+        "seconds": round(_percentile(samples, 50), 6),
+        "p95": round(_percentile(samples, 95), 6),
+        "runs": repeat,
+    }
+
+
+# ---------------------------------------------------------
+# One scale (runs in a child process)
+# ---------------------------------------------------------
+
+def run_scale(n, workdir):
+    """Build an n-contact dataset in `workdir` and time the hot paths."""
+    os.environ.update({
+        "AGENT_CARTER_DB_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "LANCE_DB_DIR": os.path.join(workdir, "lance"),
+        "EMBED_CACHE_PATH": os.path.join(workdir, "embedding_cache.db"),
+        "EMBED_BACKEND": "hash",
+        "QUERY_CACHE_PERSIST": "0",
+    })
+    # Clients are built at import time but never called
+    os.environ.setdefault("OPENAI_API_KEY", "unused")
+    # Imported here: the settings above are read at import time
+    from sqlalchemy import insert
+    from logic import db_ops
+    from logic.db_models import session_scope, DailyQueue, init_db
+    from logic.embeddings import get_contacts_table
+
+    init_db()
+
+    stages = {}
+
+    def record(name, result):
+        result["peak_rss_mb"] = peak_rss_mb()
+        stages[name] = result
+
+    def insert_all():
+        for start in range(0, n, INSERT_BATCH):
+            db_ops.insert_contacts(synthetic_profiles(start, min(INSERT_BATCH, n - start)), BENCH_USER)
+
+    record("insert_contacts", timed(insert_all))
+    record("ingest_lancedb", timed(lambda: db_ops.ingest_lancedb(user_id=BENCH_USER)))
+    record("ingest_lancedb_noop", timed(lambda: db_ops.ingest_lancedb(user_id=BENCH_USER)))
+
+    tbl = get_contacts_table(user_id=BENCH_USER)
+    record("is_stale_lancedb", timed(lambda: db_ops.is_stale_lancedb(tbl, user_id=BENCH_USER), REPEAT))
+
+    queries = iter(search_queries(SEARCH_QUERIES))
+    record("search_lancedb", timed(
+        lambda: db_ops.search_lancedb(next(queries), user_id=BENCH_USER, n=10), SEARCH_QUERIES))
+
+    queue = [
+        {
+            "user_id": BENCH_USER,
+            "linkedin_url": p["linkedin_url"],
+            "full_name": p["full_name"],
+            "headline": p["headline"],
+            "reason": "Relevant experience",
+            "drafted_dm": f"Hi {p['full_name']}, would love to connect.",
+            "email_subject": "Connecting",
+            "drafted_email": "Hi,\n\nWould you be open to a quick chat?\n\nBest,",
+            "draft_purpose": db_ops.DEFAULT_PURPOSE,
+            "added_at": datetime.now(timezone.utc),
+            "sent": False,
+        }
+        for p in synthetic_profiles(0, min(n, QUEUE_ROWS))
+    ]
+    with session_scope() as s:
+        s.execute(insert(DailyQueue), queue)
+
+    record("fetch_queue", timed(lambda: db_ops.fetch_queue(BENCH_USER, limit=20), REPEAT))
+    record("prepare_today_from_queue", timed(
+        lambda: db_ops.prepare_today_from_queue(BENCH_USER, "bench@example.com", overwrite=True),
+        PREPARE_REPEAT))
+
+    return {"contacts": n, "stages": stages, "peak_rss_mb": peak_rss_mb()}
+
+
+# ---------------------------------------------------------
+# Driver
+# ---------------------------------------------------------
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmark(scales, verbose=False):
+    """Run every scale in a fresh subprocess; returns the results document."""
+    results = {
+        "commit": _git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "embed_backend": "hash",
+        "scales": {},
+    }
+    for n in scales:
+        workdir = tempfile.mkdtemp(prefix=f"agent_carter_bench_{n}_")
+        try:
+            print(f"[Bench] {n:,} contacts …", flush=True)
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", str(n), "--workdir", workdir],
+                check=True,
+                stdout=None if verbose else subprocess.DEVNULL,
+                env=dict(os.environ, LANCEDB_LOG=os.getenv("LANCEDB_LOG", "info" if verbose else "error")),
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+            )
+            with open(os.path.join(workdir, "result.json")) as f:
+                results["scales"][str(n)] = json.load(f)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        for stage, r in results["scales"][str(n)]["stages"].items():
+            print(f"    {stage:<26} {r['seconds'] * 1000:>10.1f} ms   peak {r['peak_rss_mb']:>8.1f} MB")
+    return results
+
+
+def compare(old, new, threshold=0.2):
+    """
+    Stage-by-stage comparison of two results documents. Returns
+    (rows, regressions); a regression is a stage more than `threshold`
+    slower (median) at the same scale.
+    """
+    rows, regressions = [], []
+    for scale, new_scale in new["scales"].items():
+        old_scale = old["scales"].get(scale)
+        if not old_scale:
+            continue
+        for stage, r in new_scale["stages"].items():
+            before = old_scale["stages"].get(stage)
+            if not before:
+                continue
+            ratio = r["seconds"] / before["seconds"] if before["seconds"] else float("inf")
+            row = (int(scale), stage, before["seconds"], r["seconds"], ratio)
+            rows.append(row)
+            if ratio > 1 + threshold and r["seconds"] >= MIN_COMPARE_SECONDS:
+                regressions.append(row)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scaling benchmark for the contact → vector → search pipeline")
+    parser.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)),
+                        help="comma-separated contact counts")
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown (0.2 = 20%%)")
+    parser.add_argument("--verbose", action="store_true", help="show the app's own log output")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        result = run_scale(args.child, args.workdir)
+        with open(os.path.join(args.workdir, "result.json"), "w") as f:
+            json.dump(result, f)
+        return 0
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        rows, regressions = compare(old, new, args.threshold)
+        for scale, stage, before, after, ratio in rows:
+            flag = "  ← REGRESSION" if (scale, stage, before, after, ratio) in regressions else ""
+            print(f"{scale:>9,}  {stage:<26} {before * 1000:>10.1f} → {after * 1000:>10.1f} ms  x{ratio:.2f}{flag}")
+        return 1 if regressions else 0
+
+    results = run_benchmark([int(s) for s in args.scales.split(",") if s.strip()], args.verbose)
+    out_dir = os.path.dirname(args.out)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"[Bench] Results written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
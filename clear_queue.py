@@ -1,5 +1,6 @@
-from logic.db_models import SessionLocal, DailyQueue
+from logic.db_models import SessionLocal, DailyQueue, init_db
 
+init_db()
 s = SessionLocal()
 s.query(DailyQueue).delete()
 s.commit()
@@ -0,0 +1,79 @@
+# logic/db_config.py
+import os
+from sqlalchemy import create_engine, event
+
+DB_URL = os.getenv("AGENT_CARTER_DB_URL", "sqlite:///agent_carter.db")
+
+# Connections kept open per process / extra connections allowed under bursts
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# Seconds a writer waits for the SQLite lock before "database is locked"
+BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "30"))
+
+# Applied to every new SQLite connection
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",        # readers never block the single writer
+    "synchronous": "NORMAL",      # safe with WAL, far fewer fsyncs than FULL
+    "cache_size": -64000,         # 64 MB page cache (negative = KiB)
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": int(BUSY_TIMEOUT * 1000),
+}
+
+
+def _is_file_sqlite(url: str) -> bool:
+    return url.startswith("sqlite") and ":memory:" not in url and not url.rstrip("/").endswith(":")
+
+
+def make_engine(url: str = None, pool_size: int = None, **kwargs):
+    """
+    Create an engine for `url` (default: AGENT_CARTER_DB_URL). File-backed
+    SQLite databases get WAL mode, a busy timeout, the tuning pragmas above
+    and a sized connection pool that Streamlit threads can share.
+    """
+    url = url or DB_URL
+    if not _is_file_sqlite(url):
+        return create_engine(url, **kwargs)
+
+    engine = create_engine(
+        url,
+        connect_args={"timeout": BUSY_TIMEOUT, "check_same_thread": False},
+        pool_size=pool_size or POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        **kwargs,
+    )
+    _install_pragmas(engine)
+    return engine
+
+
+def make_async_engine(url: str = None, pool_size: int = None, **kwargs):
+    """
+    Async counterpart of make_engine on the aiosqlite driver, with the same
+    pragmas and pool sizing.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = url or DB_URL
+    if url.startswith("sqlite:"):
+        url = "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if not _is_file_sqlite(url):
+        return create_async_engine(url, **kwargs)
+
+    engine = create_async_engine(
+        url,
+        connect_args={"timeout": BUSY_TIMEOUT},
+        pool_size=pool_size or POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        **kwargs,
+    )
+    _install_pragmas(engine.sync_engine)
+    return engine
+
+
+def _install_pragmas(engine):
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cur.execute(f"PRAGMA {name}={value}")
+        cur.close()
@@ -1,11 +1,34 @@
 # logic/db_models.py
-from sqlalchemy import Column, Integer, String, Text, DateTime, UniqueConstraint, Boolean, create_engine
+from contextlib import contextmanager
+from sqlalchemy import Column, Integer, String, Text, DateTime, UniqueConstraint, Boolean, Index, LargeBinary, event
 from sqlalchemy.orm import declarative_base, sessionmaker
 
-ENGINE = create_engine("sqlite:///agent_carter.db")
+from logic.db_config import make_engine
+from logic.migrations import run_migrations
+from logic.summary_codec import codec as summary_codec
+from logic.embedding_cache import text_hash
+
+ENGINE = make_engine()
 SessionLocal = sessionmaker(bind=ENGINE)
 Base = declarative_base()
 
+
+@contextmanager
+def session_scope():
+    """
+    Transactional session: commits on success, rolls back on error, always
+    closes. Objects stay readable after the block (no expire on commit).
+    """
+    s = SessionLocal(expire_on_commit=False)
+    try:
+        yield s
+        s.commit()
+    except Exception:
+        s.rollback()
+        raise
+    finally:
+        s.close()
+
 class Contact(Base):
     __tablename__ = "contacts"
 
@@ -14,27 +37,71 @@ class Contact(Base):
     full_name = Column(String)
     linkedin_url = Column(String)
     headline = Column(String)
-    profile_summary = Column(String)
+    # zstd frame, see logic.summary_codec; read/write via profile_summary
+    profile_summary_z = Column(LargeBinary)
     first_seen_at = Column(DateTime)
+    # contact_content_hash of the fields above, kept current on insert/update
+    content_hash = Column(String(64))
+    # Set when the row has to be (re-)embedded into Lance; ingest clears it
+    lance_pending = Column(Boolean, default=True, nullable=False)
 
     __table_args__ = (
         UniqueConstraint('linkedin_url', 'user_id', name='uq_linkedin_user'),
+        Index("ix_contacts_user_pending", "user_id", "lance_pending"),
     )
 
+    @property
+    def profile_summary(self):
+        return summary_codec.decompress(self.profile_summary_z)
+
+    @profile_summary.setter
+    def profile_summary(self, text):
+        self.profile_summary_z = summary_codec.compress(text)
+
+
+def contact_content_hash(full_name, headline, linkedin_url, summary):
+    """Hash of every field that ends up in the contact's Lance row."""
+    return text_hash("\x1f".join([full_name or "", headline or "", linkedin_url or "", summary or ""]))
+
+
+def _hash_contact(contact):
+    return contact_content_hash(contact.full_name, contact.headline, contact.linkedin_url, contact.profile_summary)
+
+
+@event.listens_for(Contact, "before_insert")
+def _contact_inserted(mapper, connection, contact):
+    contact.content_hash = _hash_contact(contact)
+    contact.lance_pending = True
+
+
+@event.listens_for(Contact, "before_update")
+def _contact_updated(mapper, connection, contact):
+    h = _hash_contact(contact)
+    if h != contact.content_hash:
+        contact.content_hash = h
+        contact.lance_pending = True
+
 
 class DailyQueue(Base):
     __tablename__ = "daily_queue"
     id = Column(Integer, primary_key=True)
-    linkedin_url = Column(String(500), unique=True)
+    linkedin_url = Column(String(500))
     full_name = Column(String(255))
     headline = Column(String(700))
     reason = Column(Text)
     drafted_dm = Column(Text)
-    drafted_email = Column(Text)
+    drafted_email = Column(Text)    # email body; subject in email_subject
+    email_subject = Column(Text)
+    draft_purpose = Column(Text)    # query the stored draft was written for
     added_at = Column(DateTime)
     sent = Column(Boolean, default=False)
     user_id = Column(String, index=True)
 
+    __table_args__ = (
+        Index("uq_daily_queue_user_linkedin", "user_id", "linkedin_url", unique=True),
+        Index("ix_daily_queue_user_sent_added", "user_id", "sent", "added_at"),
+    )
+
 class Outbox(Base):
     __tablename__ = "outbox"
     id = Column(Integer, primary_key=True)
@@ -55,4 +122,118 @@ class Outbox(Base):
     sent = Column(Boolean, default=False)
     user_id = Column(String, index=True)
 
-Base.metadata.create_all(ENGINE)
+    __table_args__ = (
+        Index("uq_outbox_user_day", "user_id", "day", unique=True),
+    )
+
+
+# ---------------------------------------------------------
+# Archive (cold) tables — see logic.retention
+# ---------------------------------------------------------
+
+class DailyQueueArchive(Base):
+    """
+    Sent queue rows moved out of daily_queue. source_id is the row's old
+    daily_queue id; SQLite reuses freed rowids, so it is not unique.
+    """
+    __tablename__ = "daily_queue_archive"
+    id = Column(Integer, primary_key=True)
+    source_id = Column(Integer)
+    linkedin_url = Column(String(500))
+    full_name = Column(String(255))
+    headline = Column(String(700))
+    reason = Column(Text)
+    drafted_dm = Column(Text)
+    drafted_email = Column(Text)
+    email_subject = Column(Text)
+    draft_purpose = Column(Text)
+    added_at = Column(DateTime)
+    sent = Column(Boolean, default=True)
+    user_id = Column(String)
+    archived_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_daily_queue_archive_user_added", "user_id", "added_at"),
+        # add_to_queue's duplicate check
+        Index("ix_daily_queue_archive_user_linkedin", "user_id", "linkedin_url"),
+    )
+
+
+class OutboxArchive(Base):
+    """Past outbox days moved out of outbox; source_id is the old outbox id."""
+    __tablename__ = "outbox_archive"
+    id = Column(Integer, primary_key=True)
+    source_id = Column(Integer)
+    day = Column(String(10))
+    email_to = Column(String(320))
+    query = Column(Text)
+    source = Column(String(32))
+    linkedin_url = Column(String(500))
+    full_name = Column(String(255))
+    headline = Column(String(700))
+    summary = Column(Text)
+    match_pct = Column(Integer)
+    reason = Column(Text)
+    drafted_dm = Column(Text)
+    email_subject = Column(Text)
+    email_body = Column(Text)
+    created_at = Column(DateTime)
+    sent = Column(Boolean, default=False)
+    user_id = Column(String)
+    archived_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_outbox_archive_user_day", "user_id", "day"),
+    )
+
+
+class DraftCache(Base):
+    """draft_outreach results keyed by logic.draft_cache.draft_cache_key."""
+    __tablename__ = "draft_cache"
+    cache_key = Column(String(64), primary_key=True)
+    purpose = Column(Text)
+    linkedin_url = Column(String(500))
+    prompt_version = Column(String(16))
+    model = Column(String(64))
+    payload = Column(Text)          # JSON: reason, drafted_dm, email_subject, email_body
+    created_at = Column(DateTime)
+
+
+class CompressionDict(Base):
+    """Shared zstd dictionaries for contact summaries (logic.summary_codec)."""
+    __tablename__ = "compression_dicts"
+    dict_id = Column(Integer, primary_key=True, autoincrement=False)
+    data = Column(LargeBinary)
+    created_at = Column(DateTime)
+
+
+class VectorIndexState(Base):
+    """ANN index bookkeeping for one LanceDB table."""
+    __tablename__ = "vector_index_state"
+    table_name = Column(String, primary_key=True)
+    indexed_rows = Column(Integer, default=0)
+    num_partitions = Column(Integer)
+    num_sub_vectors = Column(Integer)
+    built_at = Column(DateTime)
+
+
+class LanceFreshness(Base):
+    """What a LanceDB table was last synced from, for cheap staleness checks."""
+    __tablename__ = "lance_freshness"
+    table_name = Column(String, primary_key=True)
+    row_count = Column(Integer)
+    max_contact_id = Column(Integer)
+    embed_model = Column(String)
+    table_version = Column(Integer)
+    updated_at = Column(DateTime)
+
+
+def init_db(engine=None):
+    """
+    Create missing tables and apply pending migrations; returns the schema
+    version. Called once at start-up (app, scripts, `python -m
+    logic.migrations`), never on import.
+    """
+    engine = engine or ENGINE
+    Base.metadata.create_all(engine)
+    return run_migrations(engine)
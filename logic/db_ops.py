@@ -1,15 +1,51 @@
 # logic/db_ops.py
 
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 import pyarrow as pa
 import numpy as np
-from lancedb import connect
-
-from logic.db_models import SessionLocal, Contact, DailyQueue, Outbox
-from logic.embeddings import embed, embed_query, get_contacts_table
-from logic.llm_ops import draft_outreach
-
-DB_DIR = "agent_carter_lancedb_streamlitcloud"
+from sqlalchemy import func, or_, update, bindparam
+
+from logic.db_models import session_scope, Contact, LanceFreshness, contact_content_hash
+from logic import telemetry
+from logic.telemetry import traced, span
+from logic import db_queries as queries
+from logic.embeddings import (
+    embed,
+    embed_query,
+    get_contacts_table,
+    contacts_table_name,
+    shared_table_name,
+    user_filter,
+    lancedb_schema,
+    EMBED_MODEL,
+    DB_DIR,
+)
+from logic.lance_store import get_registry
+from logic.summary_codec import codec as summary_codec
+from logic.rate_limit import BATCH
+from logic.resilience import CircuitOpenError
+from logic.draft_cache import cached_draft_outreach, OUTREACH_PURPOSE
+from logic.vector_index import (
+    ensure_vector_index, ensure_scalar_index, request_index, reset_index_state, apply_search_params,
+)
+
+
+# Contacts per SQL read / embedding call / Lance write during ingest
+INGEST_CHUNK_SIZE = 1000
+# Concurrent LLM calls / attempts per row in predraft_queue
+DRAFT_WORKERS = int(os.getenv("DRAFT_WORKERS", "4"))
+DRAFT_RETRIES = int(os.getenv("DRAFT_RETRIES", "3"))
+# Draft purpose when the queue is worked without a search query (the
+# outreach panel's, so its drafts are the ones the panel shows)
+DEFAULT_PURPOSE = OUTREACH_PURPOSE
+# Core table for executemany UPDATEs (ORM bulk updates only match on the key)
+CONTACTS = Contact.__table__
+# Columns returned by search_lancedb (no summary text, no vector)
+SEARCH_COLUMNS = ["id", "user_id", "meta"]
 
 
 # ---------------------------------------------------------
@@ -24,207 +60,425 @@ def today_key():
 # INSERT CONTACTS
 # ---------------------------------------------------------
 
-def insert_contacts(profiles, user_id: str):
-    s = SessionLocal()
-    new = 0
-    for p in profiles:
-        exists = (
-            s.query(Contact)
-            .filter(
-                Contact.linkedin_url == p["linkedin_url"],
-                Contact.user_id == user_id
-            )
-            .first()
-        )
-        if exists:
-            continue
+@traced
+def bulk_insert_contacts(profiles, user_id: str):
+    """
+    Insert scraped profiles for a user, skipping URLs the user already has
+    and duplicates within the batch. One IN (...) lookup and one
+    executemany INSERT ... ON CONFLICT DO NOTHING per chunk.
+    Returns the ids of the contacts actually inserted.
+    """
+    by_url = queries.dedupe_profiles(profiles)
+    new_ids = []
 
-        c = Contact(
-            user_id=user_id,
-            full_name=p.get("full_name", ""),
-            linkedin_url=p.get("linkedin_url", ""),
-            headline=p.get("headline", ""),
-            profile_summary=p.get("text", "") or p.get("summary", ""),
-            first_seen_at=datetime.now(timezone.utc),
-        )
+    with session_scope() as s:
+        for chunk in queries.url_chunks(list(by_url)):
+            existing = set(s.scalars(queries.existing_contact_urls(user_id, chunk)))
+            fresh = [url for url in chunk if url not in existing]
+            if fresh:
+                rows = queries.contact_rows(by_url, fresh, user_id)
+                new_ids.extend(s.scalars(queries.insert_contacts_returning_ids(), rows).all())
 
-        s.add(c)
-        new += 1
+    return new_ids
 
-    s.commit()
-    s.close()
-    return new
+
+def insert_contacts(profiles, user_id: str):
+    """Insert profiles for a user; returns how many were new."""
+    return len(bulk_insert_contacts(profiles, user_id))
 
 def count_contacts(user_id=None):
-    s = SessionLocal()
-    if user_id is None:
-        n = s.query(Contact).count()          # single-user mode
-    else:
-        n = s.query(Contact).filter(Contact.user_id == user_id).count()
-    s.close()
-    return n
+    with session_scope() as s:
+        return s.scalar(queries.count_contacts(user_id))
 
 # ---------------------------------------------------------
-# INGEST LANCEDB (Embedding fresh rebuild)
+# INGEST LANCEDB (delta upsert, or full rebuild)
 # ---------------------------------------------------------
 
-def ingest_lancedb(user_id=None):
-    print("\n========== INGEST LANCEDB START ==========")
-    print("User ID:", user_id)
+def _contact_hash(r):
+    """Recomputed content hash (the stored contacts.content_hash should match)."""
+    return contact_content_hash(r.full_name, r.headline, r.linkedin_url, r.profile_summary)
+
+
+def _read_columns(tbl, columns, where=None):
+    """Scan only the given columns of a Lance table, optionally filtered."""
+    q = tbl.search()
+    if where:
+        q = q.where(where)
+    return q.select(columns).limit(None).to_arrow()
+
+
+def _sql_in(values):
+    return ", ".join("'" + str(v).replace("'", "''") + "'" for v in values)
+
+
+def _and(where, pred):
+    return f"{where} AND {pred}" if where else pred
+
+
+def _iter_contact_chunks(user_id=None, chunk_size=None, since_id=None):
+    """
+    Yield contacts in id order, `chunk_size` at a time, using keyset
+    pagination so each chunk is a short query in its own session.
+    With `since_id`, only contacts with a higher id or a pending Lance
+    sync are read (index range + index lookup, not the user's whole set).
+    """
+    chunk_size = chunk_size or INGEST_CHUNK_SIZE
+    last_id = 0
+    while True:
+        with session_scope() as s:
+            q = s.query(Contact).filter(Contact.id > last_id)
+            if user_id:
+                q = q.filter(Contact.user_id == user_id)
+            if since_id is not None:
+                q = q.filter(or_(Contact.id > since_id, Contact.lance_pending == True))
+            chunk = q.order_by(Contact.id.asc()).limit(chunk_size).all()
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1].id
+
+
+def _mark_synced(rows):
+    """Clear lance_pending, unless the row changed again since it was read."""
+    with session_scope() as s:
+        s.execute(
+            update(CONTACTS)
+            .where(CONTACTS.c.id == bindparam("cid"), CONTACTS.c.content_hash == bindparam("h"))
+            .values(lance_pending=False),
+            [{"cid": r.id, "h": r.content_hash} for r in rows],
+        )
 
-    s = SessionLocal()
-    rows = (
-        s.query(Contact).filter(Contact.user_id == user_id).all()
-        if user_id else
-        s.query(Contact).all()
-    )
-    s.close()
 
-    print("[DEBUG] SQL rows fetched:", len(rows))
-    if not rows:
-        print("[LanceDB] No contacts to ingest for user:", user_id)
-        print("========== INGEST LANCEDB END ==========\n")
-        return
+def _vectors_to_arrow(vecs, list_type):
+    """Wrap a float32 (n, dim) matrix as a FixedSizeListArray without copying."""
+    flat = np.ascontiguousarray(vecs, dtype=np.float32).reshape(-1)
+    return pa.FixedSizeListArray.from_arrays(pa.array(flat, pa.float32()), list_type.list_size)
 
-    ids = [str(r.id) for r in rows]
-    docs = [r.profile_summary or "" for r in rows]
-    metas = [
-        {
-            "name": r.full_name,
-            "headline": r.headline,
-            "linkedin": r.linkedin_url,
-            "profile_summary": r.profile_summary or "",
-        }
-        for r in rows
-    ]
 
-    print("[DEBUG] First meta example:", metas[0] if metas else None)
+def _contacts_to_arrow(rows, tbl):
+    docs = [r.profile_summary or "" for r in rows]
+    meta_type = tbl.schema.field("meta").type
+    meta = pa.StructArray.from_arrays(
+        [
+            pa.array([r.full_name for r in rows], pa.string()),
+            pa.array([r.headline for r in rows], pa.string()),
+            pa.array([r.linkedin_url for r in rows], pa.string()),
+        ],
+        fields=list(meta_type),
+    )
 
     vecs = embed(docs)
-    print("[DEBUG] Embeddings shape:", vecs.shape)
 
-    tbl = get_contacts_table(user_id=user_id)
-    print("[DEBUG] Table after get_contacts_table:", tbl.name)
-
-    print("[DEBUG] Table schema:", tbl.schema)
-
-    arr = pa.Table.from_arrays(
+    return pa.Table.from_arrays(
         [
-            pa.array(ids, pa.string()),
+            pa.array([str(r.id) for r in rows], pa.string()),
+            pa.array([r.user_id for r in rows], pa.string()),
             pa.array(docs, pa.string()),
-            pa.array(metas, tbl.schema.field("meta").type),
-            pa.array(vecs.tolist(), tbl.schema.field("vector").type),
+            meta,
+            pa.array([r.content_hash or _contact_hash(r) for r in rows], pa.string()),
+            _vectors_to_arrow(vecs, tbl.schema.field("vector").type),
         ],
         schema=tbl.schema
     )
 
-    print("[DEBUG] Arrow table rows:", arr.num_rows)
 
-    print(f"[LanceDB] Ingesting {len(rows)} contacts into {tbl.name}")
-    tbl.add(arr, mode="overwrite")
+def _delete_gone(tbl, user_id, where):
+    """Drop Lance rows whose SQL contact was deleted; returns how many."""
+    with span("lancedb.scan_ids"):
+        lance_ids = _read_columns(tbl, ["id"], where)["id"].to_pylist()
+    with session_scope() as s:
+        q = s.query(Contact.id)
+        if user_id:
+            q = q.filter(Contact.user_id == user_id)
+        sql_ids = {str(i) for (i,) in q}
+    gone = [i for i in lance_ids if i not in sql_ids]
+    for i in range(0, len(gone), 500):
+        tbl.delete(_and(where, f"id IN ({_sql_in(gone[i:i + 500])})"))
+    return len(gone)
+
+
+@traced
+def ingest_lancedb(user_id=None, mode="delta", chunk_size=None):
+    """
+    Sync the user's Lance table with SQL contacts, streaming contacts from
+    SQL and writing to Lance `chunk_size` rows at a time.
+
+    mode="delta": read only contacts newer than the freshness record's
+    max_contact_id or marked lance_pending, embed the new or changed ones,
+    and delete rows whose SQL contact is gone (only looked for when the
+    counts say something was deleted). mode="full", no freshness record yet,
+    or a record written by another embedding model: re-embed and overwrite
+    (in the shared layout: replace only this user's rows). Returns {"added": n, "updated": n, "deleted": n}.
+    """
+    result = {"added": 0, "updated": 0, "deleted": 0}
+    tbl = get_contacts_table(user_id=user_id)
+    where = user_filter(user_id)
+
+    with session_scope() as s:
+        rec = s.get(LanceFreshness, _freshness_key(tbl, user_id))
+    # Vectors from another model can't be diffed row by row: re-embed all
+    model_changed = rec is not None and rec.embed_model != EMBED_MODEL
+    rebuild = mode == "full" or rec is None or model_changed
+    if model_changed:
+        telemetry.log("lancedb.model_changed", table=tbl.name, user_id=user_id,
+                      old=rec.embed_model, new=EMBED_MODEL)
+
+    first_chunk = True
+    since_id = None if rebuild else rec.max_contact_id or 0
+    for rows in _iter_contact_chunks(user_id, chunk_size, since_id):
+        if rebuild:
+            arr = _contacts_to_arrow(rows, tbl)
+            with span("lancedb.write", rows=len(rows), overwrite=first_chunk):
+                if first_chunk and where:
+                    tbl.delete(where)
+                    tbl.add(arr)
+                elif first_chunk:
+                    tbl.add(arr, mode="overwrite")
+                    reset_index_state(tbl.name)   # overwrite drops the ANN index
+                else:
+                    tbl.add(arr)
+            first_chunk = False
+            result["added"] += len(rows)
+            _mark_synced(rows)
+            continue
 
-    print("========== INGEST LANCEDB END ==========\n")
+        # Lance hashes for just this chunk's ids
+        ids = [str(r.id) for r in rows]
+        with span("lancedb.scan_hashes", rows=len(ids)):
+            cols = _read_columns(tbl, ["id", "content_hash"], _and(where, f"id IN ({_sql_in(ids)})"))
+        existing = dict(zip(cols["id"].to_pylist(), cols["content_hash"].to_pylist()))
+
+        new = [r for r in rows if str(r.id) not in existing]
+        changed = [r for r in rows if str(r.id) in existing and existing[str(r.id)] != r.content_hash]
+        upserts = changed + new
+        if upserts:
+            arr = _contacts_to_arrow(upserts, tbl)
+            with span("lancedb.write", rows=len(upserts)):
+                if changed:
+                    tbl.delete(_and(where, f"id IN ({_sql_in([str(r.id) for r in changed])})"))
+                tbl.add(arr)
+        result["added"] += len(new)
+        result["updated"] += len(changed)
+        _mark_synced(rows)
+
+    sql_count, sql_max_id = _sql_contact_stats(user_id)
+    if rebuild and first_chunk:
+        # No contacts left: a rebuild still has to drop what Lance holds
+        with span("lancedb.write", rows=0, overwrite=True):
+            tbl.delete(where or "true")
+        if not where:
+            reset_index_state(tbl.name)
+        telemetry.log("lancedb.ingest_empty", table=tbl.name, user_id=user_id)
+        _record_freshness(tbl, user_id, sql_count, sql_max_id)
+        return result
+
+    if not rebuild and rec.row_count + result["added"] > sql_count:
+        result["deleted"] = _delete_gone(tbl, user_id, where)
+
+    if result["added"] or result["updated"]:
+        # Built in the background; searches use the flat scan until it's ready
+        request_index(tbl, scalar_columns=("user_id",) if where else ())
+
+    telemetry.log("lancedb.ingested", table=tbl.name, user_id=user_id, mode=mode, **result)
+    _record_freshness(tbl, user_id, sql_count, sql_max_id)
+    return result
 
 # ---------------------------------------------------------
-# STALE DETECTION
+# STALE DETECTION (freshness record vs SQL metadata)
 # ---------------------------------------------------------
 
-def is_stale_lancedb(tbl):
-    df = tbl.to_pandas()
-    if len(df) < 5:
+def _freshness_key(tbl, user_id=None):
+    # The shared table holds many users → one record per (table, user)
+    return f"{tbl.name}:{user_id}" if user_filter(user_id) else tbl.name
+
+
+def _record_freshness(tbl, user_id, row_count: int, max_contact_id: int):
+    with session_scope() as s:
+        s.merge(LanceFreshness(
+            table_name=_freshness_key(tbl, user_id),
+            row_count=row_count,
+            max_contact_id=max_contact_id,
+            embed_model=EMBED_MODEL,
+            table_version=tbl.version,
+            updated_at=datetime.now(timezone.utc),
+        ))
+
+
+def _sql_contact_stats(user_id=None):
+    with session_scope() as s:
+        q = s.query(func.count(Contact.id), func.max(Contact.id))
+        if user_id:
+            q = q.filter(Contact.user_id == user_id)
+        count, max_id = q.one()
+    return count, max_id or 0
+
+
+def _has_pending(user_id=None):
+    with session_scope() as s:
+        q = s.query(Contact.id).filter(Contact.lance_pending == True)
+        if user_id:
+            q = q.filter(Contact.user_id == user_id)
+        return s.query(q.exists()).scalar()
+
+
+@traced
+def is_stale_lancedb(tbl, user_id=None):
+    """
+    A table is stale when its freshness record is missing or disagrees
+    with SQL (row count, max contact id, rows marked lance_pending), with
+    the active embedding model, or with the table's current version. In
+    the shared layout every user's write bumps the version, so only the
+    SQL side is compared.
+    """
+    with session_scope() as s:
+        rec = s.get(LanceFreshness, _freshness_key(tbl, user_id))
+    if rec is None or rec.embed_model != EMBED_MODEL:
         return True
 
-    # stale case: too many identical embeddings
-    if df["vector"].apply(lambda v: tuple(v)).nunique() < len(df) * 0.3:
+    if not user_filter(user_id) and rec.table_version != tbl.version:
         return True
 
-    return False
+    if (rec.row_count, rec.max_contact_id) != _sql_contact_stats(user_id):
+        return True
+    return _has_pending(user_id)
+
+
+@traced
+def audit_lancedb_vectors(user_id=None, min_unique_ratio: float = 0.3):
+    """
+    Slow consistency check, meant to run off the request path: recomputes
+    every contact's content hash and compares it with contacts.content_hash
+    and the Lance row. Rebuilds the table when too many embeddings are
+    identical; otherwise marks drifted contacts pending and re-syncs them.
+    Returns True if anything was re-synced.
+    """
+    tbl = get_contacts_table(user_id=user_id)
+    where = user_filter(user_id)
+    cols = _read_columns(tbl, ["id", "content_hash", "vector"], where)
+    n = cols.num_rows
+    if n == 0:
+        return False
 
+    dim = tbl.schema.field("vector").type.list_size
+    mat = cols["vector"].combine_chunks().flatten().to_numpy(zero_copy_only=False).reshape(-1, dim)
+    degenerate = len(np.unique(mat, axis=0)) < n * min_unique_ratio
 
-# ---------------------------------------------------------
-# SEARCH (multi-user)
-# ---------------------------------------------------------
+    lance = dict(zip(cols["id"].to_pylist(), cols["content_hash"].to_pylist()))
+    drifted = []
+    for rows in _iter_contact_chunks(user_id):
+        for r in rows:
+            h = _contact_hash(r)
+            if h != r.content_hash or lance.pop(str(r.id), None) != h:
+                drifted.append({"cid": r.id, "h": h})
+    drifted_count = len(drifted) + len(lance)   # leftovers: Lance rows without a contact
 
-def search_lancedb(query: str, user_id: str, n: int = 10):
-    vec = np.array(embed_query(query), dtype=np.float32)
-    db = connect(DB_DIR)
-    if user_id is None:
-        table_name = "contacts"
-    else:
-        table_name = f"{user_id}_contacts"
+    if not degenerate and not drifted_count:
+        return False
 
+    telemetry.log("lancedb.audit_failed", level="warning", table=tbl.name,
+                  degenerate=degenerate, drifted=drifted_count)
+    if drifted:
+        with session_scope() as s:
+            s.execute(
+                update(CONTACTS).where(CONTACTS.c.id == bindparam("cid"))
+                .values(content_hash=bindparam("h"), lance_pending=True),
+                drifted,
+            )
+    ingest_lancedb(user_id=user_id, mode="full" if degenerate else "delta")
+    if lance and not degenerate:
+        _delete_gone(tbl, user_id, where)
+    return True
 
-    # If missing: build table + index
-    if table_name not in db.table_names():
-        print("[LanceDB] Table missing → ingesting…")
-        ingest_lancedb(user_id=user_id)
 
-    # After ingest, check again
-    if table_name not in db.table_names():
-        raise RuntimeError(f"[LanceDB] Table {table_name} still missing after ingest!")
+def start_vector_audit(user_id=None):
+    """Run audit_lancedb_vectors in a daemon thread."""
+    t = threading.Thread(target=audit_lancedb_vectors, args=(user_id,), daemon=True)
+    t.start()
+    return t
 
-    tbl = db.open_table(table_name)
 
-    if is_stale_lancedb(tbl):
-        print("[LanceDB] Stale → rebuilding")
-        ingest_lancedb(user_id=user_id)
-        tbl = db.open_table(table_name)
+# ---------------------------------------------------------
+# SEARCH (multi-user)
+# ---------------------------------------------------------
 
-    return (
-        tbl.search(vec)
-           .metric("cosine")
-           .limit(n)
-           .to_pandas()
-    )
+@traced
+def search_lancedb(query: str, user_id: str, n: int = 10, nprobes: int = None, refine_factor: int = None):
+    """
+    Vector search over the user's contacts. `nprobes` / `refine_factor`
+    trade recall for latency once the table has an ANN index. If the query
+    cannot be embedded in time (OpenAI slow or its circuit open), falls
+    back to keyword_search_contacts; if only the stale re-sync fails, the
+    vectors already stored are searched.
+    """
+    try:
+        vec = np.array(embed_query(query), dtype=np.float32)
+    except (CircuitOpenError, TimeoutError) as e:
+        telemetry.log("search.keyword_fallback", level="warning", error=str(e))
+        return keyword_search_contacts(query, user_id, n)
 
+    # Missing tables are created empty; the freshness check then fills them
+    tbl = get_contacts_table(user_id=user_id)
 
-# ---------------------------------------------------------
-# Convert LanceDB row to candidate
-# ---------------------------------------------------------
+    if is_stale_lancedb(tbl, user_id=user_id):
+        telemetry.log("lancedb.stale", table=tbl.name, user_id=user_id)
+        try:
+            ingest_lancedb(user_id=user_id)
+        except (CircuitOpenError, TimeoutError) as e:
+            # Search the vectors we already have; nothing stored yet → keywords
+            telemetry.log("search.ingest_skipped", level="warning", error=str(e))
+            if tbl.count_rows() == 0:
+                return keyword_search_contacts(query, user_id, n)
+        tbl = get_contacts_table(user_id=user_id)
+
+    # Summaries stay out of the result payload → get_contact_summaries()
+    q = tbl.search(vec).metric("cosine").select(SEARCH_COLUMNS).limit(n)
+    where = user_filter(user_id)
+    if where:
+        q = q.where(where, prefilter=True)
+    with span("lancedb.query", n=n):
+        return apply_search_params(q, nprobes, refine_factor).to_pandas()
+
+
+@traced
+def keyword_search_contacts(query: str, user_id: str, n: int = 10):
+    """SQL name/headline match, shaped like search_lancedb results."""
+    with session_scope() as s:
+        rows = s.execute(queries.keyword_contacts(user_id, query, n)).all()
+    schema = lancedb_schema()
+    return pa.Table.from_pylist(
+        [
+            {
+                "id": str(r.id),
+                "user_id": r.user_id,
+                "meta": {"name": r.full_name, "headline": r.headline, "linkedin": r.linkedin_url},
+            }
+            for r in rows
+        ],
+        schema=pa.schema([schema.field(c) for c in SEARCH_COLUMNS]),
+    ).to_pandas()
 
-def _row_to_candidate(df_row):
-    meta = df_row.get("meta") or {}
-    return {
-        "name": meta.get("name", ""),
-        "headline": meta.get("headline", ""),
-        "linkedin": meta.get("linkedin", ""),
-        "summary": meta.get("profile_summary", "") or "",
-    }
+
+@traced
+def get_contact_summaries(ids, user_id: str):
+    """{contact id: full profile summary} for search results, fetched on demand."""
+    ids = [int(i) for i in ids]
+    if not ids:
+        return {}
+    with session_scope() as s:
+        rows = s.execute(queries.contact_summaries(user_id, ids)).all()
+    return {str(i): summary_codec.decompress(blob) for i, blob in rows}
 
 
 # ---------------------------------------------------------
 # ADD TO QUEUE (multi-user)
 # ---------------------------------------------------------
 
+@traced
 def add_to_queue(candidate: dict, user_id: str, reason: str = "", drafted_dm: str = "", drafted_email: str = ""):
-    s = SessionLocal()
-    exists = (
-        s.query(DailyQueue)
-        .filter(
-            DailyQueue.linkedin_url == candidate.get("linkedin", ""),
-            DailyQueue.user_id == user_id
-        )
-        .first()
-    )
-    if exists:
-        s.close()
-        return False
-
-    q = DailyQueue(
-        user_id=user_id,
-        linkedin_url=candidate.get("linkedin", ""),
-        full_name=candidate.get("name", ""),
-        headline=candidate.get("headline", ""),
-        reason=reason,
-        drafted_dm=drafted_dm,
-        drafted_email=drafted_email,
-        added_at=datetime.now(timezone.utc),
-        sent=False,
-    )
-
-    s.add(q)
-    s.commit()
-    s.close()
+    with session_scope() as s:
+        if s.scalar(queries.queue_entry_exists(user_id, candidate.get("linkedin", ""))):
+            return False
+        s.add(queries.new_queue_entry(candidate, user_id, reason, drafted_dm, drafted_email))
     return True
 
 
@@ -232,20 +486,24 @@ def add_to_queue(candidate: dict, user_id: str, reason: str = "", drafted_dm: st
 # FETCH QUEUE (multi-user)
 # ---------------------------------------------------------
 
+@traced
 def fetch_queue(user_id: str, limit: int = 20):
-    s = SessionLocal()
-    rows = (
-        s.query(DailyQueue)
-        .filter(
-            DailyQueue.user_id == user_id,
-            DailyQueue.sent == False,
-        )
-        .order_by(DailyQueue.added_at.asc())
-        .limit(limit)
-        .all()
-    )
-    s.close()
-    return rows
+    with session_scope() as s:
+        return s.scalars(queries.unsent_queue(user_id, limit)).all()
+
+
+@traced
+def page_queue(user_id: str, cursor: str = None, limit: int = 20, sent=False, added_from=None, added_to=None):
+    """
+    Keyset-paginated queue browsing. Returns (rows, next_cursor): rows are
+    lightweight (id, full_name, headline, linkedin_url, added_at, sent)
+    tuples and next_cursor is None on the last page. Each page costs one
+    index range scan, however deep it is.
+    """
+    after = queries.decode_cursor(cursor) if cursor else None
+    with session_scope() as s:
+        rows = s.execute(queries.queue_page(user_id, after, limit, sent, added_from, added_to)).all()
+    return queries.split_page(rows, limit)
 
 
 # ---------------------------------------------------------
@@ -253,67 +511,95 @@ def fetch_queue(user_id: str, limit: int = 20):
 # ---------------------------------------------------------
 
 def get_outbox_for_day(day: str, user_id: str):
-    s = SessionLocal()
-    row = (
-        s.query(Outbox)
-        .filter(
-            Outbox.day == day,
-            Outbox.user_id == user_id
-        )
-        .first()
-    )
-    s.close()
-    return row
+    with session_scope() as s:
+        return s.scalar(queries.outbox_for_day(day, user_id))
 
 
+@traced
 def upsert_outbox(day: str, payload: dict, user_id: str, overwrite: bool = False):
-    s = SessionLocal()
-    row = (
-        s.query(Outbox)
-        .filter(Outbox.day == day, Outbox.user_id == user_id)
-        .first()
-    )
-
-    if row and not overwrite:
-        s.close()
-        return row
-
-    if not row:
-        row = Outbox(day=day, user_id=user_id)
-
-    for k, v in payload.items():
-        setattr(row, k, v)
-
-    row.created_at = datetime.now(timezone.utc)
-    s.add(row)
-    s.commit()
-    s.refresh(row)
-    s.close()
-
+    with session_scope() as s:
+        row = s.scalar(queries.outbox_for_day(day, user_id))
+        if row and not overwrite:
+            return row
+        row = queries.apply_outbox_payload(row, day, payload, user_id)
+        s.add(row)
     return row
 
 
 def mark_outbox_sent(day: str, user_id: str):
-    s = SessionLocal()
-    row = (
-        s.query(Outbox)
-        .filter(
-            Outbox.day == day,
-            Outbox.user_id == user_id
-        )
-        .first()
-    )
-    if row:
-        row.sent = True
-        s.add(row)
-        s.commit()
-    s.close()
+    with session_scope() as s:
+        s.execute(queries.mark_outbox_sent(day, user_id))
 
 
 # ---------------------------------------------------------
 # PREPARE TODAY'S OUTREACH (multi-user)
 # ---------------------------------------------------------
 
+# ---------------------------------------------------------
+# BATCH PRE-DRAFTING (queue → stored drafts)
+# ---------------------------------------------------------
+
+def _queue_candidate(q):
+    return {
+        "name": q.full_name,
+        "headline": q.headline,
+        "linkedin": q.linkedin_url,
+        "summary": "",
+    }
+
+
+def _draft_with_retries(purpose: str, candidate: dict, retries: int = None):
+    """cached_draft_outreach with backoff; an empty DM counts as a failure."""
+    retries = DRAFT_RETRIES if retries is None else retries
+    for attempt in range(retries):
+        try:
+            drafts = cached_draft_outreach(purpose, candidate, refresh=attempt > 0, priority=BATCH)
+            if drafts.get("drafted_dm"):
+                return drafts
+            error = ValueError("empty draft")
+        except Exception as e:
+            error = e
+        if attempt < retries - 1:
+            time.sleep(2 ** attempt)
+    raise error
+
+
+@traced
+def predraft_queue(user_id: str, query: str = "", limit: int = 20, workers: int = None):
+    """
+    Draft up to `limit` unsent queue rows concurrently and store the drafts
+    on the rows, so prepare_today_from_queue with the same query needs no
+    LLM call. Rows already drafted for another query are re-drafted.
+    Returns {"drafted": n, "failed": n}.
+    """
+    purpose = query or DEFAULT_PURPOSE
+    with session_scope() as s:
+        rows = s.scalars(queries.undrafted_queue(user_id, purpose, limit)).all()
+
+    result = {"drafted": 0, "failed": 0}
+    if not rows:
+        return result
+
+    with ThreadPoolExecutor(max_workers=min(workers or DRAFT_WORKERS, len(rows))) as pool:
+        draft = telemetry.propagate(_draft_with_retries)
+        futures = {pool.submit(draft, purpose, _queue_candidate(q)): q for q in rows}
+        for fut in as_completed(futures):
+            q = futures[fut]
+            try:
+                drafts = fut.result()
+            except Exception as e:
+                telemetry.log("drafts.failed", level="warning", queue_id=q.id, error=str(e))
+                result["failed"] += 1
+                continue
+            with session_scope() as s:
+                s.execute(queries.store_queue_draft(q.id, drafts, purpose))
+            result["drafted"] += 1
+
+    telemetry.log("drafts.predrafted", user_id=user_id, **result)
+    return result
+
+
+@traced
 def prepare_today_from_queue(user_id: str, email_to: str, query: str = "", overwrite: bool = False):
     day = today_key()
 
@@ -321,30 +607,27 @@ def prepare_today_from_queue(user_id: str, email_to: str, query: str = "", overw
     if existing and not overwrite:
         return existing, "already_prepared"
 
-    # Fetch next unsent queue entry for THIS USER
-    s = SessionLocal()
-    q = (
-        s.query(DailyQueue)
-        .filter(
-            DailyQueue.user_id == user_id,
-            DailyQueue.sent == False
-        )
-        .order_by(DailyQueue.added_at.asc())
-        .first()
-    )
+    # Fetch next unsent queue entry for THIS USER (no session held open
+    # across the LLM call)
+    with session_scope() as s:
+        q = s.scalar(queries.unsent_queue(user_id, limit=1))
 
     if not q:
-        s.close()
         raise RuntimeError("Queue is empty. Add someone to the queue first.")
 
-    candidate = {
-        "name": q.full_name,
-        "headline": q.headline,
-        "linkedin": q.linkedin_url,
-        "summary": "",
-    }
+    candidate = _queue_candidate(q)
+    purpose = query or DEFAULT_PURPOSE
 
-    drafts = draft_outreach(query or "general networking", candidate)
+    # Rows pre-drafted (predraft_queue) for this query need no LLM call
+    if q.drafted_dm and q.draft_purpose == purpose:
+        drafts = {
+            "reason": q.reason or "",
+            "drafted_dm": q.drafted_dm,
+            "email_subject": q.email_subject or "",
+            "email_body": q.drafted_email or "",
+        }
+    else:
+        drafts = cached_draft_outreach(purpose, candidate)
 
     payload = {
         "email_to": email_to,
@@ -355,7 +638,7 @@ def prepare_today_from_queue(user_id: str, email_to: str, query: str = "", overw
         "headline": candidate["headline"],
         "summary": candidate["summary"],
         "match_pct": None,
-        "reason": drafts["reason"],
+        "reason": queries.reason_text(drafts["reason"]),
         "drafted_dm": drafts["drafted_dm"],
         "email_subject": drafts["email_subject"],
         "email_body": drafts["email_body"],
@@ -365,10 +648,8 @@ def prepare_today_from_queue(user_id: str, email_to: str, query: str = "", overw
     outbox = upsert_outbox(day, payload, user_id=user_id, overwrite=True)
 
     # mark queue row as sent
-    q.sent = True
-    s.add(q)
-    s.commit()
-    s.close()
+    with session_scope() as s:
+        s.execute(queries.mark_queue_sent(q.id))
 
     return outbox, "prepared_from_queue"
 
@@ -378,30 +659,109 @@ def prepare_today_from_queue(user_id: str, email_to: str, query: str = "", overw
 # LANCE DB STARTUP CHECK
 # ---------------------------------------------------------
 
+@traced
 def ensure_lancedb_ready():
-    db = connect(DB_DIR)
+    registry = get_registry(DB_DIR)
+    table_name = contacts_table_name()
 
     # If table does not exist → build
-    if "contacts" not in db.table_names():
-        print("LanceDB missing → building.")
+    if not registry.has_table(table_name):
+        telemetry.log("lancedb.startup_check", table=table_name, status="missing")
         ingest_lancedb()
         return
 
     # Table exists but we need to verify it
-    tbl = db.open_table("contacts")
+    tbl = registry.open_table(table_name)
     try:
-        existing = tbl.count()  # might work in your version
+        existing = tbl.count_rows()
     except Exception:
-        print("LanceDB corrupt → rebuilding.")
+        telemetry.log("lancedb.startup_check", level="warning", table=table_name, status="corrupt")
         ingest_lancedb()
         return
 
-    s = SessionLocal()
-    sql_count = s.query(Contact).count()
-    s.close()
+    sql_count = count_contacts()
 
     if sql_count != existing:
-        print("LanceDB count mismatch → rebuilding.")
+        telemetry.log("lancedb.startup_check", table=table_name, status="count_mismatch",
+                      sql_count=sql_count, lance_count=existing)
         ingest_lancedb()
     else:
-        print("LanceDB OK.")
+        telemetry.log("lancedb.startup_check", table=table_name, status="ok")
+
+
+# ---------------------------------------------------------
+# MIGRATE PER-USER TABLES → SHARED TABLE
+# ---------------------------------------------------------
+
+@traced
+def migrate_to_shared_table(source_dir: str = None, drop_source: bool = False):
+    """
+    Copy every `{user_id}_contacts` table into the shared `contacts` table
+    (vectors are copied, not re-embedded). The user's contacts are marked
+    lance_pending, so the next delta ingest checks each copied hash once;
+    tables from older layouts that lack content_hash get an empty hash and
+    are refreshed then. Returns {user_id: rows copied}.
+    """
+    registry = get_registry(DB_DIR)
+    src = get_registry(source_dir).db if source_dir else registry.db
+
+    schema = lancedb_schema()
+    dest_name = shared_table_name()
+    if registry.has_table(dest_name) and "user_id" not in registry.open_table(dest_name).schema.names:
+        telemetry.log("lancedb.migrate_replace", table=dest_name)
+        dest = registry.create_table(dest_name, schema=schema, mode="overwrite")
+    elif registry.has_table(dest_name):
+        dest = registry.open_table(dest_name)
+    else:
+        dest = registry.create_table(dest_name, schema=schema)
+
+    suffix = "_contacts" + dest_name[len("contacts"):]
+    copied = {}
+    for name in sorted(src.table_names()):
+        if not name.endswith(suffix) or name == dest_name:
+            continue
+        user_id = name[:-len(suffix)]
+        data = src.open_table(name).to_arrow()
+
+        if data.schema.field("vector").type != schema.field("vector").type:
+            telemetry.log("lancedb.migrate_skip", level="warning", table=name,
+                          vector_type=str(data.schema.field("vector").type))
+            continue
+
+        n = data.num_rows
+        column = lambda c, default: data[c] if c in data.schema.names else pa.array([default] * n, pa.string())
+        # Older tables also kept the summary inside meta → keep only our fields
+        meta_type = schema.field("meta").type
+        src_meta = data["meta"].combine_chunks()
+        meta = pa.StructArray.from_arrays(
+            [src_meta.field(f.name).cast(f.type) for f in meta_type],
+            fields=list(meta_type),
+        )
+        arr = pa.Table.from_arrays(
+            [
+                data["id"].cast(pa.string()),
+                pa.array([user_id] * n, pa.string()),
+                column("profile_summary", ""),
+                meta,
+                column("content_hash", ""),
+                data["vector"],
+            ],
+            schema=schema,
+        )
+
+        dest.delete(f"user_id = {_sql_in([user_id])}")
+        if n:
+            dest.add(arr)
+        copied[user_id] = n
+        with session_scope() as s:
+            s.execute(update(CONTACTS).where(CONTACTS.c.user_id == user_id).values(lance_pending=True))
+        _record_freshness(dest, user_id, n, _sql_contact_stats(user_id)[1])
+        telemetry.log("lancedb.migrated", table=name, rows=n)
+
+        if drop_source and src is registry.db:
+            src.drop_table(name)
+            registry.invalidate()
+
+    ensure_scalar_index(dest, "user_id")
+    ensure_vector_index(dest)
+    return copied
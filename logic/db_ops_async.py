@@ -0,0 +1,133 @@
+# logic/db_ops_async.py
+"""
+Async variant of the logic.db_ops contacts / queue / outbox API, built on
+SQLAlchemy's asyncio extension and aiosqlite. It runs the same statements
+as the sync API (logic.db_queries), so callers can overlap DB writes with
+Exa / OpenAI / Gmail calls:
+
+    ids, draft = await asyncio.gather(
+        db_ops_async.bulk_insert_contacts(profiles, user_id),
+        asyncio.to_thread(llm_ops.draft_outreach, purpose, candidate),
+    )
+
+The engine is bound to the event loop that first used it; await
+dispose_engine() before that loop closes (e.g. at the end of the
+coroutine passed to asyncio.run).
+"""
+from contextlib import asynccontextmanager
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from logic.db_config import make_async_engine
+from logic import db_queries as queries
+
+_engine = None
+_sessionmaker = None
+
+
+def get_async_engine():
+    """Created on first use, so importing this module needs no event loop."""
+    global _engine, _sessionmaker
+    if _engine is None:
+        _engine = make_async_engine()
+        _sessionmaker = async_sessionmaker(_engine, expire_on_commit=False)
+    return _engine
+
+
+async def dispose_engine():
+    """Close pooled connections; the next call creates a fresh engine."""
+    global _engine, _sessionmaker
+    if _engine is not None:
+        engine, _engine, _sessionmaker = _engine, None, None
+        await engine.dispose()
+
+
+@asynccontextmanager
+async def session_scope():
+    get_async_engine()
+    s = _sessionmaker()
+    try:
+        yield s
+        await s.commit()
+    except Exception:
+        await s.rollback()
+        raise
+    finally:
+        await s.close()
+
+
+# ---------------------------------------------------------
+# CONTACTS
+# ---------------------------------------------------------
+
+async def bulk_insert_contacts(profiles, user_id: str):
+    by_url = queries.dedupe_profiles(profiles)
+    new_ids = []
+
+    async with session_scope() as s:
+        for chunk in queries.url_chunks(list(by_url)):
+            existing = set(await s.scalars(queries.existing_contact_urls(user_id, chunk)))
+            fresh = [url for url in chunk if url not in existing]
+            if fresh:
+                rows = queries.contact_rows(by_url, fresh, user_id)
+                result = await s.scalars(queries.insert_contacts_returning_ids(), rows)
+                new_ids.extend(result.all())
+
+    return new_ids
+
+
+async def insert_contacts(profiles, user_id: str):
+    return len(await bulk_insert_contacts(profiles, user_id))
+
+
+async def count_contacts(user_id=None):
+    async with session_scope() as s:
+        return await s.scalar(queries.count_contacts(user_id))
+
+
+# ---------------------------------------------------------
+# QUEUE
+# ---------------------------------------------------------
+
+async def add_to_queue(candidate: dict, user_id: str, reason: str = "", drafted_dm: str = "", drafted_email: str = ""):
+    async with session_scope() as s:
+        if await s.scalar(queries.queue_entry_exists(user_id, candidate.get("linkedin", ""))):
+            return False
+        s.add(queries.new_queue_entry(candidate, user_id, reason, drafted_dm, drafted_email))
+    return True
+
+
+async def fetch_queue(user_id: str, limit: int = 20):
+    async with session_scope() as s:
+        return (await s.scalars(queries.unsent_queue(user_id, limit))).all()
+
+
+async def page_queue(user_id: str, cursor: str = None, limit: int = 20, sent=False, added_from=None, added_to=None):
+    after = queries.decode_cursor(cursor) if cursor else None
+    async with session_scope() as s:
+        rows = (await s.execute(queries.queue_page(user_id, after, limit, sent, added_from, added_to))).all()
+    return queries.split_page(rows, limit)
+
+
+# ---------------------------------------------------------
+# OUTBOX
+# ---------------------------------------------------------
+
+async def get_outbox_for_day(day: str, user_id: str):
+    async with session_scope() as s:
+        return await s.scalar(queries.outbox_for_day(day, user_id))
+
+
+async def upsert_outbox(day: str, payload: dict, user_id: str, overwrite: bool = False):
+    async with session_scope() as s:
+        row = await s.scalar(queries.outbox_for_day(day, user_id))
+        if row and not overwrite:
+            return row
+        row = queries.apply_outbox_payload(row, day, payload, user_id)
+        s.add(row)
+    return row
+
+
+async def mark_outbox_sent(day: str, user_id: str):
+    async with session_scope() as s:
+        await s.execute(queries.mark_outbox_sent(day, user_id))
+
@@ -0,0 +1,236 @@
+# logic/db_queries.py
+"""
+SQL statements shared by the sync (logic.db_ops) and async
+(logic.db_ops_async) data-access APIs. Everything here just builds
+statements or rows. Nothing touches a session, so both APIs run exactly
+the same SQL.
+"""
+from datetime import datetime, timezone
+from sqlalchemy import select, update, func, tuple_, or_, exists
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from logic.db_models import Contact, DailyQueue, DailyQueueArchive, Outbox, contact_content_hash
+from logic.summary_codec import codec as summary_codec
+
+# Profiles per IN (...) lookup + executemany insert
+INSERT_CHUNK_SIZE = 500
+
+
+# ---------------------------------------------------------
+# CONTACTS
+# ---------------------------------------------------------
+
+def dedupe_profiles(profiles):
+    """{linkedin_url: profile}, keeping the first profile per URL."""
+    by_url = {}
+    for p in profiles:
+        by_url.setdefault(p.get("linkedin_url", ""), p)
+    return by_url
+
+
+def url_chunks(urls):
+    for i in range(0, len(urls), INSERT_CHUNK_SIZE):
+        yield urls[i:i + INSERT_CHUNK_SIZE]
+
+
+def existing_contact_urls(user_id, urls):
+    return select(Contact.linkedin_url).where(
+        Contact.user_id == user_id,
+        Contact.linkedin_url.in_(urls),
+    )
+
+
+def contact_rows(by_url, urls, user_id, now=None):
+    """Insert rows for `urls`; core inserts skip ORM events, so the hash is set here."""
+    now = now or datetime.now(timezone.utc)
+    rows = []
+    for url in urls:
+        p = by_url[url]
+        summary = p.get("text", "") or p.get("summary", "")
+        rows.append({
+            "user_id": user_id,
+            "full_name": p.get("full_name", ""),
+            "linkedin_url": url,
+            "headline": p.get("headline", ""),
+            "profile_summary_z": summary_codec.compress(summary),
+            "first_seen_at": now,
+            "content_hash": contact_content_hash(p.get("full_name", ""), p.get("headline", ""), url, summary),
+            "lance_pending": True,
+        })
+    return rows
+
+
+def insert_contacts_returning_ids():
+    # A concurrent session may have inserted the same URL in between
+    return sqlite_insert(Contact).on_conflict_do_nothing().returning(Contact.id)
+
+
+def contact_summaries(user_id, ids):
+    return select(Contact.id, Contact.profile_summary_z).where(
+        Contact.user_id == user_id,
+        Contact.id.in_(ids),
+    )
+
+
+def keyword_contacts(user_id, query, limit=10):
+    """Contacts whose name or headline contains any query word (no embeddings needed)."""
+    terms = [t for t in (query or "").split() if t][:10]
+    stmt = select(Contact.id, Contact.user_id, Contact.full_name, Contact.headline, Contact.linkedin_url)
+    stmt = stmt.where(Contact.user_id == user_id)
+    if terms:
+        stmt = stmt.where(or_(*[
+            col.ilike(f"%{t}%") for t in terms for col in (Contact.full_name, Contact.headline)
+        ]))
+    return stmt.order_by(Contact.id.desc()).limit(limit)
+
+
+def count_contacts(user_id=None):
+    stmt = select(func.count(Contact.id))
+    if user_id is not None:
+        stmt = stmt.where(Contact.user_id == user_id)
+    return stmt
+
+
+# ---------------------------------------------------------
+# QUEUE
+# ---------------------------------------------------------
+
+def queue_entry_exists(user_id, linkedin_url):
+    """True if the user already queued this profile, including sent rows since archived."""
+    return select(or_(
+        exists().where(DailyQueue.user_id == user_id, DailyQueue.linkedin_url == linkedin_url),
+        exists().where(DailyQueueArchive.user_id == user_id, DailyQueueArchive.linkedin_url == linkedin_url),
+    ))
+
+
+def new_queue_entry(candidate, user_id, reason="", drafted_dm="", drafted_email=""):
+    return DailyQueue(
+        user_id=user_id,
+        linkedin_url=candidate.get("linkedin", ""),
+        full_name=candidate.get("name", ""),
+        headline=candidate.get("headline", ""),
+        reason=reason,
+        drafted_dm=drafted_dm,
+        drafted_email=drafted_email,
+        added_at=datetime.now(timezone.utc),
+        sent=False,
+    )
+
+
+def unsent_queue(user_id, limit=20):
+    return (
+        select(DailyQueue)
+        .where(DailyQueue.user_id == user_id, DailyQueue.sent == False)
+        .order_by(DailyQueue.added_at.asc())
+        .limit(limit)
+    )
+
+
+def undrafted_queue(user_id, purpose, limit=20):
+    """Unsent rows without a stored draft for `purpose`, oldest first."""
+    return (
+        select(DailyQueue)
+        .where(
+            DailyQueue.user_id == user_id,
+            DailyQueue.sent == False,
+            or_(
+                func.coalesce(DailyQueue.drafted_dm, "") == "",
+                func.coalesce(DailyQueue.draft_purpose, "") != purpose,
+            ),
+        )
+        .order_by(DailyQueue.added_at.asc())
+        .limit(limit)
+    )
+
+
+def store_queue_draft(queue_id, drafts, purpose):
+    return (
+        update(DailyQueue)
+        .where(DailyQueue.id == queue_id)
+        .values(
+            reason=reason_text(drafts.get("reason")),
+            drafted_dm=drafts.get("drafted_dm", ""),
+            email_subject=drafts.get("email_subject", ""),
+            drafted_email=drafts.get("email_body", ""),
+            draft_purpose=purpose,
+        )
+    )
+
+
+def reason_text(reason):
+    """draft_outreach returns reasons as a list; the Text columns hold one per line."""
+    if isinstance(reason, (list, tuple)):
+        return "\n".join(str(r) for r in reason)
+    return reason or ""
+
+
+def queue_page(user_id, after=None, limit=20, sent=False, added_from=None, added_to=None):
+    """
+    One page of queue rows in (added_at, id) order, starting after the
+    keyset `after` = (added_at, id). Selects plain columns (no ORM objects)
+    and fetches limit + 1 rows so callers can tell if there is a next page.
+    `sent=None` returns sent and unsent rows.
+    """
+    stmt = select(
+        DailyQueue.id,
+        DailyQueue.full_name,
+        DailyQueue.headline,
+        DailyQueue.linkedin_url,
+        DailyQueue.added_at,
+        DailyQueue.sent,
+    ).where(DailyQueue.user_id == user_id)
+
+    if sent is not None:
+        stmt = stmt.where(DailyQueue.sent == sent)
+    if added_from is not None:
+        stmt = stmt.where(DailyQueue.added_at >= added_from)
+    if added_to is not None:
+        stmt = stmt.where(DailyQueue.added_at < added_to)
+    if after is not None:
+        stmt = stmt.where(tuple_(DailyQueue.added_at, DailyQueue.id) > tuple_(*after))
+
+    return stmt.order_by(DailyQueue.added_at.asc(), DailyQueue.id.asc()).limit(limit + 1)
+
+
+def encode_cursor(row):
+    return f"{row.added_at.isoformat()}|{row.id}"
+
+
+def decode_cursor(cursor):
+    added_at, row_id = cursor.rsplit("|", 1)
+    return datetime.fromisoformat(added_at), int(row_id)
+
+
+def split_page(rows, limit):
+    """(rows[:limit], cursor for the next page or None)."""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(page[-1])
+
+
+def mark_queue_sent(queue_id):
+    return update(DailyQueue).where(DailyQueue.id == queue_id).values(sent=True)
+
+
+# ---------------------------------------------------------
+# OUTBOX
+# ---------------------------------------------------------
+
+def outbox_for_day(day, user_id):
+    return select(Outbox).where(Outbox.day == day, Outbox.user_id == user_id).limit(1)
+
+
+def apply_outbox_payload(row, day, payload, user_id):
+    """Fill (or create) an Outbox row from a payload dict."""
+    if row is None:
+        row = Outbox(day=day, user_id=user_id)
+    for k, v in payload.items():
+        setattr(row, k, v)
+    row.created_at = datetime.now(timezone.utc)
+    return row
+
+
+def mark_outbox_sent(day, user_id):
+    return update(Outbox).where(Outbox.day == day, Outbox.user_id == user_id).values(sent=True)
@@ -0,0 +1,77 @@
+# logic/draft_cache.py
+"""
+Persistent cache of draft_outreach results.
+
+Drafts are keyed by (purpose, candidate fields used by the prompt,
+PROMPT_VERSION, OPENAI_MODEL), so a rerun that shows the same candidate
+costs one primary-key lookup instead of an LLM call. Changing the prompt
+or model naturally misses; a user-requested regeneration overwrites.
+"""
+import json
+from datetime import datetime, timezone
+
+from logic.db_models import session_scope, DraftCache
+from logic.embedding_cache import text_hash
+from logic import llm_ops, telemetry
+from logic.rate_limit import INTERACTIVE
+
+# Purpose of the app's outreach panel; queue pre-drafting uses it too, so
+# the panel finds those drafts in the cache
+OUTREACH_PURPOSE = "networking outreach"
+
+
+def draft_cache_key(purpose: str, candidate: dict) -> str:
+    return text_hash("\x1f".join([
+        purpose or "",
+        candidate.get("name", "") or "",
+        candidate.get("headline", "") or "",
+        candidate.get("linkedin", "") or "",
+        llm_ops.PROMPT_VERSION,
+        llm_ops.OPENAI_MODEL,
+    ]))
+
+
+def get_cached_draft(purpose: str, candidate: dict):
+    with session_scope() as s:
+        row = s.get(DraftCache, draft_cache_key(purpose, candidate))
+    telemetry.incr("cache_hits_total" if row else "cache_misses_total", cache="draft")
+    return json.loads(row.payload) if row else None
+
+
+@telemetry.traced
+def cached_draft_outreach(purpose: str, candidate: dict, refresh: bool = False, priority: int = INTERACTIVE):
+    """draft_outreach through the cache; refresh=True regenerates and replaces."""
+    if not refresh:
+        drafts = get_cached_draft(purpose, candidate)
+        if drafts is not None:
+            return drafts
+
+    drafts = llm_ops.draft_outreach(purpose, candidate, priority=priority)
+    store_draft(purpose, candidate, drafts)
+    return drafts
+
+
+def is_complete_draft(drafts: dict) -> bool:
+    """
+    False for unparseable replies (empty fields) and streams cut short
+    (email_body comes last), which must not be cached for good.
+    """
+    return bool((drafts.get("drafted_dm") or "").strip() and (drafts.get("email_body") or "").strip())
+
+
+def store_draft(purpose: str, candidate: dict, drafts: dict):
+    """Save a draft produced elsewhere (e.g. by draft_outreach_stream); incomplete ones are skipped."""
+    if not is_complete_draft(drafts):
+        telemetry.log("draft_cache.skipped_incomplete", level="warning", linkedin=candidate.get("linkedin", ""))
+        return False
+    with session_scope() as s:
+        s.merge(DraftCache(
+            cache_key=draft_cache_key(purpose, candidate),
+            purpose=purpose,
+            linkedin_url=candidate.get("linkedin", ""),
+            prompt_version=llm_ops.PROMPT_VERSION,
+            model=llm_ops.OPENAI_MODEL,
+            payload=json.dumps(drafts),
+            created_at=datetime.now(timezone.utc),
+        ))
+    return True
@@ -1,22 +1,34 @@
 import base64
 import json
 from email.mime.text import MIMEText
+from google.auth.credentials import AnonymousCredentials
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
-import streamlit as st
 
+from logic import endpoints, telemetry
 
-def gmail_send_email(to_email: str, subject: str, body: str):
 
-    # LOAD JSON CREDENTIALS FROM SECRETS
-    token_info = json.loads(st.secrets["GMAIL_TOKEN"])
+def _gmail_service():
+    token = endpoints.secret("GMAIL_TOKEN")
+
+    # Local stand-in server (mock_server.py) needs no OAuth token
+    if endpoints.MOCK_URL and token == endpoints.MOCK_SECRET:
+        creds = AnonymousCredentials()
+    else:
+        # LOAD JSON CREDENTIALS FROM SECRETS
+        creds = Credentials.from_authorized_user_info(
+            json.loads(token),
+            ["https://www.googleapis.com/auth/gmail.send"]
+        )
+
+    client_options = {"api_endpoint": endpoints.GMAIL_API_BASE} if endpoints.GMAIL_API_BASE else None
+    return build("gmail", "v1", credentials=creds, client_options=client_options, cache_discovery=False)
 
-    creds = Credentials.from_authorized_user_info(
-        token_info,
-        ["https://www.googleapis.com/auth/gmail.send"]
-    )
 
-    service = build("gmail", "v1", credentials=creds)
+@telemetry.traced
+def gmail_send_email(to_email: str, subject: str, body: str):
+
+    service = _gmail_service()
 
     # ---- Build email ----
     message = MIMEText(body)
@@ -0,0 +1,197 @@
+# logic/embedding_cache.py
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+CACHE_FILE = os.getenv("EMBED_CACHE_PATH", "embedding_cache.db")
+CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "200000"))
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))   # seconds
+
+# SQLite caps the number of bound parameters per statement
+_CHUNK = 500
+
+
+def text_hash(text: str) -> str:
+    """Content address of an input string (sha256 of its UTF-8 bytes)."""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def _chunks(items, size=_CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by (model name, text hash).
+
+    Vectors are stored as raw float32 bytes in a local SQLite file.
+    When the cache grows past `max_entries`, the least recently used
+    entries are evicted.
+    """
+
+    def __init__(self, path=CACHE_FILE, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get_many(self, model: str, hashes):
+        """Return {text_hash: vector} for every hash already cached."""
+        unique = list(dict.fromkeys(hashes))
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            for chunk in _chunks(unique):
+                marks = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({marks})",
+                    [model, *chunk],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32)
+
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, model: str, hashes, vectors):
+        """Store one float32 vector per hash and evict if over capacity."""
+        now = time.time()
+        rows = [
+            (model, h, np.asarray(v, dtype=np.float32).tobytes(), now)
+            for h, v in zip(hashes, vectors)
+        ]
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            conn.commit()
+            self._evict(conn)
+
+    def _evict(self, conn):
+        (n,) = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = n - self.max_entries
+        if overflow <= 0:
+            return
+        conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN ("
+            "SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (overflow,),
+        )
+        conn.commit()
+        self.evictions += overflow
+
+    def __len__(self):
+        with self._lock:
+            (n,) = self._connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return n
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive form of a search query."""
+    return " ".join((text or "").split()).casefold()
+
+
+class QueryCache:
+    """
+    In-process LRU cache of query embeddings keyed by
+    (model name, normalized query), with a TTL per entry.
+    """
+
+    def __init__(self, max_size=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model: str, query: str):
+        key = (model, normalize_query(query))
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, model: str, query: str, vector):
+        key = (model, normalize_query(query))
+        with self._lock:
+            self._data[key] = (time.monotonic(), np.asarray(vector, dtype=np.float32))
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+# Singleton instances used by logic.embeddings
+embedding_cache = EmbeddingCache()
+query_cache = QueryCache()
@@ -1,87 +1,421 @@
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import pyarrow as pa
-import lancedb
-from lancedb import connect
 from openai import OpenAI
 
-DB_DIR = "agent_carter_lancedb_streamlitcloud"
-EMBED_MODEL = "text-embedding-3-small"
-EMBED_DIM = 1536   # OpenAI embedding dimension
+from logic.embedding_cache import embedding_cache, query_cache, text_hash
+from logic.lance_store import get_registry
+from logic.hash_embeddings import hash_embed
+from logic import resilience, telemetry
+from logic.endpoints import OPENAI_BASE_URL, MOCK_URL, MOCK_SECRET
+from logic.rate_limit import INTERACTIVE, BACKGROUND
+from logic.db_models import session_scope, LanceFreshness, VectorIndexState
 
-# OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+DB_DIR = os.getenv("LANCE_DB_DIR", "agent_carter_lancedb_streamlitcloud")
 
+# Vector table layout: "per_user" (one {user_id}_contacts table per user) or
+# "shared" (one contacts table with a user_id column, filtered at query time)
+LANCE_LAYOUT = os.getenv("LANCE_LAYOUT", "per_user")
+
+# Which embedding backend to use: "openai" (default), "onnx" (local CPU) or
+# "hash" (deterministic fake for benchmarks, no model or network)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "openai")
+OPENAI_EMBED_MODEL = "text-embedding-3-small"
+OPENAI_EMBED_DIM = 1536   # OpenAI embedding dimension
+LOCAL_EMBED_MODEL = os.getenv("EMBED_LOCAL_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# The local dimension is read from the model; EMBED_LOCAL_DIM, if set, is
+# only checked against it
+LOCAL_EMBED_DIM = int(os.getenv("EMBED_LOCAL_DIM", "0")) or None
+LOCAL_ONNX_PATH = os.getenv("EMBED_ONNX_PATH", "")   # dir with model.onnx + tokenizer files
+HASH_EMBED_DIM = int(os.getenv("EMBED_HASH_DIM", "384"))
+
+# Request limits for the embeddings endpoint. A batch takes its whole
+# (estimated) token cost from the TPM bucket at once, so keep it a small
+# fraction of OPENAI_EMBED_TPM: EMBED_WORKERS batches in flight must not
+# empty the bucket that query embeddings wait on
+MAX_BATCH_ITEMS = 2048
+MAX_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "50000"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))
+EMBED_RETRIES = 3   # attempts per batch (rate_limit retries transient errors)
+
+# Also keep query embeddings in the on-disk cache (survives restarts)
+QUERY_CACHE_PERSIST = os.getenv("QUERY_CACHE_PERSIST", "1") == "1"
+
+# OpenAI client (OPENAI_BASE_URL / AGENT_CARTER_MOCK_URL → local stand-in).
+# max_retries=0: rate_limit.call owns retries and backoff; the socket
+# timeout ends the request once resilience.call has stopped waiting for it
+client = OpenAI(
+    api_key=os.getenv("OPENAI_API_KEY") or (MOCK_SECRET if MOCK_URL else None),
+    base_url=OPENAI_BASE_URL,
+    max_retries=0,
+    timeout=resilience.PROVIDER_TIMEOUTS["openai_embed"],
+)
+
+
+# -------------------------------------------------
+# BACKENDS
 # -------------------------------------------------
-# MODEL LOADING — not needed for OpenAI but kept for API symmetry
+class EmbeddingBackend:
+    """
+    Turns a batch of strings into a float32 matrix of shape (n, dim).
+    `name` identifies the model in the embedding cache; `provider` picks
+    the rate limiter its calls go through.
+    """
+    name = ""
+    provider = "local"
+    dim = 0
+    max_items = MAX_BATCH_ITEMS
+    max_tokens = MAX_BATCH_TOKENS
+    workers = 1
+
+    def embed_batch(self, texts):
+        raise NotImplementedError
+
+
+class OpenAIBackend(EmbeddingBackend):
+    provider = "openai_embed"
+
+    def __init__(self, model=OPENAI_EMBED_MODEL, dim=OPENAI_EMBED_DIM):
+        self.name = model
+        self.dim = dim
+        self.workers = EMBED_WORKERS
+
+    def embed_batch(self, texts):
+        response = client.embeddings.create(
+            model=self.name,
+            input=texts
+        )
+        usage = getattr(response, "usage", None)
+        telemetry.incr("api_tokens_total", getattr(usage, "total_tokens", 0) or 0,
+                       provider=self.provider, kind="embedding")
+        data = sorted(response.data, key=lambda e: e.index)
+        return np.array([e.embedding for e in data], dtype=np.float32)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    Local CPU sentence embeddings. Runs an exported model.onnx through
+    onnxruntime when `onnx_path` is set, otherwise falls back to
+    sentence-transformers on CPU. Vectors are mean-pooled and L2-normalised.
+    """
+    max_items = 64
+    max_tokens = 64 * 256
+
+    def __init__(self, model=LOCAL_EMBED_MODEL, expected_dim=LOCAL_EMBED_DIM, onnx_path=LOCAL_ONNX_PATH):
+        self.name = f"local:{model}"
+        self.model = model
+        self.expected_dim = expected_dim
+        self.onnx_path = onnx_path
+        self._dim = None
+        self._session = None
+        self._tokenizer = None
+        self._st_model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._session is not None or self._st_model is not None:
+                return
+            if self.onnx_path:
+                import onnxruntime as ort
+                from transformers import AutoTokenizer
+
+                self._tokenizer = AutoTokenizer.from_pretrained(self.onnx_path)
+                self._session = ort.InferenceSession(
+                    os.path.join(self.onnx_path, "model.onnx"),
+                    providers=["CPUExecutionProvider"],
+                )
+            else:
+                from sentence_transformers import SentenceTransformer
+
+                self._st_model = SentenceTransformer(self.model, device="cpu")
+
+    @property
+    def dim(self):
+        """The loaded model's output size (it names the Lance table)."""
+        if self._dim is None:
+            self._load()
+            dim = self._model_dim()
+            if self.expected_dim and dim != self.expected_dim:
+                raise ValueError(
+                    f"{self.model} produces {dim}-dimensional vectors, but EMBED_LOCAL_DIM={self.expected_dim}"
+                )
+            self._dim = dim
+        return self._dim
+
+    def _model_dim(self):
+        if self._st_model is not None:
+            return int(self._st_model.get_sentence_embedding_dimension())
+        size = self._session.get_outputs()[0].shape[-1]
+        if isinstance(size, int):
+            return size
+        # Symbolic hidden size in the export → embed once to see it
+        return int(self.embed_batch([""]).shape[1])
+
+    def embed_batch(self, texts):
+        self._load()
+        if self._st_model is not None:
+            vecs = self._st_model.encode(texts, batch_size=len(texts), normalize_embeddings=True)
+            return np.asarray(vecs, dtype=np.float32)
+
+        enc = self._tokenizer(texts, padding=True, truncation=True, max_length=256, return_tensors="np")
+        feed = {
+            i.name: enc[i.name].astype(np.int64)
+            for i in self._session.get_inputs()
+            if i.name in enc
+        }
+        hidden = self._session.run(None, feed)[0]
+        mask = enc["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+
+class HashBackend(EmbeddingBackend):
+    """
+    Deterministic stand-in (logic.hash_embeddings, the same vectors
+    mock_server.py returns): texts sharing words get similar vectors, so
+    search results stay meaningful.
+    """
+
+    def __init__(self, dim=HASH_EMBED_DIM):
+        self.name = f"hash:{dim}"
+        self.dim = dim
+
+    def embed_batch(self, texts):
+        return hash_embed(texts, self.dim)
+
+
+BACKENDS = {
+    "openai": OpenAIBackend,
+    "onnx": OnnxBackend,
+    "hash": HashBackend,
+}
+
+
+def make_backend(name=EMBED_BACKEND):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown EMBED_BACKEND {name!r}; expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+backend = make_backend()
+EMBED_MODEL = backend.name
+EMBED_DIM = backend.dim
+
+
+# -------------------------------------------------
+# MODEL LOADING — kept for API symmetry
 # -------------------------------------------------
 def _get_model():
-    return EMBED_MODEL
+    return backend
 
 
 # -------------------------------------------------
-# EMBEDDINGS
+# BATCHING
 # -------------------------------------------------
-def embed(texts):
+def _estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text
+    return len(text) // 4 + 1
+
+
+def _plan_batches(texts, max_items=None, max_tokens=None):
+    """
+    Split texts into contiguous (start, end) ranges that respect both the
+    per-request item count and the estimated token budget.
     """
-    Returns a list of embedding vectors for a list of input strings.
+    max_items = max_items or backend.max_items
+    max_tokens = max_tokens or backend.max_tokens
+    batches = []
+    start, tokens = 0, 0
+    for i, t in enumerate(texts):
+        cost = _estimate_tokens(t)
+        if i > start and (i - start >= max_items or tokens + cost > max_tokens):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += cost
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+def _embed_batch(texts, priority=BACKGROUND):
+    """
+    One backend call through the provider's rate limiter (with retries),
+    timeout and circuit breaker. Interactive (query) calls are hedged.
     """
-    response = client.embeddings.create(
-        model=EMBED_MODEL,
-        input=texts
+    return resilience.call(
+        backend.provider, backend.embed_batch, texts,
+        hedge=priority == INTERACTIVE,
+        tokens=sum(_estimate_tokens(t) for t in texts),
+        priority=priority,
+        retries=EMBED_RETRIES - 1,
     )
-    vectors = [np.array(e.embedding, dtype=np.float32) for e in response.data]
-    return np.vstack(vectors)
 
 
+def _embed_uncached(texts, priority=BACKGROUND, on_batch=None):
+    """
+    Embed texts in token-aware batches on a bounded thread pool.
+    Output rows keep the input order. `on_batch(start, end, vectors)` runs
+    as each batch completes, so its work survives a later batch failing.
+    """
+    out = np.empty((len(texts), EMBED_DIM), dtype=np.float32)
+    batches = _plan_batches(texts)
+
+    def run(bounds):
+        start, end = bounds
+        out[start:end] = _embed_batch(texts[start:end], priority)
+        if on_batch is not None:
+            on_batch(start, end, out[start:end])
+
+    if len(batches) == 1 or backend.workers <= 1:
+        for bounds in batches:
+            run(bounds)
+    else:
+        with ThreadPoolExecutor(max_workers=min(backend.workers, len(batches))) as pool:
+            list(pool.map(telemetry.propagate(run), batches))
+    return out
+
+
+# -------------------------------------------------
+# EMBEDDINGS
+# -------------------------------------------------
+@telemetry.traced
+def embed(texts, priority=BACKGROUND):
+    """
+    Returns a float32 matrix with one embedding row per input string.
+    Only texts missing from the embedding cache reach the backend.
+    """
+    texts = list(texts)
+    out = np.empty((len(texts), EMBED_DIM), dtype=np.float32)
+    if not texts:
+        return out
+
+    hashes = [text_hash(t) for t in texts]
+    vectors = embedding_cache.get_many(EMBED_MODEL, hashes)
+
+    # one API input per distinct uncached text
+    missing = {}
+    for h, t in zip(hashes, texts):
+        if h not in vectors and h not in missing:
+            missing[h] = t
+
+    telemetry.incr("cache_hits_total", len(texts) - len(missing), cache="embedding")
+    telemetry.incr("cache_misses_total", len(missing), cache="embedding")
+    if missing:
+        keys = list(missing.keys())
+        # Cache each batch as it lands: a retry after one batch fails only
+        # re-embeds that batch
+        fresh = _embed_uncached(
+            list(missing.values()), priority,
+            on_batch=lambda start, end, vecs: embedding_cache.put_many(EMBED_MODEL, keys[start:end], vecs),
+        )
+        vectors.update(zip(keys, fresh))
+
+    for i, h in enumerate(hashes):
+        out[i] = vectors[h]
+    return out
+
+
+@telemetry.traced
 def embed_query(text: str):
     """
     Returns a single embedding vector for one input string.
+    Repeat queries (after normalization) are served from the LRU cache;
+    the first spelling seen is what gets embedded.
     """
-    return embed([text])[0].tolist()
+    vec = query_cache.get(EMBED_MODEL, text)
+    telemetry.incr("cache_hits_total" if vec is not None else "cache_misses_total", cache="query")
+    if vec is None:
+        if QUERY_CACHE_PERSIST:
+            vec = embed([text], INTERACTIVE)[0]
+        else:
+            vec = _embed_uncached([text], INTERACTIVE)[0]
+        query_cache.put(EMBED_MODEL, text, vec)
+    return vec.tolist()
+
+
+def cache_stats():
+    """Hit/miss counters for the document and query embedding caches."""
+    return {
+        "documents": embedding_cache.stats(),
+        "queries": query_cache.stats(),
+    }
 
 
 # -------------------------------------------------
-# LANCE DB SCHEMA (UPDATED for dim=1536)
+# LANCE DB SCHEMA (vector size follows the backend)
 # -------------------------------------------------
-def lancedb_schema(dim=EMBED_DIM):
+def lancedb_schema(dim=None):
+    dim = dim or EMBED_DIM
     return pa.schema([
         ("id", pa.string()),
+        ("user_id", pa.string()),
         ("profile_summary", pa.string()),
         ("meta", pa.struct([
             ("name", pa.string()),
             ("headline", pa.string()),
             ("linkedin", pa.string()),
-            ("profile_summary", pa.string()),
         ])),
+        ("content_hash", pa.string()),
         ("vector", pa.list_(pa.float32(), list_size=dim))
     ])
 
 
 # -------------------------------------------------
-# DB HANDLE
+# GET OR CREATE TABLE
 # -------------------------------------------------
-_db = None
+def _dim_suffix():
+    # OpenAI-sized tables keep their historical names; other backends get a
+    # dimension suffix so vectors of different sizes never share a table
+    return "" if EMBED_DIM == OPENAI_EMBED_DIM else f"_{EMBED_DIM}"
 
-def _get_db():
-    global _db
-    if _db is None:
-        os.makedirs(DB_DIR, exist_ok=True)
-        _db = connect(DB_DIR)
-    return _db
+
+def shared_table_name():
+    return "contacts" + _dim_suffix()
+
+
+def contacts_table_name(user_id=None):
+    if user_id and LANCE_LAYOUT != "shared":
+        return f"{user_id}_contacts" + _dim_suffix()
+    return shared_table_name()
+
+
+def user_filter(user_id=None):
+    """SQL predicate selecting one user's rows in the shared table, else None."""
+    if LANCE_LAYOUT != "shared" or not user_id:
+        return None
+    escaped = str(user_id).replace("'", "''")
+    return f"user_id = '{escaped}'"
+
+
+def _forget_table_state(table_name):
+    with session_scope() as s:
+        s.query(LanceFreshness).filter(
+            (LanceFreshness.table_name == table_name)
+            | LanceFreshness.table_name.startswith(table_name + ":")
+        ).delete(synchronize_session=False)
+        s.query(VectorIndexState).filter(VectorIndexState.table_name == table_name).delete()
 
 
-# -------------------------------------------------
-# GET OR CREATE TABLE
-# -------------------------------------------------
 def get_contacts_table(user_id=None):
-    db = lancedb.connect(DB_DIR)
+    registry = get_registry(DB_DIR)
 
-    table_name = f"{user_id}_contacts" if user_id else "contacts"
+    table_name = contacts_table_name(user_id)
     schema = lancedb_schema()
 
-    if table_name not in db.table_names():
-        print(f"[LanceDB] Creating new table: {table_name}")
-        return db.create_table(table_name, schema=schema)
+    if not registry.has_table(table_name):
+        telemetry.log("lancedb.create_table", table=table_name)
+        return registry.create_table(table_name, schema=schema)
+
+    tbl = registry.open_table(table_name)
+    if tbl.schema.names != schema.names or any(tbl.schema.field(f.name).type != f.type for f in schema):
+        # Old layout (e.g. no content_hash, summary in meta) → start over;
+        # forgetting the sync records makes the next search re-ingest
+        telemetry.log("lancedb.recreate_table", level="warning", table=table_name, reason="schema_changed")
+        _forget_table_state(table_name)
+        return registry.create_table(table_name, schema=schema, mode="overwrite")
 
-    return db.open_table(table_name)
+    return tbl
@@ -0,0 +1,31 @@
+# logic/endpoints.py
+"""
+Where the external services live, and how their credentials are read.
+
+Set AGENT_CARTER_MOCK_URL (e.g. http://127.0.0.1:8765, see mock_server.py)
+to send every OpenAI, Exa and Gmail call to the local stand-in server.
+Missing secrets then default to a dummy value. OPENAI_BASE_URL,
+EXA_BASE_URL and GMAIL_API_BASE override one service at a time.
+"""
+import os
+import streamlit as st
+
+MOCK_URL = os.getenv("AGENT_CARTER_MOCK_URL", "").rstrip("/")
+MOCK_SECRET = "mock-secret"
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or (f"{MOCK_URL}/v1" if MOCK_URL else None)
+EXA_BASE_URL = os.getenv("EXA_BASE_URL") or MOCK_URL or "https://api.exa.ai"
+GMAIL_API_BASE = os.getenv("GMAIL_API_BASE") or MOCK_URL or None
+
+
+def secret(name: str):
+    """Environment variable, then Streamlit secret; MOCK_SECRET when mocked."""
+    value = os.getenv(name)
+    if value:
+        return value
+    try:
+        return st.secrets[name]
+    except Exception:
+        if MOCK_URL:
+            return MOCK_SECRET
+        raise
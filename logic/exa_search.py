@@ -2,11 +2,58 @@
 import os
 import re
 import html
+import threading
+from collections import OrderedDict
+import requests
+import exa_py.api
 from exa_py import Exa
-import streamlit as st
 
-EXA_KEY = st.secrets["EXA_API_KEY"]
-exa = Exa(EXA_KEY)
+from logic import resilience, telemetry
+from logic.endpoints import secret, EXA_BASE_URL
+from logic.rate_limit import INTERACTIVE
+from logic.resilience import CircuitOpenError
+
+
+
+class _TimeoutRequests:
+    """
+    Stands in for the `requests` module inside exa_py, which calls
+    requests.get/post/... with no timeout: a stalled socket would keep the
+    worker thread alive long after resilience.call gave up on it.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+    def _send(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return requests.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self._send("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self._send("POST", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self._send("PATCH", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self._send("DELETE", url, **kwargs)
+
+
+exa_py.api.requests = _TimeoutRequests(resilience.PROVIDER_TIMEOUTS["exa"])
+
+EXA_KEY = secret("EXA_API_KEY")
+exa = Exa(EXA_KEY, base_url=EXA_BASE_URL)
+
+# Recent results per query, served when Exa is down or too slow
+RESULT_CACHE_SIZE = int(os.getenv("EXA_RESULT_CACHE_SIZE", "256"))
+_recent_results = OrderedDict()
+_recent_lock = threading.Lock()
 
 
 # -------------------------------
@@ -55,14 +102,34 @@ def sanitize_text(text: str) -> str:
     return cleaned
 
 
-def run_exa(query: str):
+def _cache_key(query):
+    return " ".join((query or "").split()).casefold()
+
+
+@telemetry.traced
+def run_exa(query: str, priority: int = INTERACTIVE):
+    """
+    LinkedIn profile search. If Exa times out or its circuit is open,
+    returns the last results for the same query (or [] so the caller
+    searches the contacts it already has).
+    """
     q = f"site:linkedin.com/in {query}"
-    resp = exa.search(
-        query=q,
-        num_results=10,
-        type="keyword",
-        contents={"text": {"max_characters": 5000}}
-    )
+    try:
+        resp = resilience.call(
+            "exa", exa.search,
+            hedge=True,
+            priority=priority,
+            query=q,
+            num_results=10,
+            type="keyword",
+            contents={"text": {"max_characters": 5000}}
+        )
+    except (CircuitOpenError, TimeoutError) as e:
+        with _recent_lock:
+            cached = _recent_results.get(_cache_key(query))
+        telemetry.incr("cache_hits_total" if cached else "cache_misses_total", cache="exa_fallback")
+        telemetry.log("exa.unavailable", level="warning", error=str(e), cached_results=len(cached or []))
+        return list(cached or [])
 
     results = []
     for r in resp.results:
@@ -73,5 +140,11 @@ def run_exa(query: str):
             "headline": "",
             "summary": sanitize_text(r.text or "")
         })
-        print("DEBUG OPENAI:", results)
+    telemetry.log("exa.results", level="debug", count=len(results))
+
+    with _recent_lock:
+        _recent_results[_cache_key(query)] = results
+        _recent_results.move_to_end(_cache_key(query))
+        while len(_recent_results) > RESULT_CACHE_SIZE:
+            _recent_results.popitem(last=False)
     return results
@@ -0,0 +1,34 @@
+# logic/hash_embeddings.py
+"""
+Deterministic bag-of-words embeddings for offline runs, shared by the
+"hash" embedding backend (logic.embeddings) and the OpenAI stand-in in
+mock_server.py. Each word adds +-1 to a hashed coordinate (feature
+hashing), then the vector is L2-normalised, so texts sharing words get
+similar vectors. No network, no model.
+"""
+import re
+import hashlib
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=100_000)
+def _slot(word, dim):
+    h = int.from_bytes(hashlib.sha256(word.encode("utf-8")).digest()[:4], "big")
+    return h % dim, (1.0 if h & (1 << 31) else -1.0)
+
+
+def hash_embed(texts, dim):
+    """texts → float32 array of shape (len(texts), dim), rows L2-normalised."""
+    out = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in re.findall(r"\w+", (text or "").lower()):
+            col, sign = _slot(word, dim)
+            out[row, col] += sign
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    # Texts without words get a fixed unit vector rather than NaNs
+    empty = norms[:, 0] == 0
+    out[empty, 0] = 1.0
+    norms[empty] = 1.0
+    return out / norms
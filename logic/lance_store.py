@@ -0,0 +1,96 @@
+# logic/lance_store.py
+import os
+import time
+import threading
+from lancedb import connect
+
+# How long an open table handle is trusted before it re-reads the
+# manifest to pick up writes made by other processes
+REFRESH_INTERVAL = float(os.getenv("LANCE_REFRESH_INTERVAL", "5"))
+
+
+class LanceRegistry:
+    """
+    One LanceDB connection per directory, plus cached table handles and
+    table names. Shared by every Streamlit script thread in the process.
+
+    Writes made through a registry handle keep it current. Anything that
+    replaces a table (overwrite / drop) must go through create_table() or
+    invalidate(). Writes made elsewhere are picked up after REFRESH_INTERVAL.
+    """
+
+    def __init__(self, db_dir: str):
+        self.db_dir = db_dir
+        self._db = None
+        self._names = None
+        self._tables = {}       # name -> (table, last_refresh)
+        self._lock = threading.RLock()
+
+    @property
+    def db(self):
+        with self._lock:
+            if self._db is None:
+                os.makedirs(self.db_dir, exist_ok=True)
+                self._db = connect(self.db_dir)
+            return self._db
+
+    def table_names(self, refresh: bool = False):
+        with self._lock:
+            if self._names is None or refresh:
+                self._names = set(self.db.table_names())
+            return self._names
+
+    def has_table(self, name: str) -> bool:
+        # A miss may be a table created by another process → list once more
+        return name in self.table_names() or name in self.table_names(refresh=True)
+
+    def open_table(self, name: str):
+        with self._lock:
+            entry = self._tables.get(name)
+            now = time.monotonic()
+            if entry is None:
+                tbl = self.db.open_table(name)
+                self._tables[name] = (tbl, now)
+                return tbl
+
+            tbl, last_refresh = entry
+            if now - last_refresh > REFRESH_INTERVAL:
+                tbl = self._refresh(name, tbl)
+                self._tables[name] = (tbl, now)
+            return tbl
+
+    def _refresh(self, name, tbl):
+        checkout_latest = getattr(tbl, "checkout_latest", None)
+        if checkout_latest is not None:
+            checkout_latest()
+            return tbl
+        return self.db.open_table(name)
+
+    def create_table(self, name: str, **kwargs):
+        with self._lock:
+            tbl = self.db.create_table(name, **kwargs)
+            self._tables[name] = (tbl, time.monotonic())
+            if self._names is not None:
+                self._names.add(name)
+            return tbl
+
+    def invalidate(self, name: str = None):
+        """Drop cached handles (one table, or all) so the next open re-reads."""
+        with self._lock:
+            if name is None:
+                self._tables.clear()
+                self._names = None
+            else:
+                self._tables.pop(name, None)
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(db_dir: str) -> LanceRegistry:
+    with _registries_lock:
+        reg = _registries.get(db_dir)
+        if reg is None:
+            reg = _registries[db_dir] = LanceRegistry(db_dir)
+        return reg
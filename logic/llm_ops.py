@@ -6,6 +6,10 @@ import html
 from openai import OpenAI
 import streamlit as st
 
+from logic import rate_limit, resilience, telemetry
+from logic.endpoints import secret, OPENAI_BASE_URL
+from logic.rate_limit import INTERACTIVE
+
 
 # ----------------------------------------------------
 # Basic Sanitizer (same safe style as exa_search)
@@ -51,13 +55,20 @@ def sanitize_text(text: str) -> str:
 # ----------------------------------------------------
 # ENV + CLIENT
 # ----------------------------------------------------
-OPENAI_API_KEY = st.secrets["OPENAI_API_KEY"]
+OPENAI_API_KEY = secret("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise RuntimeError("OPENAI_API_KEY is missing.")
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+# max_retries=0: rate_limit.call owns retries and backoff; the socket
+# timeout ends the request once resilience.call has stopped waiting for it
+client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, max_retries=0,
+                timeout=resilience.PROVIDER_TIMEOUTS["openai"])
 
 OPENAI_MODEL = "gpt-4o-mini"
+# Bump whenever the draft_outreach prompt changes (invalidates cached drafts)
+PROMPT_VERSION = "1"
+# Completion tokens reserved per call against the TPM budget
+COMPLETION_TOKENS_ESTIMATE = 500
 
 
 
@@ -84,10 +95,95 @@ def _safe_json_parse(text):
         }
 
 
+# ----------------------------------------------------
+# Helper: Streaming
+# ----------------------------------------------------
+def _complete(prompt, priority=INTERACTIVE, **kwargs):
+    """chat.completions.create through the OpenAI rate limiter and breaker (not hedged)."""
+    response = resilience.call(
+        "openai", client.chat.completions.create,
+        model=OPENAI_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        tokens=rate_limit.estimate_tokens(prompt) + COMPLETION_TOKENS_ESTIMATE,
+        priority=priority,
+        **kwargs,
+    )
+    # Streams report no usage → counted from the rate limiter's estimate only
+    usage = getattr(response, "usage", None)
+    telemetry.incr("api_tokens_total", getattr(usage, "total_tokens", 0) or 0, provider="openai", kind="chat")
+    return response
+
+
+def _stream_completion(prompt, priority=INTERACTIVE):
+    """Yield content deltas of a streamed chat completion."""
+    # Only opening the stream is retried; a stream that breaks mid-way raises
+    stream = _complete(prompt, priority, stream=True)
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def _close_json(text):
+    """
+    Complete a JSON prefix: close an open string and every open bracket.
+    Also returns the positions where a cut leaves a valid prefix.
+    """
+    stack, cuts = [], []
+    in_string = escape = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            cuts.append(i + 1)
+        elif ch in "}]" and stack:
+            stack.pop()
+            if not stack:
+                return text[:i + 1], cuts    # ignore anything after the object
+        elif ch == ",":
+            cuts.append(i)
+
+    if in_string:
+        # Drop a half-received escape sequence before closing the string
+        text = text[:-1] if escape else re.sub(r"\\u[0-9a-fA-F]{0,3}$", "", text)
+        text += '"'
+    return text + "".join(reversed(stack)), cuts
+
+
+def _partial_json_object(text):
+    """
+    Best-effort parse of a streamed JSON object: every complete field plus
+    the string currently being written. {} until the object has started.
+    """
+    start = text.find("{")
+    if start < 0:
+        return {}
+    text = text[start:]
+    while text:
+        closed, cuts = _close_json(text)
+        try:
+            data = json.loads(closed)
+            return data if isinstance(data, dict) else {}
+        except ValueError:
+            # Dangling key / colon → retry from the last structural boundary
+            cuts = [c for c in cuts if c < len(text)]
+            if not cuts:
+                return {}
+            text = text[:cuts[-1]]
+    return {}
+
+
 # ----------------------------------------------------
 # 1) Outreach Draft Generator
 # ----------------------------------------------------
-def draft_outreach(purpose: str, candidate: dict):
+def _draft_prompt(purpose: str, candidate: dict):
 
     # 🔒 SANITIZATION APPLIED HERE
     purpose = sanitize_text(purpose)
@@ -123,15 +219,10 @@ RETURN JSON ONLY:
   "email_body": "120-word email body"
 }}
 """
+    return prompt
 
-    response = client.chat.completions.create(
-        model=OPENAI_MODEL,
-        messages=[{"role": "user", "content": prompt}]
-    )
-
-    raw = response.choices[0].message.content
-    data = _safe_json_parse(raw)
 
+def _draft_fields(data: dict):
     return {
         "reason": data.get("reason", []),
         "drafted_dm": data.get("drafted_dm", ""),
@@ -140,10 +231,35 @@ RETURN JSON ONLY:
     }
 
 
+@telemetry.traced
+def draft_outreach(purpose: str, candidate: dict, priority: int = INTERACTIVE):
+    response = _complete(_draft_prompt(purpose, candidate), priority)
+
+    raw = response.choices[0].message.content
+    return _draft_fields(_safe_json_parse(raw))
+
+
+@telemetry.traced
+def draft_outreach_stream(purpose: str, candidate: dict):
+    """
+    Streaming draft_outreach: yields the draft dict again each time a
+    field grows, parsed from the JSON received so far. The last value
+    yielded is the complete draft.
+    """
+    raw = ""
+    last = None
+    for token in _stream_completion(_draft_prompt(purpose, candidate)):
+        raw += token
+        partial = _draft_fields(_partial_json_object(raw))
+        if partial != last:
+            last = partial
+            yield partial
+
+
 # ----------------------------------------------------
 # 2) Conversational Refinement Chat (with Tone)
 # ----------------------------------------------------
-def chat_refine(user_request: str, context: dict):
+def _refine_prompt(user_request: str, context: dict):
 
     # 🔒 SANITIZE user request and context inputs
     safe_request = sanitize_text(user_request)
@@ -180,10 +296,23 @@ INSTRUCTIONS:
 - Respect the tone.
 - Keep email paragraphing clean with \\n\\n.
 """
+    return prompt
 
-    response = client.chat.completions.create(
-        model=OPENAI_MODEL,
-        messages=[{"role": "user", "content": prompt}]
-    )
+
+@telemetry.traced
+def chat_refine(user_request: str, context: dict):
+    response = _complete(_refine_prompt(user_request, context))
 
     return response.choices[0].message.content.strip()
+
+
+@telemetry.traced
+def chat_refine_stream(user_request: str, context: dict):
+    """Streaming chat_refine: yields text chunks as the model produces them."""
+    started = False
+    for token in _stream_completion(_refine_prompt(user_request, context)):
+        if not started:
+            token = token.lstrip()
+            started = bool(token)
+        if token:
+            yield token
@@ -0,0 +1,315 @@
+# logic/migrations.py
+"""
+Versioned schema migrations for agent_carter.db.
+
+Base.metadata.create_all() creates missing tables but never changes an
+existing one. Anything that alters an existing table goes here as a
+numbered step. PRAGMA user_version records the last step applied, and
+each step runs exactly once. The runner issues BEGIN IMMEDIATE itself
+(pysqlite would otherwise run DDL outside any transaction), so a step and
+its user_version bump commit or roll back together. Steps must also be
+no-ops on a fresh database that create_all() built from the current
+models.
+"""
+from logic import telemetry
+
+
+def _index_columns(conn, table):
+    """{index_name: (unique, [columns])} for every index on `table`."""
+    out = {}
+    for _, name, unique, *_ in conn.exec_driver_sql(f"PRAGMA index_list('{table}')").fetchall():
+        cols = [r[2] for r in conn.exec_driver_sql(f"PRAGMA index_info('{name}')").fetchall()]
+        out[name] = (bool(unique), cols)
+    return out
+
+
+# ---------------------------------------------------------
+# Steps
+# ---------------------------------------------------------
+
+def _m001_queue_composite_index(conn):
+    # fetch_queue / prepare_today_from_queue: WHERE user_id, sent ORDER BY added_at
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_daily_queue_user_sent_added "
+        "ON daily_queue (user_id, sent, added_at)"
+    )
+
+
+def _m002_outbox_unique_user_day(conn):
+    # Keep the newest row per (user_id, day) before enforcing uniqueness;
+    # older duplicates are copied to outbox_m002_duplicates, not lost
+    duplicates = "FROM outbox WHERE id NOT IN (SELECT MAX(id) FROM outbox GROUP BY user_id, day)"
+    ids = [r[0] for r in conn.exec_driver_sql(f"SELECT id {duplicates}").fetchall()]
+    if ids:
+        conn.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS outbox_m002_duplicates AS SELECT * {duplicates}")
+        conn.exec_driver_sql(f"DELETE {duplicates}")
+        telemetry.log("db.migrate.outbox_duplicates", level="warning", count=len(ids), ids=ids,
+                      kept_in="outbox_m002_duplicates")
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_outbox_user_day ON outbox (user_id, day)"
+    )
+
+
+def _m003_queue_per_user_linkedin(conn):
+    # Old schema had UNIQUE(linkedin_url) across all users; SQLite cannot
+    # drop a column constraint, so rebuild the table.
+    indexes = _index_columns(conn, "daily_queue")
+    if (True, ["linkedin_url"]) in indexes.values():
+        conn.exec_driver_sql("ALTER TABLE daily_queue RENAME TO daily_queue_old")
+        conn.exec_driver_sql("""
+            CREATE TABLE daily_queue (
+                id INTEGER NOT NULL,
+                linkedin_url VARCHAR(500),
+                full_name VARCHAR(255),
+                headline VARCHAR(700),
+                reason TEXT,
+                drafted_dm TEXT,
+                drafted_email TEXT,
+                added_at DATETIME,
+                sent BOOLEAN,
+                user_id VARCHAR,
+                PRIMARY KEY (id)
+            )
+        """)
+        conn.exec_driver_sql("""
+            INSERT INTO daily_queue
+                (id, linkedin_url, full_name, headline, reason, drafted_dm,
+                 drafted_email, added_at, sent, user_id)
+            SELECT id, linkedin_url, full_name, headline, reason, drafted_dm,
+                   drafted_email, added_at, sent, user_id
+            FROM daily_queue_old
+        """)
+        conn.exec_driver_sql("DROP TABLE daily_queue_old")
+        conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_daily_queue_user_id ON daily_queue (user_id)")
+        _m001_queue_composite_index(conn)
+
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_daily_queue_user_linkedin "
+        "ON daily_queue (user_id, linkedin_url)"
+    )
+
+
+def _m004_compress_profile_summary(conn):
+    # profile_summary TEXT → profile_summary_z BLOB (zstd + shared dictionary)
+    from logic.summary_codec import (
+        DICT_SAMPLE_SIZE, train_dictionary, compress_text, decompress_text, store_dictionary,
+    )
+
+    cols = [r[1] for r in conn.exec_driver_sql("PRAGMA table_info('contacts')").fetchall()]
+    if "profile_summary" not in cols:
+        return
+    if "profile_summary_z" not in cols:
+        conn.exec_driver_sql("ALTER TABLE contacts ADD COLUMN profile_summary_z BLOB")
+
+    samples = conn.exec_driver_sql(
+        "SELECT profile_summary FROM contacts WHERE profile_summary <> '' ORDER BY id DESC LIMIT ?",
+        (DICT_SAMPLE_SIZE,),
+    ).scalars().all()
+    zdict = train_dictionary(samples)
+    if zdict is not None:
+        store_dictionary(conn, zdict)
+
+    last_id = 0
+    while True:
+        rows = conn.exec_driver_sql(
+            "SELECT id, profile_summary FROM contacts WHERE id > ? ORDER BY id LIMIT 500", (last_id,)
+        ).fetchall()
+        if not rows:
+            break
+        conn.exec_driver_sql(
+            "UPDATE contacts SET profile_summary_z = ? WHERE id = ?",
+            [(compress_text(text, zdict), i) for i, text in rows],
+        )
+        last_id = rows[-1][0]
+
+    # Only drop the plain column once every row reads back identically;
+    # raising rolls the whole step back
+    dicts = {zdict.dict_id(): zdict} if zdict is not None else {}
+    last_id = 0
+    while True:
+        rows = conn.exec_driver_sql(
+            "SELECT id, profile_summary, profile_summary_z FROM contacts WHERE id > ? ORDER BY id LIMIT 500",
+            (last_id,),
+        ).fetchall()
+        if not rows:
+            break
+        bad = [i for i, text, blob in rows if decompress_text(blob, dicts) != (text or "")]
+        if bad:
+            raise RuntimeError(f"profile_summary did not round-trip for contacts {bad[:10]}")
+        last_id = rows[-1][0]
+
+    conn.exec_driver_sql("ALTER TABLE contacts DROP COLUMN profile_summary")
+
+
+def _m005_queue_email_subject(conn):
+    # Pre-drafted queue rows keep the email subject next to drafted_email
+    for table in ("daily_queue", "daily_queue_archive"):
+        cols = [r[1] for r in conn.exec_driver_sql(f"PRAGMA table_info('{table}')").fetchall()]
+        if cols and "email_subject" not in cols:
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN email_subject TEXT")
+
+
+ARCHIVE_DDL = {
+    "daily_queue_archive": ("""
+        CREATE TABLE daily_queue_archive (
+            id INTEGER NOT NULL,
+            source_id INTEGER,
+            linkedin_url VARCHAR(500),
+            full_name VARCHAR(255),
+            headline VARCHAR(700),
+            reason TEXT,
+            drafted_dm TEXT,
+            drafted_email TEXT,
+            email_subject TEXT,
+            added_at DATETIME,
+            sent BOOLEAN,
+            user_id VARCHAR,
+            archived_at DATETIME,
+            PRIMARY KEY (id)
+        )
+    """, "CREATE INDEX IF NOT EXISTS ix_daily_queue_archive_user_added ON daily_queue_archive (user_id, added_at)"),
+    "outbox_archive": ("""
+        CREATE TABLE outbox_archive (
+            id INTEGER NOT NULL,
+            source_id INTEGER,
+            day VARCHAR(10),
+            email_to VARCHAR(320),
+            "query" TEXT,
+            source VARCHAR(32),
+            linkedin_url VARCHAR(500),
+            full_name VARCHAR(255),
+            headline VARCHAR(700),
+            summary TEXT,
+            match_pct INTEGER,
+            reason TEXT,
+            drafted_dm TEXT,
+            email_subject TEXT,
+            email_body TEXT,
+            created_at DATETIME,
+            sent BOOLEAN,
+            user_id VARCHAR,
+            archived_at DATETIME,
+            PRIMARY KEY (id)
+        )
+    """, "CREATE INDEX IF NOT EXISTS ix_outbox_archive_user_day ON outbox_archive (user_id, day)"),
+}
+
+
+def _m006_archive_surrogate_keys(conn):
+    # Archive rows used the hot row's id as primary key, but SQLite reuses
+    # freed rowids → give them their own key and keep the old id as source_id
+    for table, (ddl, index) in ARCHIVE_DDL.items():
+        cols = [r[1] for r in conn.exec_driver_sql(f"PRAGMA table_info('{table}')").fetchall()]
+        if not cols or "source_id" in cols:
+            continue
+        conn.exec_driver_sql(f"ALTER TABLE {table} RENAME TO {table}_old")
+        # Indexes moved with the renamed table; drop them so the names are free
+        for name in _index_columns(conn, f"{table}_old"):
+            if not name.startswith("sqlite_autoindex"):
+                conn.exec_driver_sql(f"DROP INDEX {name}")
+        conn.exec_driver_sql(ddl)
+        copied = ", ".join(f'"{c}"' for c in cols if c != "id")
+        conn.exec_driver_sql(
+            f"INSERT INTO {table} (source_id, {copied}) SELECT id, {copied} FROM {table}_old ORDER BY id"
+        )
+        conn.exec_driver_sql(f"DROP TABLE {table}_old")
+        conn.exec_driver_sql(index)
+
+
+def _m007_archive_linkedin_index(conn):
+    # add_to_queue also checks archived rows for (user_id, linkedin_url)
+    if conn.exec_driver_sql("PRAGMA table_info('daily_queue_archive')").fetchall():
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_daily_queue_archive_user_linkedin "
+            "ON daily_queue_archive (user_id, linkedin_url)"
+        )
+
+
+def _m008_queue_draft_purpose(conn):
+    # Stored drafts are only reused for the query they were written for
+    for table in ("daily_queue", "daily_queue_archive"):
+        cols = [r[1] for r in conn.exec_driver_sql(f"PRAGMA table_info('{table}')").fetchall()]
+        if cols and "draft_purpose" not in cols:
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN draft_purpose TEXT")
+
+
+def _m009_contact_sync_markers(conn):
+    # Delta ingest reads only new or pending contacts instead of hashing all
+    from logic.db_models import contact_content_hash
+    from logic.summary_codec import load_dictionaries, decompress_text
+
+    cols = [r[1] for r in conn.exec_driver_sql("PRAGMA table_info('contacts')").fetchall()]
+    if not cols or "content_hash" in cols:
+        return
+    conn.exec_driver_sql("ALTER TABLE contacts ADD COLUMN content_hash VARCHAR(64)")
+    # Every existing row is checked against Lance once by the next ingest
+    conn.exec_driver_sql("ALTER TABLE contacts ADD COLUMN lance_pending BOOLEAN NOT NULL DEFAULT 1")
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_contacts_user_pending ON contacts (user_id, lance_pending)"
+    )
+
+    dicts = load_dictionaries(conn)
+    last_id = 0
+    while True:
+        rows = conn.exec_driver_sql(
+            "SELECT id, full_name, headline, linkedin_url, profile_summary_z FROM contacts "
+            "WHERE id > ? ORDER BY id LIMIT 500", (last_id,),
+        ).fetchall()
+        if not rows:
+            break
+        conn.exec_driver_sql(
+            "UPDATE contacts SET content_hash = ? WHERE id = ?",
+            [(contact_content_hash(name, headline, url, decompress_text(blob, dicts)), i)
+             for i, name, headline, url, blob in rows],
+        )
+        last_id = rows[-1][0]
+
+
+MIGRATIONS = [
+    (1, _m001_queue_composite_index),
+    (2, _m002_outbox_unique_user_day),
+    (3, _m003_queue_per_user_linkedin),
+    (4, _m004_compress_profile_summary),
+    (5, _m005_queue_email_subject),
+    (6, _m006_archive_surrogate_keys),
+    (7, _m007_archive_linkedin_index),
+    (8, _m008_queue_draft_purpose),
+    (9, _m009_contact_sync_markers),
+]
+
+
+# ---------------------------------------------------------
+# Runner
+# ---------------------------------------------------------
+
+def schema_version(engine) -> int:
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def run_migrations(engine):
+    """Apply every step newer than the database's user_version."""
+    current = schema_version(engine)
+    for version, step in MIGRATIONS:
+        if version <= current:
+            continue
+        # Driver-level autocommit, so the BEGIN below is the only transaction
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                # Another process may have applied it while we waited for the lock
+                if conn.exec_driver_sql("PRAGMA user_version").scalar() < version:
+                    telemetry.log("db.migrate", version=version, step=step.__name__)
+                    step(conn)
+                    conn.exec_driver_sql(f"PRAGMA user_version = {version}")
+            except BaseException:
+                conn.exec_driver_sql("ROLLBACK")
+                raise
+            conn.exec_driver_sql("COMMIT")
+    return schema_version(engine)
+
+
+if __name__ == "__main__":
+    # python -m logic.migrations → bring AGENT_CARTER_DB_URL up to date
+    from logic.db_models import init_db
+    print(f"Schema version {init_db()}")
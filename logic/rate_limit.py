@@ -0,0 +1,238 @@
+# logic/rate_limit.py
+"""
+One scheduler for every outbound API call (OpenAI, Exa).
+
+Each provider gets a request bucket (RPM) and a token bucket (TPM) shared
+by all threads and Streamlit sessions in the process. Callers wait in a
+priority queue: interactive calls (search, refine) go ahead of batch
+drafting, which goes ahead of background ingest. Transient failures (429,
+5xx, timeouts, dropped connections) are retried with jittered exponential
+backoff, and a 429 empties the request bucket so other callers slow down
+too.
+"""
+import os
+import re
+import time
+import heapq
+import random
+import itertools
+import threading
+
+from logic import telemetry
+
+# Priority classes (lower runs first)
+INTERACTIVE = 0
+BATCH = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch", BACKGROUND: "background"}
+
+API_RETRIES = int(os.getenv("API_RETRIES", "5"))
+BACKOFF_BASE = float(os.getenv("API_BACKOFF_BASE", "0.5"))   # seconds
+BACKOFF_MAX = float(os.getenv("API_BACKOFF_MAX", "30"))
+
+# provider → (requests per minute, tokens per minute); 0 = unlimited.
+# OpenAI meters embedding models separately from chat models, so bulk
+# embedding doesn't drain the bucket drafting and refining wait on
+PROVIDER_LIMITS = {
+    "openai": (int(os.getenv("OPENAI_RPM", "500")), int(os.getenv("OPENAI_TPM", "200000"))),
+    "openai_embed": (int(os.getenv("OPENAI_EMBED_RPM", "3000")), int(os.getenv("OPENAI_EMBED_TPM", "1000000"))),
+    "exa": (int(os.getenv("EXA_RPM", "60")), 0),
+}
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute, holding at most one minute's worth."""
+
+    def __init__(self, per_minute: float, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, n: float) -> float:
+        """Seconds until `n` units are available (0 if they are now)."""
+        self._refill()
+        n = min(n, self.capacity)     # oversized requests wait for a full bucket
+        return 0.0 if self.level >= n else (n - self.level) / self.rate
+
+    def take(self, n: float):
+        self._refill()
+        self.level -= min(n, self.capacity)
+
+    def drain(self):
+        self._refill()
+        self.level = 0.0
+
+
+class RateLimiter:
+    """RPM + TPM buckets for one provider, with a priority wait queue."""
+
+    def __init__(self, name: str, rpm: int = 0, tpm: int = 0, clock=time.monotonic):
+        self.name = name
+        self.requests = TokenBucket(rpm, clock) if rpm else None
+        self.tokens = TokenBucket(tpm, clock) if tpm else None
+        self._cond = threading.Condition()
+        self._waiting = []              # heap of (priority, seq)
+        self._seq = itertools.count()
+        self.calls = {p: 0 for p in PRIORITY_NAMES}
+        self.wait_seconds = {p: 0.0 for p in PRIORITY_NAMES}
+        self.max_queue_depth = 0
+        self.retries = 0
+        self.throttled = 0
+        self.errors = 0
+
+    def _wait_time(self, tokens):
+        waits = [0.0]
+        if self.requests:
+            waits.append(self.requests.wait_time(1))
+        if self.tokens:
+            waits.append(self.tokens.wait_time(tokens))
+        return max(waits)
+
+    def acquire(self, tokens: int = 1, priority: int = BACKGROUND):
+        """Block until this call may go out; higher priority callers go first."""
+        entry = (priority, next(self._seq))
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._waiting))
+            try:
+                while True:
+                    wait = None
+                    if self._waiting[0] == entry:
+                        wait = self._wait_time(tokens)
+                        if wait <= 0:
+                            if self.requests:
+                                self.requests.take(1)
+                            if self.tokens:
+                                self.tokens.take(tokens)
+                            return
+                    self._cond.wait(timeout=wait)
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self.calls[priority] = self.calls.get(priority, 0) + 1
+                self.wait_seconds[priority] = self.wait_seconds.get(priority, 0.0) + time.monotonic() - start
+                self._cond.notify_all()
+
+    def throttle(self):
+        """The provider answered 429 → stop everyone until the bucket refills."""
+        with self._cond:
+            self.throttled += 1
+            if self.requests:
+                self.requests.drain()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queue_depth": len(self._waiting),
+                "max_queue_depth": self.max_queue_depth,
+                "calls": {PRIORITY_NAMES.get(p, p): n for p, n in self.calls.items()},
+                "wait_seconds": {PRIORITY_NAMES.get(p, p): round(s, 3) for p, s in self.wait_seconds.items()},
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "errors": self.errors,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str) -> RateLimiter:
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            rpm, tpm = PROVIDER_LIMITS.get(provider, (0, 0))
+            limiter = _limiters[provider] = RateLimiter(provider, rpm, tpm)
+        return limiter
+
+
+# ---------------------------------------------------------
+# Retry policy
+# ---------------------------------------------------------
+
+def _status_code(e):
+    status = getattr(e, "status_code", None)
+    if status is None:
+        status = getattr(getattr(e, "response", None), "status_code", None)
+    if status is None:
+        # exa_py raises ValueError("Request failed with status code 429: ...")
+        m = re.search(r"status code (\d{3})", str(e))
+        status = int(m.group(1)) if m else None
+    return status
+
+
+def _retry_after(e):
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class DeadlineExceeded(TimeoutError):
+    """The caller stopped waiting; the attempt may still be running, so it isn't retried."""
+
+
+def is_retryable(e) -> bool:
+    if isinstance(e, DeadlineExceeded):
+        return False
+    status = _status_code(e)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS
+    name = type(e).__name__
+    return any(k in name for k in ("RateLimit", "Timeout", "Connection"))
+
+
+def backoff_delay(attempt: int, retry_after: float = None) -> float:
+    """Full-jitter exponential backoff, never shorter than Retry-After."""
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    return max(delay, retry_after or 0.0)
+
+
+def call(provider: str, fn, *args, tokens: int = 1, priority: int = BACKGROUND, retries: int = None, **kwargs):
+    """
+    Run fn(*args, **kwargs) once the provider's buckets allow it, retrying
+    transient failures. Every attempt is rate limited.
+    """
+    limiter = get_limiter(provider)
+    retries = API_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        limiter.acquire(tokens, priority)
+        telemetry.incr("api_requests_total", provider=provider, priority=PRIORITY_NAMES.get(priority, priority))
+        if tokens > 1:
+            telemetry.incr("api_tokens_estimated_total", tokens, provider=provider)
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                limiter.errors += 1
+                raise
+            if _status_code(e) == 429:
+                limiter.throttle()
+            limiter.retries += 1
+            delay = backoff_delay(attempt, _retry_after(e))
+            telemetry.log("rate_limit.retry", level="warning", provider=provider, error=str(e),
+                          attempt=attempt + 1, retries=retries, delay_seconds=round(delay, 2))
+            time.sleep(delay)
+
+
+def estimate_tokens(*texts) -> int:
+    # ~4 characters per token for English text
+    return sum(len(t or "") for t in texts) // 4 + 1
+
+
+def metrics():
+    """Per-provider queue depth, wait time, retry and error counters."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {l.name: l.stats() for l in limiters}
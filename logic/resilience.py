@@ -0,0 +1,282 @@
+# logic/resilience.py
+"""
+Timeouts, circuit breakers and hedged requests for external calls.
+
+call() wraps rate_limit.call with:
+- a per-provider deadline on each attempt, started once the rate limiter
+  lets it go (the caller stops waiting; the worker thread is left to finish
+  in the background, and the attempt is not retried)
+- a circuit breaker per provider: after BREAKER_FAILURES consecutive
+  transient failures, calls fail fast with CircuitOpenError for
+  BREAKER_RESET seconds, then a single trial call decides whether to close
+- optional hedging for idempotent calls: if the first attempt is slower
+  than the provider's recent p95 latency, a duplicate is sent and the
+  first success wins (at most HEDGE_MAX_INFLIGHT duplicates per provider)
+Each provider has its own bounded worker pool, so threads left running by
+one slow provider can't starve calls to another. The clients themselves
+carry socket timeouts matching PROVIDER_TIMEOUTS, so those threads end soon
+after the caller gives up.
+Callers catch CircuitOpenError / TimeoutError and fall back to cached data.
+"""
+import os
+import time
+import functools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from logic import rate_limit, telemetry
+from logic.rate_limit import BACKGROUND
+
+# Seconds a caller waits for one provider attempt (rate-limit waits and backoff excluded)
+PROVIDER_TIMEOUTS = {
+    "openai": float(os.getenv("OPENAI_TIMEOUT", "30")),
+    "openai_embed": float(os.getenv("OPENAI_TIMEOUT", "30")),
+    "exa": float(os.getenv("EXA_TIMEOUT", "15")),
+}
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))       # seconds open
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.2                                          # seconds
+HEDGE_MAX_INFLIGHT = int(os.getenv("HEDGE_MAX_INFLIGHT", "4"))   # per provider
+LATENCY_WINDOW = 200
+
+# Worker threads per provider (PROVIDER_WORKERS_<NAME> overrides the default)
+EXTERNAL_CALL_WORKERS = int(os.getenv("EXTERNAL_CALL_WORKERS", "16"))
+
+
+class CircuitOpenError(RuntimeError):
+    """The provider's breaker is open; use cached data instead."""
+
+
+class CircuitBreaker:
+    """closed → (failures) → open → (after reset_timeout) half_open → closed/open."""
+
+    def __init__(self, name, failure_threshold=None, reset_timeout=None, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold or BREAKER_FAILURES
+        self.reset_timeout = reset_timeout or BREAKER_RESET
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.rejected = 0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError, or return True if this call is the half-open trial."""
+        with self._lock:
+            if self.state == "open" and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "open" or (self.state == "half_open" and self._trial):
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            if self.state == "half_open":
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    telemetry.log("circuit.opened", level="warning", provider=self.name, failures=self.failures)
+                self.state = "open"
+                self.opened_at = self.clock()
+                self._trial = False
+
+    def release_trial(self):
+        """Let the next call be the trial if this one settled nothing."""
+        with self._lock:
+            self._trial = False
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies."""
+
+    def __init__(self, size=LATENCY_WINDOW):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+    def hedge_delay(self):
+        """p-th percentile latency, or None until there are enough samples."""
+        if len(self._samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, self.percentile(HEDGE_PERCENTILE))
+
+
+_breakers = {}
+_latency = {}
+_hedges = {}
+_pools = {}
+_hedge_slots = {}
+_state_lock = threading.Lock()
+
+
+def get_breaker(provider):
+    with _state_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker(provider)
+        return _breakers[provider]
+
+
+def get_latency(provider):
+    with _state_lock:
+        if provider not in _latency:
+            _latency[provider] = LatencyTracker()
+        return _latency[provider]
+
+
+def get_pool(provider):
+    with _state_lock:
+        if provider not in _pools:
+            workers = int(os.getenv(f"PROVIDER_WORKERS_{provider.upper()}", EXTERNAL_CALL_WORKERS))
+            _pools[provider] = ThreadPoolExecutor(max_workers=workers,
+                                                  thread_name_prefix=f"agent-carter-{provider}")
+        return _pools[provider]
+
+
+def _get_hedge_slots(provider):
+    with _state_lock:
+        if provider not in _hedge_slots:
+            _hedge_slots[provider] = threading.BoundedSemaphore(HEDGE_MAX_INFLIGHT)
+        return _hedge_slots[provider]
+
+
+def _counts_as_failure(e):
+    # Client errors (bad request, auth) say nothing about provider health
+    return isinstance(e, TimeoutError) or rate_limit.is_retryable(e)
+
+
+def call(provider: str, fn, *args, hedge: bool = False, timeout: float = None,
+         tokens: int = 1, priority: int = BACKGROUND, retries: int = None, **kwargs):
+    """
+    rate_limit.call(provider, fn, ...) with a deadline, the provider's
+    circuit breaker and (hedge=True, idempotent calls only) a duplicate
+    request once the first is slower than recent p95.
+    Providers without a configured timeout (e.g. local models) run inline.
+    """
+    with telemetry.span(f"{provider}.request", priority=rate_limit.PRIORITY_NAMES.get(priority, priority)) as span:
+        return _call(span, provider, fn, args, kwargs, hedge, timeout, tokens, priority, retries)
+
+
+def _call(span, provider, fn, args, kwargs, hedge, timeout, tokens, priority, retries):
+    timeout = timeout or PROVIDER_TIMEOUTS.get(provider)
+    if timeout is None:
+        return rate_limit.call(provider, fn, *args, tokens=tokens, priority=priority, retries=retries, **kwargs)
+
+    breaker = get_breaker(provider)
+    trial = breaker.before_call()
+    try:
+        # The deadline applies per attempt, from when the rate limiter lets
+        # it go: queueing behind other callers and backoff don't count
+        result = rate_limit.call(
+            provider,
+            functools.partial(_attempt, span, provider, fn, args, kwargs, hedge, timeout, tokens, priority),
+            tokens=tokens, priority=priority, retries=retries,
+        )
+    except Exception as e:
+        if _counts_as_failure(e):
+            breaker.record_failure()
+        raise
+    else:
+        breaker.record_success()
+        return result
+    finally:
+        # A half-open trial that ended in neither a success nor a counted
+        # failure (e.g. a 400) must not leave the breaker rejecting every call
+        if trial:
+            breaker.release_trial()
+
+
+def _attempt(span, provider, fn, args, kwargs, hedge, timeout, tokens, priority):
+    """One attempt with a deadline, hedged once it is slower than recent p95."""
+    latency = get_latency(provider)
+    pool = get_pool(provider)
+    hedge_slots = _get_hedge_slots(provider)
+
+    @telemetry.propagate
+    def run(hedging=False):
+        try:
+            if hedging:
+                rate_limit.get_limiter(provider).acquire(tokens, priority)
+            return fn(*args, **kwargs)
+        finally:
+            if hedging:
+                hedge_slots.release()
+
+    start = time.monotonic()
+    deadline = start + timeout
+    pending = {pool.submit(run)}
+    hedge_delay = latency.hedge_delay() if hedge else None
+    hedged = False
+    error = None
+
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        wait_for = remaining
+        if hedge_delay is not None and not hedged:
+            wait_for = max(0.0, min(remaining, start + hedge_delay - time.monotonic()))
+
+        done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+        for fut in done:
+            if fut.exception() is None:
+                latency.add(time.monotonic() - start)
+                return fut.result()
+            error = fut.exception()
+
+        if not done and hedge_delay is not None and not hedged:
+            hedged = True
+            # Duplicates still running past their deadline hold a slot; once
+            # they are all taken, wait out the first attempt instead
+            if not hedge_slots.acquire(blocking=False):
+                span.set(hedge_skipped=True)
+                continue
+            span.set(hedged=True)
+            with _state_lock:
+                _hedges[provider] = _hedges.get(provider, 0) + 1
+            # The duplicate is a real request → it takes a rate-limit slot too
+            pending.add(pool.submit(run, hedging=True))
+
+    if error is None or pending:
+        raise rate_limit.DeadlineExceeded(f"{provider} call exceeded {timeout:.0f}s")
+    raise error
+
+def stats():
+    """Breaker state, latency percentiles and hedge counts per provider."""
+    with _state_lock:
+        providers = set(_breakers) | set(_latency)
+    out = {}
+    for p in sorted(providers):
+        b, l = get_breaker(p), get_latency(p)
+        out[p] = {
+            "state": b.state,
+            "failures": b.failures,
+            "rejected": b.rejected,
+            "p50": l.percentile(50),
+            "p95": l.percentile(95),
+            "hedges": _hedges.get(p, 0),
+        }
+    return out
@@ -0,0 +1,147 @@
+# logic/retention.py
+"""
+Hot/cold retention for the queue and outbox.
+
+Sent queue rows and past outbox days older than the retention window are
+moved (INSERT ... SELECT, then DELETE, in one transaction per batch) into
+daily_queue_archive / outbox_archive. The hot tables stay small, and the
+history functions below read both hot and archived rows.
+"""
+import os
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, insert, delete, union_all, literal
+
+from logic.db_models import ENGINE, session_scope, DailyQueue, Outbox, DailyQueueArchive, OutboxArchive
+from logic.summary_codec import codec as summary_codec
+from logic import telemetry
+
+QUEUE_RETENTION_DAYS = int(os.getenv("QUEUE_RETENTION_DAYS", "30"))
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "30"))
+# Hours between runs of the in-process maintenance thread
+MAINTENANCE_INTERVAL_HOURS = float(os.getenv("MAINTENANCE_INTERVAL_HOURS", "24"))
+ARCHIVE_BATCH_SIZE = 1000
+
+
+def _move(hot, cold, where):
+    """
+    Move rows matching `where` from hot to cold in batches; returns count.
+    The hot id goes to cold.source_id; cold rows get their own ids.
+    """
+    columns = [c.name for c in hot.__table__.columns if c.name != "id"]
+    moved = 0
+    while True:
+        with session_scope() as s:
+            ids = s.scalars(select(hot.id).where(*where).limit(ARCHIVE_BATCH_SIZE)).all()
+            if not ids:
+                return moved
+            src = select(
+                hot.id,
+                *[getattr(hot, c) for c in columns],
+                literal(datetime.now(timezone.utc)).label("archived_at"),
+            ).where(hot.id.in_(ids))
+            s.execute(insert(cold).from_select(["source_id"] + columns + ["archived_at"], src))
+            s.execute(delete(hot).where(hot.id.in_(ids)))
+        moved += len(ids)
+
+
+# ---------------------------------------------------------
+# ARCHIVE
+# ---------------------------------------------------------
+
+def archive_sent_queue(older_than_days: int = None, now: datetime = None, user_id: str = None):
+    """Move sent queue rows added more than `older_than_days` ago (one user's, or everyone's)."""
+    days = QUEUE_RETENTION_DAYS if older_than_days is None else older_than_days
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=days)
+    where = [DailyQueue.sent == True, DailyQueue.added_at < cutoff]
+    if user_id is not None:
+        where.append(DailyQueue.user_id == user_id)
+    return _move(DailyQueue, DailyQueueArchive, where)
+
+
+def archive_outbox(older_than_days: int = None, now: datetime = None, user_id: str = None):
+    """Move outbox days older than `older_than_days` (one user's, or everyone's)."""
+    days = OUTBOX_RETENTION_DAYS if older_than_days is None else older_than_days
+    cutoff_day = ((now or datetime.now(timezone.utc)) - timedelta(days=days)).date().isoformat()
+    where = [Outbox.day < cutoff_day]
+    if user_id is not None:
+        where.append(Outbox.user_id == user_id)
+    return _move(Outbox, OutboxArchive, where)
+
+
+@telemetry.traced
+def compact_database():
+    """VACUUM agent_carter.db so space freed by archival/compression is returned."""
+    with ENGINE.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("VACUUM")
+
+
+@telemetry.traced
+def run_maintenance():
+    result = {
+        "queue_archived": archive_sent_queue(),
+        "outbox_archived": archive_outbox(),
+        # First dictionary once enough summaries exist; rows written before
+        # it are recompressed with it
+        "summaries_recompressed": summary_codec.retrain() if summary_codec.current() is None else 0,
+    }
+    telemetry.log("maintenance.done", **result)
+    return result
+
+
+def start_maintenance_scheduler(interval_hours: float = None):
+    """Run run_maintenance now and then every `interval_hours` in a daemon thread."""
+    interval = (interval_hours or MAINTENANCE_INTERVAL_HOURS) * 3600
+
+    def loop():
+        while True:
+            try:
+                run_maintenance()
+            except Exception as e:
+                telemetry.log("maintenance.failed", level="error", error=str(e))
+            time.sleep(interval)
+
+    t = threading.Thread(target=loop, name="agent-carter-maintenance", daemon=True)
+    t.start()
+    return t
+
+
+# ---------------------------------------------------------
+# HISTORY (hot + archive)
+# ---------------------------------------------------------
+
+@telemetry.traced
+def fetch_queue_history(user_id: str, limit: int = 100, since: datetime = None):
+    """Queue rows for a user from both tables, newest first."""
+    def part(model, id_column):
+        q = select(
+            id_column.label("id"), model.full_name, model.headline, model.linkedin_url,
+            model.added_at, model.sent,
+        ).where(model.user_id == user_id)
+        if since is not None:
+            q = q.where(model.added_at >= since)
+        return q
+
+    u = union_all(part(DailyQueue, DailyQueue.id), part(DailyQueueArchive, DailyQueueArchive.source_id)).subquery()
+    with session_scope() as s:
+        return s.execute(select(u).order_by(u.c.added_at.desc()).limit(limit)).all()
+
+
+@telemetry.traced
+def fetch_outbox_history(user_id: str, start_day: str = None, end_day: str = None):
+    """Outbox days for a user (inclusive ISO day range) from both tables."""
+    def part(model, id_column):
+        q = select(
+            id_column.label("id"), model.day, model.full_name, model.linkedin_url,
+            model.email_subject, model.sent,
+        ).where(model.user_id == user_id)
+        if start_day:
+            q = q.where(model.day >= start_day)
+        if end_day:
+            q = q.where(model.day <= end_day)
+        return q
+
+    u = union_all(part(Outbox, Outbox.id), part(OutboxArchive, OutboxArchive.source_id)).subquery()
+    with session_scope() as s:
+        return s.execute(select(u).order_by(u.c.day.desc())).all()
@@ -0,0 +1,173 @@
+# logic/summary_codec.py
+"""
+zstd compression for Contact.profile_summary.
+
+Summaries are short, similar web pages, so they compress far better with a
+shared dictionary trained on a sample of them. Dictionaries live in the
+compression_dicts table, keyed by their zstd dictionary id. Each
+compressed frame records the id of the dictionary it used (0 = none), so
+old rows stay readable after a retrain.
+"""
+import os
+import threading
+from datetime import datetime, timezone
+import zstandard as zstd
+
+from logic import telemetry
+
+ZSTD_LEVEL = int(os.getenv("SUMMARY_ZSTD_LEVEL", "9"))
+DICT_SIZE = int(os.getenv("SUMMARY_DICT_SIZE", str(64 * 1024)))
+# Fewer samples than this → compress without a dictionary
+DICT_MIN_SAMPLES = int(os.getenv("SUMMARY_DICT_MIN_SAMPLES", "200"))
+DICT_SAMPLE_SIZE = 2000
+
+CREATE_DICTS_TABLE = """
+    CREATE TABLE IF NOT EXISTS compression_dicts (
+        dict_id INTEGER NOT NULL,
+        data BLOB,
+        created_at DATETIME,
+        PRIMARY KEY (dict_id)
+    )
+"""
+
+
+# ---------------------------------------------------------
+# Pure helpers (no database)
+# ---------------------------------------------------------
+
+def train_dictionary(samples):
+    """Train a zstd dictionary from summary texts; None if there are too few."""
+    data = [s.encode("utf-8") for s in samples if s]
+    if len(data) < DICT_MIN_SAMPLES:
+        return None
+    # zstd wants roughly 10x more sample bytes than dictionary bytes
+    size = min(DICT_SIZE, max(1024, sum(map(len, data)) // 10))
+    try:
+        return zstd.train_dictionary(size, data, level=ZSTD_LEVEL)
+    except zstd.ZstdError as e:
+        telemetry.log("summary.dictionary_training_failed", level="warning", error=str(e))
+        return None
+
+
+def compress_text(text, zdict=None):
+    """UTF-8 text → zstd frame (None for empty text)."""
+    if not text:
+        return None
+    cctx = zstd.ZstdCompressor(level=ZSTD_LEVEL, dict_data=zdict)
+    return cctx.compress(text.encode("utf-8"))
+
+
+def frame_dict_id(blob) -> int:
+    return zstd.get_frame_parameters(blob).dict_id
+
+
+def decompress_text(blob, dicts: dict) -> str:
+    """zstd frame → text, looking the frame's dictionary up in `dicts`."""
+    if not blob:
+        return ""
+    dict_id = frame_dict_id(blob)
+    dctx = zstd.ZstdDecompressor(dict_data=dicts[dict_id] if dict_id else None)
+    return dctx.decompress(blob).decode("utf-8")
+
+
+def store_dictionary(conn, zdict):
+    conn.exec_driver_sql(CREATE_DICTS_TABLE)
+    conn.exec_driver_sql(
+        "INSERT OR REPLACE INTO compression_dicts (dict_id, data, created_at) VALUES (?, ?, ?)",
+        (zdict.dict_id(), zdict.as_bytes(), datetime.now(timezone.utc).isoformat(sep=" ")),
+    )
+
+
+def load_dictionaries(conn):
+    """{dict_id: ZstdCompressionDict}, oldest first (the last one is current)."""
+    conn.exec_driver_sql(CREATE_DICTS_TABLE)
+    rows = conn.exec_driver_sql("SELECT dict_id, data FROM compression_dicts ORDER BY rowid").fetchall()
+    return {dict_id: zstd.ZstdCompressionDict(data) for dict_id, data in rows}
+
+
+# ---------------------------------------------------------
+# Process-wide codec bound to the app database
+# ---------------------------------------------------------
+
+class SummaryCodec:
+    """
+    Compresses with the newest stored dictionary and decompresses with
+    whichever dictionary a frame names. Dictionaries are loaded from
+    agent_carter.db on first use, and reloaded when a frame names one this
+    process has not seen (another process retrained).
+    """
+
+    def __init__(self):
+        self._dicts = None
+        self._lock = threading.Lock()
+
+    def _engine(self):
+        # Imported late: logic.db_models imports this module
+        from logic.db_models import ENGINE
+        return ENGINE
+
+    def _load(self, force=False):
+        with self._lock:
+            if self._dicts is None or force:
+                with self._engine().connect() as conn:
+                    self._dicts = load_dictionaries(conn)
+            return self._dicts
+
+    def current(self):
+        dicts = self._load()
+        return next(reversed(dicts.values()), None)
+
+    def compress(self, text):
+        return compress_text(text, self.current())
+
+    def decompress(self, blob) -> str:
+        if not blob:
+            return ""
+        dicts = self._load()
+        dict_id = frame_dict_id(blob)
+        if dict_id and dict_id not in dicts:
+            dicts = self._load(force=True)
+        return decompress_text(blob, dicts)
+
+    def retrain(self):
+        """
+        Train a new dictionary from the newest summaries, then recompress
+        every summary with it. Returns the number of rows rewritten.
+        """
+        engine = self._engine()
+        with engine.connect() as conn:
+            blobs = conn.exec_driver_sql(
+                "SELECT profile_summary_z FROM contacts WHERE profile_summary_z IS NOT NULL "
+                "ORDER BY id DESC LIMIT ?", (DICT_SAMPLE_SIZE,)
+            ).scalars().all()
+        zdict = train_dictionary([self.decompress(b) for b in blobs])
+        if zdict is None:
+            return 0
+
+        with engine.begin() as conn:
+            store_dictionary(conn, zdict)
+        dicts = self._load(force=True)
+
+        rewritten = 0
+        last_id = 0
+        while True:
+            with engine.begin() as conn:
+                rows = conn.exec_driver_sql(
+                    "SELECT id, profile_summary_z FROM contacts "
+                    "WHERE id > ? AND profile_summary_z IS NOT NULL ORDER BY id LIMIT 500",
+                    (last_id,),
+                ).fetchall()
+                if not rows:
+                    return rewritten
+                updates = [
+                    (compress_text(decompress_text(blob, dicts), zdict), i)
+                    for i, blob in rows
+                    if frame_dict_id(blob) != zdict.dict_id()
+                ]
+                if updates:
+                    conn.exec_driver_sql("UPDATE contacts SET profile_summary_z = ? WHERE id = ?", updates)
+                rewritten += len(updates)
+                last_id = rows[-1][0]
+
+
+codec = SummaryCodec()
@@ -0,0 +1,407 @@
+# logic/telemetry.py
+"""
+Lightweight tracing, counters and structured logs.
+
+- span(name, **attrs) times one stage. A span opened inside another (same
+  thread, or a worker started through propagate()) nests under it; the
+  outermost span of a request is its trace.
+- @traced wraps a function in a span (generators are timed until they are
+  exhausted); every logic/ entry point uses it.
+- incr(name, value, **labels) bumps a counter (API tokens, cache hits, ...).
+- log(event, **fields) writes one JSON object per line to stdout
+  (LOG_FORMAT=text for "[event] key=value" lines).
+
+Finished traces stay in memory (recent_traces(session_id=...) feeds the
+app's debug panel, which only shows the viewer's own requests) and are
+appended to TELEMETRY_JSONL when set. prometheus_text() renders
+span latency histograms, counters and the rate limiter / circuit breaker
+state; start_metrics_server() serves it on /metrics.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import inspect
+import functools
+import threading
+import contextvars
+from collections import deque, defaultdict
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info").lower()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")          # "json" or "text"
+TELEMETRY_JSONL = os.getenv("TELEMETRY_JSONL", "")    # finished traces, one per line
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))    # 0 = no /metrics server
+TRACE_HISTORY = int(os.getenv("TRACE_HISTORY", "50"))
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+# Span latency histogram buckets (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+METRIC_PREFIX = "agent_carter"
+
+_current = contextvars.ContextVar("agent_carter_span", default=None)
+_lock = threading.Lock()
+_traces = deque(maxlen=TRACE_HISTORY)
+_histograms = {}                  # span name → [bucket counts..., +Inf count, sum]
+_counters = defaultdict(float)    # (name, sorted label items) → value
+
+
+# ---------------------------------------------------------
+# Logs
+# ---------------------------------------------------------
+
+def log(event: str, level: str = "info", **fields):
+    """One structured log line; tagged with the current trace id if any."""
+    if LEVELS.get(level, 20) < LEVELS.get(LOG_LEVEL, 20):
+        return
+    current = _current.get()
+    if current is not None:
+        fields.setdefault("trace_id", current.trace.id)
+    if LOG_FORMAT == "text":
+        line = f"[{event}] " + " ".join(f"{k}={v}" for k, v in fields.items())
+    else:
+        record = {"ts": datetime.now(timezone.utc).isoformat(), "level": level, "event": event, **fields}
+        line = json.dumps(record, default=str)
+    print(line, file=sys.stderr if LEVELS.get(level, 20) >= LEVELS["error"] else sys.stdout, flush=True)
+
+
+# ---------------------------------------------------------
+# Counters
+# ---------------------------------------------------------
+
+def incr(name: str, value: float = 1, **labels):
+    if not value:
+        return
+    key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+    with _lock:
+        _counters[key] += value
+
+
+def counters():
+    """{name: {label string: value}} snapshot."""
+    out = defaultdict(dict)
+    with _lock:
+        for (name, labels), value in _counters.items():
+            out[name][",".join(f"{k}={v}" for k, v in labels)] = value
+    return dict(out)
+
+
+# ---------------------------------------------------------
+# Spans and traces
+# ---------------------------------------------------------
+
+class Trace:
+    def __init__(self, name, session_id=None):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.session_id = session_id
+        self.started_at = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        root = next((s for s in spans if s.parent is None), None)
+        return {
+            "trace_id": self.id,
+            "name": self.name,
+            "session_id": self.session_id,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(root.duration * 1000, 3) if root and root.duration is not None else None,
+            "spans": [s.to_dict() for s in spans],
+        }
+
+
+class Span:
+    __slots__ = ("id", "name", "attrs", "trace", "parent", "depth", "start", "duration", "error")
+
+    def __init__(self, name, attrs, parent):
+        self.id = uuid.uuid4().hex[:8]
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        # A root span's session_id attr tags the whole trace
+        self.trace = parent.trace if parent else Trace(name, attrs.get("session_id"))
+        self.depth = parent.depth + 1 if parent else 0
+        self.start = time.perf_counter()
+        self.duration = None
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self):
+        return {
+            "span_id": self.id,
+            "parent_id": self.parent.id if self.parent else None,
+            "name": self.name,
+            "depth": self.depth,
+            "start_ms": round((self.start - self.trace.start) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "error": self.error,
+            "attrs": self.attrs,
+        }
+
+
+def _observe(name, seconds, error):
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                hist[i] += 1
+                break
+        else:
+            hist[len(LATENCY_BUCKETS)] += 1
+        hist[-1] += seconds
+    if error:
+        incr("span_errors_total", span=name, error=error)
+
+
+def _finish_trace(trace):
+    with _lock:
+        _traces.append(trace)
+    log("trace", level="debug", name=trace.name, trace_id=trace.id,
+        duration_ms=round((time.perf_counter() - trace.start) * 1000, 3))
+    if TELEMETRY_JSONL:
+        line = json.dumps(trace.to_dict(), default=str)
+        with _lock, open(TELEMETRY_JSONL, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def _open(name, attrs):
+    return Span(name, dict(attrs), _current.get())
+
+
+def _close(span, error=None):
+    span.duration = time.perf_counter() - span.start
+    span.error = error
+    span.trace.add(span)
+    _observe(span.name, span.duration, error)
+    if span.parent is None:
+        _finish_trace(span.trace)
+
+
+class span:
+    """`with span("lancedb.write", rows=n) as s:` times the block."""
+
+    def __init__(self, name: str, **attrs):
+        self._span = _open(name, attrs)
+        self._token = None
+
+    def __enter__(self):
+        self._span.start = time.perf_counter()
+        if self._span.parent is None:
+            self._span.trace.start = self._span.start
+        self._token = _current.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        _close(self._span, exc_type.__name__ if exc_type else None)
+        return False
+
+
+def _traced_generator(name, fn, args, kwargs):
+    # The span is only current while the generator runs, so code the
+    # caller runs between items does not nest under it
+    s = _open(name, {})
+    error = None
+    try:
+        token = _current.set(s)
+        try:
+            it = fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+        while True:
+            token = _current.set(s)
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                _current.reset(token)
+            yield item
+    except GeneratorExit:
+        raise     # consumer stopped early; not an error
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _close(s, error)
+
+
+def traced(fn=None, *, name: str = None):
+    """Decorator: @traced or @traced(name="exa.search")."""
+    if fn is None:
+        return functools.partial(traced, name=name)
+
+    span_name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+    if inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def gen_wrapper(*args, **kwargs):
+            return _traced_generator(span_name, fn, args, kwargs)
+        return gen_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with span(span_name):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def propagate(fn):
+    """
+    Bind fn to the caller's current span, for running on another thread
+    (thread pools don't inherit context variables).
+    """
+    parent = _current.get()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return wrapper
+
+
+def current_trace_id():
+    current = _current.get()
+    return current.trace.id if current else None
+
+
+def recent_traces(limit: int = None, session_id: str = None):
+    """Finished traces, newest first, as dicts (only `session_id`'s if given)."""
+    with _lock:
+        traces = list(_traces)
+    traces.reverse()
+    if session_id is not None:
+        traces = [t for t in traces if t.session_id == session_id]
+    return [t.to_dict() for t in traces[:limit]]
+
+
+def last_trace(name: str = None):
+    """The newest finished trace (optionally with the given root name)."""
+    with _lock:
+        traces = list(_traces)
+    for t in reversed(traces):
+        if name is None or t.name == name:
+            return t.to_dict()
+    return None
+
+
+def get_trace(trace_id: str):
+    with _lock:
+        traces = list(_traces)
+    return next((t.to_dict() for t in reversed(traces) if t.id == trace_id), None)
+
+
+def latency_stats():
+    """{span name: {"count", "sum_seconds"}}."""
+    with _lock:
+        return {name: {"count": sum(h[:-1]), "sum_seconds": round(h[-1], 6)} for name, h in _histograms.items()}
+
+
+# ---------------------------------------------------------
+# Export
+# ---------------------------------------------------------
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    def esc(v):
+        return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+
+def _provider_gauges():
+    # Imported late: both modules import this one
+    from logic import rate_limit, resilience
+
+    lines = []
+    for provider, s in rate_limit.metrics().items():
+        for key in ("queue_depth", "max_queue_depth", "retries", "throttled", "errors"):
+            lines.append((f"rate_limit_{key}", (("provider", provider),), s[key]))
+    states = {"closed": 0, "half_open": 1, "open": 2}
+    for provider, s in resilience.stats().items():
+        lines.append(("circuit_state", (("provider", provider),), states.get(s["state"], -1)))
+        lines.append(("circuit_rejected", (("provider", provider),), s["rejected"]))
+        lines.append(("hedged_requests", (("provider", provider),), s["hedges"]))
+    return lines
+
+
+def prometheus_text():
+    """Metrics in the Prometheus text exposition format."""
+    out = []
+    with _lock:
+        hists = {k: list(v) for k, v in _histograms.items()}
+        counter_items = sorted(_counters.items())
+
+    metric = f"{METRIC_PREFIX}_span_seconds"
+    out.append(f"# TYPE {metric} histogram")
+    for name, hist in sorted(hists.items()):
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS, hist):
+            cumulative += n
+            out.append(f"{metric}_bucket{_labels([('span', name), ('le', bound)])} {cumulative}")
+        cumulative += hist[len(LATENCY_BUCKETS)]
+        out.append(f"{metric}_bucket{_labels([('span', name), ('le', '+Inf')])} {cumulative}")
+        out.append(f"{metric}_sum{_labels([('span', name)])} {hist[-1]}")
+        out.append(f"{metric}_count{_labels([('span', name)])} {cumulative}")
+
+    typed = set()
+    for (name, labels), value in counter_items:
+        if name not in typed:
+            out.append(f"# TYPE {METRIC_PREFIX}_{name} counter")
+            typed.add(name)
+        out.append(f"{METRIC_PREFIX}_{name}{_labels(labels)} {value}")
+
+    typed = set()
+    for name, labels, value in sorted(_provider_gauges(), key=lambda g: g[0]):
+        if name not in typed:
+            out.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+            typed.add(name)
+        out.append(f"{METRIC_PREFIX}_{name}{_labels(labels)} {value}")
+    return "\n".join(out) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/metrics":
+            body, ctype = prometheus_text().encode("utf-8"), "text/plain; version=0.0.4"
+        elif path == "/traces":
+            body, ctype = json.dumps(recent_traces(), default=str).encode("utf-8"), "application/json"
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port: int = None, host: str = "0.0.0.0"):
+    """Serve /metrics (Prometheus) and /traces (JSON) from a daemon thread."""
+    server = ThreadingHTTPServer((host, METRICS_PORT if port is None else port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="agent-carter-metrics", daemon=True).start()
+    log("metrics.server_started", port=server.server_address[1])
+    return server
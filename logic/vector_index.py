@@ -0,0 +1,175 @@
+# logic/vector_index.py
+import os
+import math
+import threading
+from datetime import datetime, timezone
+
+from logic.db_models import session_scope, VectorIndexState
+from logic import telemetry
+
+# Below this many rows a flat scan is as fast as an index
+INDEX_MIN_ROWS = int(os.getenv("LANCE_INDEX_MIN_ROWS", "5000"))
+# Rebuild once the table has grown by this fraction since the last build
+REINDEX_GROWTH = float(os.getenv("LANCE_REINDEX_GROWTH", "0.2"))
+
+# Search-time knobs (recall vs latency); None → LanceDB defaults
+DEFAULT_NPROBES = int(os.getenv("LANCE_NPROBES", "20"))
+DEFAULT_REFINE_FACTOR = int(os.getenv("LANCE_REFINE_FACTOR", "0")) or None
+
+# Tables with an index build running (one build per table at a time)
+_builds = {}
+_builds_lock = threading.Lock()
+
+
+# ---------------------------------------------------------
+# Index parameters
+# ---------------------------------------------------------
+
+def index_params(num_rows: int, dim: int):
+    """
+    IVF-PQ sizing derived from the table:
+    - partitions ≈ sqrt(rows), so each partition holds ~sqrt(rows) vectors
+    - sub-vectors: the largest divisor of dim that is ≤ dim / 16
+    """
+    num_partitions = max(1, min(4096, int(math.sqrt(num_rows))))
+    target = max(1, dim // 16)
+    num_sub_vectors = max(d for d in range(1, target + 1) if dim % d == 0)
+    return num_partitions, num_sub_vectors
+
+
+def _get_state(s, table_name):
+    state = s.get(VectorIndexState, table_name)
+    if state is None:
+        state = VectorIndexState(table_name=table_name, indexed_rows=0)
+    return state
+
+
+def reset_index_state(table_name: str):
+    """Forget the index of a table (e.g. after an overwrite dropped it)."""
+    with session_scope() as s:
+        state = _get_state(s, table_name)
+        state.indexed_rows = 0
+        s.merge(state)
+
+
+def needs_index(num_rows: int, indexed_rows: int, min_rows: int = None) -> bool:
+    min_rows = INDEX_MIN_ROWS if min_rows is None else min_rows
+    if num_rows < min_rows:
+        return False
+    if not indexed_rows:
+        return True
+    return num_rows >= indexed_rows * (1 + REINDEX_GROWTH)
+
+
+# ---------------------------------------------------------
+# Build / rebuild
+# ---------------------------------------------------------
+
+def ensure_vector_index(tbl, min_rows: int = None) -> bool:
+    """
+    Build or rebuild the cosine IVF-PQ index on `tbl` when it has passed
+    the row threshold, or has grown enough since the last build.
+    Returns True if an index was built.
+    """
+    num_rows = tbl.count_rows()
+
+    with session_scope() as s:
+        state = _get_state(s, tbl.name)
+    if not needs_index(num_rows, state.indexed_rows, min_rows):
+        return False
+
+    dim = tbl.schema.field("vector").type.list_size
+    num_partitions, num_sub_vectors = index_params(num_rows, dim)
+    telemetry.log("lancedb.build_vector_index", table=tbl.name, rows=num_rows,
+                  partitions=num_partitions, sub_vectors=num_sub_vectors)
+    tbl.create_index(
+        metric="cosine",
+        num_partitions=num_partitions,
+        num_sub_vectors=num_sub_vectors,
+        replace=True,
+    )
+
+    state.indexed_rows = num_rows
+    state.num_partitions = num_partitions
+    state.num_sub_vectors = num_sub_vectors
+    state.built_at = datetime.now(timezone.utc)
+    with session_scope() as s:
+        s.merge(state)
+    return True
+
+
+def _needs_scalar_index(tbl, column: str) -> bool:
+    if not hasattr(tbl, "create_scalar_index"):
+        return False   # older lancedb without scalar indexes
+    return not any(column in (getattr(idx, "columns", None) or []) for idx in tbl.list_indices())
+
+
+def ensure_scalar_index(tbl, column: str) -> bool:
+    """Create a BTREE index on a scalar column if it has none yet."""
+    if not _needs_scalar_index(tbl, column):
+        return False
+    telemetry.log("lancedb.build_scalar_index", table=tbl.name, column=column)
+    tbl.create_scalar_index(column)
+    return True
+
+
+# ---------------------------------------------------------
+# Background builds (keeps index work off the search path)
+# ---------------------------------------------------------
+
+def request_index(tbl, scalar_columns=(), min_rows: int = None) -> bool:
+    """
+    Called after writes: if `tbl` is due a vector index (or lacks a scalar
+    index on one of `scalar_columns`), build it in a background thread.
+    Searches keep using the flat scan, or the previous index, until the
+    new one is committed. Returns True if a build was started.
+    """
+    with session_scope() as s:
+        state = _get_state(s, tbl.name)
+    due = needs_index(tbl.count_rows(), state.indexed_rows, min_rows) or any(
+        _needs_scalar_index(tbl, c) for c in scalar_columns
+    )
+    if not due:
+        return False
+
+    with _builds_lock:
+        if tbl.name in _builds:
+            return False   # the running build picks up the new rows' count
+        t = threading.Thread(target=_build, args=(tbl, scalar_columns, min_rows),
+                             name=f"agent-carter-index-{tbl.name}", daemon=True)
+        _builds[tbl.name] = t
+    telemetry.log("lancedb.index_requested", table=tbl.name)
+    t.start()
+    return True
+
+
+def _build(tbl, scalar_columns, min_rows):
+    try:
+        with telemetry.span("lancedb.index", table=tbl.name):
+            for column in scalar_columns:
+                ensure_scalar_index(tbl, column)
+            ensure_vector_index(tbl, min_rows)
+    except Exception as e:
+        telemetry.log("lancedb.index_failed", level="error", table=tbl.name, error=str(e))
+    finally:
+        with _builds_lock:
+            _builds.pop(tbl.name, None)
+
+
+def wait_for_index_builds(timeout: float = None):
+    """Block until the background index builds running now have finished."""
+    with _builds_lock:
+        threads = list(_builds.values())
+    for t in threads:
+        t.join(timeout)
+
+
+def apply_search_params(query, nprobes=None, refine_factor=None):
+    """Set nprobes / refine_factor on a LanceDB vector query."""
+    nprobes = nprobes or DEFAULT_NPROBES
+    refine_factor = refine_factor or DEFAULT_REFINE_FACTOR
+    if nprobes:
+        query = query.nprobes(nprobes)
+    if refine_factor:
+        query = query.refine_factor(refine_factor)
+    return query
@@ -0,0 +1,8 @@
+# Archive old sent queue rows and outbox days (run daily, e.g. from cron).
+from logic.db_models import init_db
+from logic.retention import run_maintenance, compact_database
+
+init_db()
+result = run_maintenance()
+print(f"Archived {result['queue_archived']} queue rows and {result['outbox_archived']} outbox days.")
+compact_database()
@@ -0,0 +1,12 @@
+# Copy per-user LanceDB tables into the shared multi-tenant table.
+# Afterwards run the app with LANCE_LAYOUT=shared.
+import sys
+
+from logic.db_models import init_db
+from logic.db_ops import migrate_to_shared_table
+
+init_db()
+source_dir = sys.argv[1] if len(sys.argv) > 1 else None
+copied = migrate_to_shared_table(source_dir=source_dir)
+
+print(f"Migrated {sum(copied.values())} rows for {len(copied)} users.")
@@ -0,0 +1,274 @@
+# Local stand-in for the OpenAI, Exa and Gmail APIs, for offline
+# benchmarking and tests.
+#
+#   python mock_server.py --port 8765 --profile realistic
+#   AGENT_CARTER_MOCK_URL=http://127.0.0.1:8765 streamlit run app.py
+#
+# Responses are deterministic: embeddings are hashed bag-of-words vectors
+# from logic.hash_embeddings, the same ones the "hash" backend computes
+# (similar texts → similar vectors), chat drafts are templated from the
+# prompt, Exa results are derived from the query. Latency, streaming speed
+# and error rates come from a profile.
+import re
+import sys
+import json
+import time
+import base64
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from logic.hash_embeddings import hash_embed
+
+# Per-endpoint behaviour: base latency + uniform jitter (ms), delay per
+# streamed chunk (ms), probability of an error response, probability of a
+# slow tail request
+PROFILES = {
+    "instant": {},
+    "realistic": {
+        "embeddings": {"latency_ms": 150, "jitter_ms": 100},
+        "chat": {"latency_ms": 500, "jitter_ms": 300, "chunk_ms": 15},
+        "exa": {"latency_ms": 900, "jitter_ms": 600},
+        "gmail": {"latency_ms": 250, "jitter_ms": 100},
+    },
+    "flaky": {
+        "embeddings": {"latency_ms": 150, "jitter_ms": 100, "error_rate": 0.05, "tail_rate": 0.02, "tail_ms": 5000},
+        "chat": {"latency_ms": 500, "jitter_ms": 300, "chunk_ms": 15, "error_rate": 0.05},
+        "exa": {"latency_ms": 900, "jitter_ms": 600, "error_rate": 0.1, "tail_rate": 0.05, "tail_ms": 8000},
+        "gmail": {"latency_ms": 250, "jitter_ms": 100, "error_rate": 0.02},
+    },
+}
+
+EMBED_DIMS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072}
+
+
+# ---------------------------------------------------------
+# Deterministic payloads
+# ---------------------------------------------------------
+
+def _seed(text):
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+
+
+def _prompt_field(prompt, label):
+    m = re.search(rf"{label}:\s*(.*)", prompt)
+    return m.group(1).strip() if m else ""
+
+
+def chat_reply(prompt):
+    if "RETURN JSON ONLY" in prompt:
+        name = _prompt_field(prompt, "- Name") or "there"
+        headline = _prompt_field(prompt, "- Headline") or "your work"
+        return json.dumps({
+            "reason": [f"Relevant experience: {headline}", "Shared professional interests", "Open to networking"],
+            "drafted_dm": f"Hi {name}, I came across your profile ({headline}) and would love to connect.",
+            "email_subject": f"Connecting about {headline}"[:80],
+            "email_body": (
+                "Hi there,\n\nI came across your profile and was impressed by your work as "
+                f"{headline}. I'd love to hear how you got there and swap notes.\n\n"
+                "Would you be open to a 15-minute chat next week?\n\nBest regards,"
+            ),
+        })
+    tone = _prompt_field(prompt, "TONE REQUESTED") or "Professional"
+    m = re.search(r"CURRENT EMAIL BODY:\n(.*?)\n\nUSER REQUEST", prompt, re.DOTALL)
+    body = (m.group(1).strip() if m else "") or "Hi there,\n\nLet's connect."
+    return f"[{tone}] {body}"
+
+
+def exa_results(query, num_results, max_chars):
+    words = re.findall(r"\w+", query.lower().replace("site:linkedin.com/in", ""))
+    topic = " ".join(words) or "professional"
+    rng = random.Random(_seed(query))
+    out = []
+    for i in range(num_results):
+        slug = f"{'-'.join(words[:3]) or 'person'}-{i}-{rng.randrange(10**6):06d}"
+        text = (
+            f"{topic.title()} professional #{i}. Experience: {rng.randint(1, 25)} years in {topic}. "
+            "Education: State University. Skills: leadership, strategy, analytics, product. "
+        ) * 20
+        out.append({
+            "id": f"https://www.linkedin.com/in/{slug}",
+            "url": f"https://www.linkedin.com/in/{slug}",
+            "title": f"Person {i} – {topic.title()} | LinkedIn",
+            "score": round(1.0 - i / (num_results + 1), 4),
+            "publishedDate": None,
+            "author": None,
+            "text": text[:max_chars],
+        })
+    return out
+
+
+# ---------------------------------------------------------
+# Server
+# ---------------------------------------------------------
+
+class MockState:
+    def __init__(self, profile="instant", seed=0):
+        self.profile = PROFILES[profile] if isinstance(profile, str) else profile
+        self.rng = random.Random(seed)
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def settings(self, endpoint):
+        return self.profile.get(endpoint, {})
+
+    def roll(self, endpoint):
+        """(delay seconds, failing?) for one request, and count it."""
+        cfg = self.settings(endpoint)
+        with self.lock:
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+            delay = cfg.get("latency_ms", 0) + self.rng.uniform(0, cfg.get("jitter_ms", 0))
+            if self.rng.random() < cfg.get("tail_rate", 0):
+                delay += cfg.get("tail_ms", 0)
+            failing = self.rng.random() < cfg.get("error_rate", 0)
+        return delay / 1000.0, failing
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None     # set by make_server
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(n) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/_stats":
+            with self.state.lock:
+                return self._json(200, dict(self.state.counts))
+        self._json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    def do_POST(self):
+        routes = {
+            "/v1/embeddings": ("embeddings", self._embeddings),
+            "/v1/chat/completions": ("chat", self._chat),
+            "/search": ("exa", self._exa),
+            "/gmail/v1/users/me/messages/send": ("gmail", self._gmail),
+        }
+        path = self.path.split("?")[0]
+        if path not in routes:
+            return self._json(404, {"error": {"message": f"unknown path {path}"}})
+
+        endpoint, handler = routes[path]
+        body = self._body()
+        delay, failing = self.state.roll(endpoint)
+        time.sleep(delay)
+        if failing:
+            return self._json(
+                429, {"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_error"}},
+                headers={"Retry-After": "0.1"},
+            )
+        handler(body)
+
+    def _embeddings(self, body):
+        inputs = body.get("input", [])
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        model = body.get("model", "text-embedding-3-small")
+        dim = body.get("dimensions") or EMBED_DIMS.get(model, 1536)
+        vecs = hash_embed([t if isinstance(t, str) else " ".join(map(str, t)) for t in inputs], dim)
+        data = []
+        for i, vec in enumerate(vecs):
+            emb = (base64.b64encode(vec.tobytes()).decode()
+                   if body.get("encoding_format") == "base64" else vec.tolist())
+            data.append({"object": "embedding", "index": i, "embedding": emb})
+        tokens = sum(len(str(t)) // 4 + 1 for t in inputs)
+        self._json(200, {
+            "object": "list", "data": data, "model": model,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    def _chat(self, body):
+        prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+        content = chat_reply(prompt)
+        model = body.get("model", "gpt-4o-mini")
+        completion_id = f"chatcmpl-mock-{_seed(prompt) % 10**12}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            return self._json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                          "total_tokens": (len(prompt) + len(content)) // 4},
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        chunk_delay = self.state.settings("chat").get("chunk_ms", 0) / 1000.0
+
+        def event(delta, finish=None):
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                       "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        event({"role": "assistant", "content": ""})
+        for i in range(0, len(content), 4):
+            time.sleep(chunk_delay)
+            event({"content": content[i:i + 4]})
+        event({}, "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _exa(self, body):
+        text_opts = (body.get("contents") or {}).get("text") or {}
+        max_chars = text_opts.get("maxCharacters", 10_000) if isinstance(text_opts, dict) else 10_000
+        results = exa_results(body.get("query", ""), int(body.get("numResults") or 10), max_chars)
+        self._json(200, {"requestId": f"mock-{_seed(body.get('query', ''))}",
+                         "resolvedSearchType": body.get("type", "keyword"), "results": results})
+
+    def _gmail(self, body):
+        msg_id = f"{_seed(body.get('raw', '')):016x}"
+        self._json(200, {"id": msg_id, "threadId": msg_id, "labelIds": ["SENT"]})
+
+
+def make_server(host="127.0.0.1", port=0, profile="instant", seed=0):
+    """Build (but don't start) a server; port 0 picks a free port."""
+    handler = type("Handler", (MockHandler,), {"state": MockState(profile, seed)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_server(profile="instant", port=0, seed=0):
+    """Serve in a daemon thread; returns (server, base_url)."""
+    server = make_server(port=port, profile=profile, seed=seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI/Exa/Gmail stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="realistic")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.profile, args.seed)
+    print(f"Mock OpenAI/Exa/Gmail on http://{args.host}:{args.port} (profile={args.profile})")
+    print(f"Run the app with AGENT_CARTER_MOCK_URL=http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -0,0 +1,22 @@
+# Tests run against a throwaway database, Lance directory and embedding
+# cache, never the checked-in agent_carter.db. The settings are read when
+# logic.* is first imported, so they are set before any test module loads.
+import os
+import shutil
+import tempfile
+
+import pytest
+
+_workdir = tempfile.mkdtemp(prefix="agent_carter_tests_")
+os.environ["AGENT_CARTER_DB_URL"] = f"sqlite:///{os.path.join(_workdir, 'agent_carter.db')}"
+os.environ["LANCE_DB_DIR"] = os.path.join(_workdir, "lance")
+os.environ["EMBED_CACHE_PATH"] = os.path.join(_workdir, "embedding_cache.db")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    from logic.db_models import init_db
+
+    init_db()
+    yield
+    shutil.rmtree(_workdir, ignore_errors=True)
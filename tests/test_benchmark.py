@@ -0,0 +1,39 @@
+import json
+
+import benchmark
+
+
+def _doc(**stages):
+    return {"scales": {"1000": {"stages": {k: {"seconds": v} for k, v in stages.items()}}}}
+
+
+def test_synthetic_profiles_are_deterministic_and_unique():
+    a = benchmark.synthetic_profiles(0, 50)
+    assert a == benchmark.synthetic_profiles(0, 50)
+    assert benchmark.synthetic_profiles(10, 5) == a[10:15]
+    assert len({p["linkedin_url"] for p in a}) == 50
+
+
+def test_compare_flags_only_real_slowdowns():
+    old = _doc(search_lancedb=0.010, ingest_lancedb=1.0, fetch_queue=0.001)
+    new = _doc(search_lancedb=0.011, ingest_lancedb=1.5, fetch_queue=0.002)
+
+    rows, regressions = benchmark.compare(old, new, threshold=0.2)
+
+    assert len(rows) == 3
+    # fetch_queue doubled but stays under the noise floor
+    assert [r[1] for r in regressions] == ["ingest_lancedb"]
+
+
+def test_small_scale_run_records_every_stage(tmp_path):
+    out = tmp_path / "bench.json"
+    assert benchmark.main(["--scales", "200", "--out", str(out)]) == 0
+
+    result = json.loads(out.read_text())["scales"]["200"]
+    assert result["contacts"] == 200
+    assert set(result["stages"]) == {
+        "insert_contacts", "ingest_lancedb", "ingest_lancedb_noop", "is_stale_lancedb",
+        "search_lancedb", "fetch_queue", "prepare_today_from_queue",
+    }
+    assert all(s["seconds"] > 0 and s["peak_rss_mb"] > 0 for s in result["stages"].values())
+    assert benchmark.main(["--compare", str(out), str(out)]) == 0
@@ -0,0 +1,75 @@
+"""
+Load test for the SQLite engine configuration: concurrent readers and
+writers must not fail with "database is locked". Run with `pytest -s` to
+see how throughput scales with the number of threads.
+"""
+import time
+import threading
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from logic.db_config import make_engine
+from logic.db_models import Base, DailyQueue
+
+OPS_PER_THREAD = 50
+
+
+def _run(Session, n_writers, n_readers):
+    errors = []
+    finished = {"writer": [], "reader": []}
+
+    def writer(w):
+        for i in range(OPS_PER_THREAD):
+            try:
+                with Session.begin() as s:
+                    s.add(DailyQueue(
+                        user_id=f"load_{w}",
+                        linkedin_url=f"https://linkedin.com/in/load-{w}-{i}-{time.perf_counter_ns()}",
+                        added_at=datetime.now(timezone.utc),
+                        sent=False,
+                    ))
+            except Exception as e:
+                errors.append(e)
+        finished["writer"].append(time.perf_counter())
+
+    def reader(r):
+        for _ in range(OPS_PER_THREAD):
+            try:
+                with Session() as s:
+                    s.query(DailyQueue).filter(DailyQueue.user_id == f"load_{r}", DailyQueue.sent == False).count()
+            except Exception as e:
+                errors.append(e)
+        finished["reader"].append(time.perf_counter())
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(n_writers)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(n_readers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    w_rate = n_writers * OPS_PER_THREAD / (max(finished["writer"]) - start)
+    r_rate = n_readers * OPS_PER_THREAD / (max(finished["reader"]) - start)
+    return errors, w_rate, r_rate
+
+
+def test_engine_uses_wal_and_busy_timeout(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'cfg.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar().lower() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() >= 1000
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1   # NORMAL
+
+
+def test_concurrent_readers_and_writers_do_not_lock(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'load.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    print("\nthreads  writes/s  reads/s")
+    for n in (1, 2, 4, 8):
+        errors, w_rate, r_rate = _run(Session, n_writers=n, n_readers=n)
+        assert errors == []
+        print(f"{n:>7}  {w_rate:>8.0f}  {r_rate:>7.0f}")
@@ -1,5 +1,6 @@
+import pytest
 from logic.db_ops import today_key, add_to_queue
-from logic.db_models import SessionLocal, DailyQueue
+from logic.db_models import SessionLocal, DailyQueue, DailyQueueArchive
 
 def test_today_key_format():
     key = today_key()
@@ -30,3 +31,435 @@ def test_add_to_queue_deduplicates():
     assert add_to_queue(candidate, user_id=user_id) is True
     # Second add → False (duplicate)
     assert add_to_queue(candidate, user_id=user_id) is False
+
+
+def test_add_to_queue_skips_archived_profiles():
+    user_id = "test_archived_queue_user"
+    candidate = {"name": "Sent Before", "linkedin": "https://linkedin.com/in/sentbefore"}
+
+    s = SessionLocal()
+    s.query(DailyQueue).filter(DailyQueue.user_id == user_id).delete()
+    s.query(DailyQueueArchive).filter(DailyQueueArchive.user_id == user_id).delete()
+    s.add(DailyQueueArchive(user_id=user_id, linkedin_url=candidate["linkedin"], sent=True))
+    s.commit()
+    try:
+        assert add_to_queue(candidate, user_id=user_id) is False
+        # Other users' archives don't count
+        assert add_to_queue(candidate, user_id=user_id + "_other") is True
+    finally:
+        s.query(DailyQueue).filter(DailyQueue.user_id.in_([user_id, user_id + "_other"])).delete()
+        s.query(DailyQueueArchive).filter(DailyQueueArchive.user_id == user_id).delete()
+        s.commit()
+        s.close()
+
+
+def test_ingest_lancedb_delta_only_embeds_changes(tmp_path, monkeypatch):
+    import numpy as np
+    import logic.db_ops as db_ops
+    import logic.embeddings as embeddings
+    from logic.db_models import Contact
+
+    user_id = "test_ingest_user"
+    embedded = []
+
+    def fake_embed(docs):
+        embedded.append(list(docs))
+        return np.ones((len(docs), embeddings.EMBED_DIM), dtype=np.float32)
+
+    monkeypatch.setattr(embeddings, "DB_DIR", str(tmp_path))
+    monkeypatch.setattr(db_ops, "embed", fake_embed)
+
+    s = SessionLocal()
+    s.query(Contact).filter(Contact.user_id == user_id).delete()
+    s.commit()
+    s.close()
+
+    profiles = [
+        {"full_name": f"P{i}", "linkedin_url": f"https://linkedin.com/in/p{i}", "text": f"summary {i}"}
+        for i in range(3)
+    ]
+    db_ops.insert_contacts(profiles, user_id=user_id)
+
+    assert db_ops.ingest_lancedb(user_id=user_id, chunk_size=2) == {"added": 3, "updated": 0, "deleted": 0}
+    # Nothing changed → nothing embedded
+    assert db_ops.ingest_lancedb(user_id=user_id) == {"added": 0, "updated": 0, "deleted": 0}
+    assert [len(docs) for docs in embedded] == [2, 1]
+
+    s = SessionLocal()
+    rows = s.query(Contact).filter(Contact.user_id == user_id).order_by(Contact.id).all()
+    rows[0].headline = "New headline"
+    s.delete(rows[1])
+    s.commit()
+    s.close()
+
+    assert db_ops.ingest_lancedb(user_id=user_id, chunk_size=2) == {"added": 0, "updated": 1, "deleted": 1}
+    assert embedded[-1] == ["summary 0"]
+    assert embeddings.get_contacts_table(user_id=user_id).count_rows() == 2
+
+    s = SessionLocal()
+    s.query(Contact).filter(Contact.user_id == user_id).delete()
+    s.commit()
+    s.close()
+
+
+def test_delta_ingest_reads_only_new_and_pending_contacts(tmp_path, monkeypatch):
+    import numpy as np
+    from sqlalchemy import text
+    import logic.db_ops as db_ops
+    import logic.embeddings as embeddings
+    from logic.db_models import Contact, session_scope
+
+    user_id = "test_delta_reads_user"
+    monkeypatch.setattr(embeddings, "DB_DIR", str(tmp_path))
+    monkeypatch.setattr(
+        db_ops, "embed",
+        lambda docs: np.random.default_rng(len(docs)).random((len(docs), embeddings.EMBED_DIM), dtype=np.float32),
+    )
+    read = []
+    iter_chunks = db_ops._iter_contact_chunks
+
+    def counting(*args, **kwargs):
+        for rows in iter_chunks(*args, **kwargs):
+            read.extend(r.full_name for r in rows)
+            yield rows
+
+    monkeypatch.setattr(db_ops, "_iter_contact_chunks", counting)
+    profile = lambda i: {"full_name": f"R{i}", "linkedin_url": f"https://linkedin.com/in/r{i}", "text": f"r {i}"}
+    with session_scope() as s:
+        s.query(Contact).filter(Contact.user_id == user_id).delete()
+
+    try:
+        db_ops.insert_contacts([profile(i) for i in range(5)], user_id=user_id)
+        db_ops.ingest_lancedb(user_id=user_id)
+        read.clear()
+
+        assert db_ops.ingest_lancedb(user_id=user_id) == {"added": 0, "updated": 0, "deleted": 0}
+        assert read == []
+        db_ops.insert_contacts([profile(5)], user_id=user_id)
+        assert db_ops.ingest_lancedb(user_id=user_id) == {"added": 1, "updated": 0, "deleted": 0}
+        assert read == ["R5"]
+
+        # A write that skipped the ORM hooks is caught by the audit
+        with session_scope() as s:
+            s.execute(text("UPDATE contacts SET headline = 'changed' WHERE user_id = :u AND full_name = 'R0'"),
+                      {"u": user_id})
+        tbl = embeddings.get_contacts_table(user_id=user_id)
+        assert not db_ops.is_stale_lancedb(tbl, user_id=user_id)
+        assert db_ops.audit_lancedb_vectors(user_id=user_id, min_unique_ratio=0) is True
+        assert db_ops.audit_lancedb_vectors(user_id=user_id, min_unique_ratio=0) is False
+    finally:
+        with session_scope() as s:
+            s.query(Contact).filter(Contact.user_id == user_id).delete()
+
+
+def test_is_stale_lancedb_tracks_sql_changes(tmp_path, monkeypatch):
+    import numpy as np
+    import logic.db_ops as db_ops
+    import logic.embeddings as embeddings
+    from logic.db_models import Contact
+
+    user_id = "test_stale_user"
+    monkeypatch.setattr(embeddings, "DB_DIR", str(tmp_path))
+    monkeypatch.setattr(
+        db_ops, "embed",
+        lambda docs: np.random.default_rng(0).random((len(docs), embeddings.EMBED_DIM), dtype=np.float32),
+    )
+
+    s = SessionLocal()
+    s.query(Contact).filter(Contact.user_id == user_id).delete()
+    s.commit()
+    s.close()
+
+    profile = lambda i: {"full_name": f"S{i}", "linkedin_url": f"https://linkedin.com/in/s{i}", "text": f"s {i}"}
+    db_ops.insert_contacts([profile(0), profile(1)], user_id=user_id)
+
+    tbl = embeddings.get_contacts_table(user_id=user_id)
+    assert db_ops.is_stale_lancedb(tbl, user_id=user_id)      # never ingested
+
+    db_ops.ingest_lancedb(user_id=user_id)
+    tbl = embeddings.get_contacts_table(user_id=user_id)
+    assert not db_ops.is_stale_lancedb(tbl, user_id=user_id)
+    assert db_ops.audit_lancedb_vectors(user_id=user_id) is False
+
+    db_ops.insert_contacts([profile(2)], user_id=user_id)
+    assert db_ops.is_stale_lancedb(tbl, user_id=user_id)
+    db_ops.ingest_lancedb(user_id=user_id)
+
+    # Switching embedding models re-embeds every row, not just the delta
+    monkeypatch.setattr(db_ops, "EMBED_MODEL", "other-model")
+    assert db_ops.is_stale_lancedb(tbl, user_id=user_id)
+    assert db_ops.ingest_lancedb(user_id=user_id) == {"added": 3, "updated": 0, "deleted": 0}
+    assert not db_ops.is_stale_lancedb(tbl, user_id=user_id)
+
+    s = SessionLocal()
+    s.query(Contact).filter(Contact.user_id == user_id).delete()
+    s.commit()
+    s.close()
+
+
+@pytest.mark.parametrize("layout", ["per_user", "shared"])
+def test_full_ingest_with_no_contacts_clears_lance(tmp_path, monkeypatch, layout):
+    import numpy as np
+    import logic.db_ops as db_ops
+    import logic.embeddings as embeddings
+    from logic.db_models import Contact, session_scope
+
+    user_id, other = "test_empty_full_user", "test_empty_full_other"
+    monkeypatch.setattr(embeddings, "DB_DIR", str(tmp_path))
+    monkeypatch.setattr(embeddings, "LANCE_LAYOUT", layout)
+    monkeypatch.setattr(
+        db_ops, "embed",
+        lambda docs: np.random.default_rng(len(docs)).random((len(docs), embeddings.EMBED_DIM), dtype=np.float32),
+    )
+
+    def cleanup():
+        with session_scope() as s:
+            s.query(Contact).filter(Contact.user_id.in_([user_id, other])).delete()
+
+    cleanup()
+    try:
+        for u in (user_id, other):
+            db_ops.insert_contacts([{"full_name": f"{u} {i}", "linkedin_url": f"https://l/{u}/{i}"} for i in range(2)],
+                                   user_id=u)
+            db_ops.ingest_lancedb(user_id=u)
+        with session_scope() as s:
+            s.query(Contact).filter(Contact.user_id == user_id).delete()
+
+        assert db_ops.ingest_lancedb(user_id=user_id, mode="full") == {"added": 0, "updated": 0, "deleted": 0}
+        tbl = embeddings.get_contacts_table(user_id=user_id)
+        assert tbl.count_rows(embeddings.user_filter(user_id)) == 0
+        assert not db_ops.is_stale_lancedb(tbl, user_id=user_id)
+        # The other user's rows are untouched
+        assert embeddings.get_contacts_table(user_id=other).count_rows(embeddings.user_filter(other)) == 2
+    finally:
+        cleanup()
+
+
+def test_shared_layout_filters_by_user_and_migrates(tmp_path, monkeypatch):
+    import numpy as np
+    import logic.db_ops as db_ops
+    import logic.embeddings as embeddings
+    from logic.db_models import Contact
+
+    users = ["test_shared_a", "test_shared_b"]
+    monkeypatch.setattr(embeddings, "DB_DIR", str(tmp_path))
+    monkeypatch.setattr(db_ops, "DB_DIR", str(tmp_path))
+    monkeypatch.setattr(
+        db_ops, "embed",
+        lambda docs: np.random.default_rng(len(docs)).random((len(docs), embeddings.EMBED_DIM), dtype=np.float32),
+    )
+    monkeypatch.setattr(db_ops, "embed_query", lambda q: [1.0] * embeddings.EMBED_DIM)
+
+    s = SessionLocal()
+    s.query(Contact).filter(Contact.user_id.in_(users)).delete()
+    s.commit()
+    s.close()
+
+    for u in users:
+        db_ops.insert_contacts(
+            [{"full_name": f"{u}-{i}", "linkedin_url": f"https://linkedin.com/in/{u}-{i}", "text": f"{u} {i}"}
+             for i in range(3)],
+            user_id=u,
+        )
+        db_ops.ingest_lancedb(user_id=u)   # per-user tables
+
+    monkeypatch.setattr(embeddings, "LANCE_LAYOUT", "shared")
+    assert db_ops.migrate_to_shared_table() == {users[0]: 3, users[1]: 3}
+
+    tbl = embeddings.get_contacts_table(user_id=users[0])
+    assert tbl.name == "contacts"
+    assert tbl.count_rows() == 6
+
+    df = db_ops.search_lancedb("anything", user_id=users[0], n=10)
+    assert sorted(m["name"] for m in df["meta"]) == [f"{users[0]}-{i}" for i in range(3)]
+    assert "profile_summary" not in df.columns and "vector" not in df.columns
+
+    # Delta ingest for one user leaves the other user's rows alone
+    assert db_ops.ingest_lancedb(user_id=users[1]) == {"added": 0, "updated": 0, "deleted": 0}
+    assert tbl.count_rows() == 6
+
+    s = SessionLocal()
+    s.query(Contact).filter(Contact.user_id.in_(users)).delete()
+    s.commit()
+    s.close()
+
+
+def test_vectors_to_arrow_is_zero_copy():
+    import numpy as np
+    import pyarrow as pa
+    from logic.db_ops import _vectors_to_arrow
+
+    vecs = np.arange(12, dtype=np.float32).reshape(3, 4)
+    arr = _vectors_to_arrow(vecs, pa.list_(pa.float32(), list_size=4))
+
+    assert arr.values.buffers()[1].address == vecs.ctypes.data
+    assert arr.to_pylist()[2] == [8.0, 9.0, 10.0, 11.0]
+
+
+def test_bulk_insert_contacts_dedupes_and_returns_new_ids():
+    from logic.db_ops import bulk_insert_contacts
+    from logic.db_models import Contact
+
+    user_id = "test_bulk_user"
+    s = SessionLocal()
+    s.query(Contact).filter(Contact.user_id == user_id).delete()
+    s.commit()
+    s.close()
+
+    url = lambda i: f"https://linkedin.com/in/bulk{i}"
+    first = bulk_insert_contacts(
+        [{"linkedin_url": url(0)}, {"linkedin_url": url(1)}, {"linkedin_url": url(0)}],
+        user_id=user_id,
+    )
+    assert len(first) == 2
+
+    second = bulk_insert_contacts([{"linkedin_url": url(1)}, {"linkedin_url": url(2)}], user_id=user_id)
+    assert len(second) == 1
+
+    s = SessionLocal()
+    rows = s.query(Contact).filter(Contact.user_id == user_id).all()
+    assert sorted(r.id for r in rows) == sorted(first + second)
+    s.query(Contact).filter(Contact.user_id == user_id).delete()
+    s.commit()
+    s.close()
+
+
+def test_page_queue_walks_all_rows_with_cursor():
+    from logic.db_ops import page_queue
+
+    user_id = "test_page_user"
+    s = SessionLocal()
+    s.query(DailyQueue).filter(DailyQueue.user_id == user_id).delete()
+    s.commit()
+    s.close()
+
+    for i in range(5):
+        add_to_queue({"name": f"Q{i}", "linkedin": f"https://linkedin.com/in/q{i}"}, user_id=user_id)
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        rows, cursor = page_queue(user_id, cursor=cursor, limit=2)
+        seen.extend(r.full_name for r in rows)
+        pages += 1
+        if cursor is None:
+            break
+
+    assert seen == [f"Q{i}" for i in range(5)]
+    assert pages == 3
+    assert page_queue(user_id, sent=True) == ([], None)
+
+    s = SessionLocal()
+    s.query(DailyQueue).filter(DailyQueue.user_id == user_id).delete()
+    s.commit()
+    s.close()
+
+
+def test_predraft_queue_stores_drafts_and_retries(monkeypatch):
+    import logic.db_ops as db_ops
+    from logic.db_models import Outbox
+
+    user_id = "test_predraft_user"
+    calls = {}
+
+    def fake_draft(purpose, candidate, refresh=False, priority=None):
+        n = calls[candidate["name"]] = calls.get(candidate["name"], 0) + 1
+        if candidate["name"] == "D1" and n == 1:
+            raise RuntimeError("rate limited")
+        if candidate["name"] == "D2":
+            return {"reason": [], "drafted_dm": "", "email_subject": "", "email_body": ""}
+        return {"reason": ["a", "b"], "drafted_dm": f"dm {candidate['name']}",
+                "email_subject": "subj", "email_body": "body"}
+
+    monkeypatch.setattr(db_ops, "cached_draft_outreach", fake_draft)
+    monkeypatch.setattr(db_ops.time, "sleep", lambda s: None)
+
+    def cleanup():
+        s = SessionLocal()
+        s.query(DailyQueue).filter(DailyQueue.user_id == user_id).delete()
+        s.query(Outbox).filter(Outbox.user_id == user_id).delete()
+        s.commit()
+        s.close()
+
+    cleanup()
+    for i in range(3):
+        add_to_queue({"name": f"D{i}", "linkedin": f"https://linkedin.com/in/d{i}"}, user_id=user_id)
+
+    try:
+        assert db_ops.predraft_queue(user_id, workers=3) == {"drafted": 2, "failed": 1}
+        assert calls == {"D0": 1, "D1": 2, "D2": db_ops.DRAFT_RETRIES}
+
+        s = SessionLocal()
+        row = s.query(DailyQueue).filter(DailyQueue.user_id == user_id, DailyQueue.full_name == "D0").one()
+        assert (row.reason, row.drafted_dm, row.email_subject, row.drafted_email) == ("a\nb", "dm D0", "subj", "body")
+        s.close()
+
+        # The outbox step reads the stored draft instead of calling the LLM
+        monkeypatch.setattr(db_ops, "cached_draft_outreach", lambda *a, **k: pytest.fail("LLM called"))
+        outbox, status = db_ops.prepare_today_from_queue(user_id, email_to="x@example.com", overwrite=True)
+        assert status == "prepared_from_queue"
+        assert outbox.drafted_dm == "dm D0" and outbox.reason == "a\nb"
+    finally:
+        cleanup()
+
+
+def test_predrafted_queue_rows_are_cached_for_the_outreach_panel(monkeypatch):
+    import logic.db_ops as db_ops
+    import logic.llm_ops as llm_ops
+    from logic.db_models import DraftCache
+    from logic.draft_cache import get_cached_draft, OUTREACH_PURPOSE
+
+    user_id = "test_predraft_panel_user"
+    monkeypatch.setattr(llm_ops, "draft_outreach", lambda purpose, candidate, priority=None: {
+        "reason": ["r"], "drafted_dm": f"dm for {purpose}", "email_subject": "s", "email_body": "b",
+    })
+    # What the panel gets from "Use for Outreach"
+    panel_candidate = {"name": "Q0", "headline": "PM", "linkedin": "https://linkedin.com/in/q0"}
+
+    def cleanup():
+        s = SessionLocal()
+        s.query(DailyQueue).filter(DailyQueue.user_id == user_id).delete()
+        s.query(DraftCache).filter(DraftCache.purpose == OUTREACH_PURPOSE).delete()
+        s.commit()
+        s.close()
+
+    cleanup()
+    add_to_queue(panel_candidate, user_id=user_id)
+    try:
+        assert db_ops.predraft_queue(user_id) == {"drafted": 1, "failed": 0}
+        assert get_cached_draft(OUTREACH_PURPOSE, panel_candidate)["drafted_dm"] == "dm for networking outreach"
+    finally:
+        cleanup()
+
+
+def test_stored_queue_draft_is_only_reused_for_its_query(monkeypatch):
+    import logic.db_ops as db_ops
+    from logic.db_models import Outbox
+
+    user_id = "test_predraft_purpose_user"
+    purposes = []
+
+    def fake_draft(purpose, candidate, refresh=False, priority=None):
+        purposes.append(purpose)
+        return {"reason": ["r"], "drafted_dm": f"dm for {purpose}", "email_subject": "s", "email_body": "b"}
+
+    monkeypatch.setattr(db_ops, "cached_draft_outreach", fake_draft)
+
+    def cleanup():
+        s = SessionLocal()
+        s.query(DailyQueue).filter(DailyQueue.user_id == user_id).delete()
+        s.query(Outbox).filter(Outbox.user_id == user_id).delete()
+        s.commit()
+        s.close()
+
+    cleanup()
+    add_to_queue({"name": "P0", "linkedin": "https://linkedin.com/in/p0"}, user_id=user_id)
+    try:
+        assert db_ops.predraft_queue(user_id, query="fintech founders") == {"drafted": 1, "failed": 0}
+        # Same query again: nothing to do
+        assert db_ops.predraft_queue(user_id, query="fintech founders") == {"drafted": 0, "failed": 0}
+
+        outbox, _ = db_ops.prepare_today_from_queue(user_id, email_to="x@example.com", query="climate investors")
+        assert outbox.drafted_dm == "dm for climate investors"
+        assert purposes == ["fintech founders", "climate investors"]
+    finally:
+        cleanup()
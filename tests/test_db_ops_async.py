@@ -0,0 +1,56 @@
+import asyncio
+
+from logic import db_ops, db_ops_async
+from logic.db_models import SessionLocal, Contact, DailyQueue
+
+
+def _cleanup(user_id):
+    s = SessionLocal()
+    s.query(Contact).filter(Contact.user_id == user_id).delete()
+    s.query(DailyQueue).filter(DailyQueue.user_id == user_id).delete()
+    s.commit()
+    s.close()
+
+
+def test_async_api_matches_sync_api():
+    user_id = "test_async_user"
+    _cleanup(user_id)
+    profiles = [{"full_name": f"A{i}", "linkedin_url": f"https://linkedin.com/in/async{i}"} for i in range(3)]
+    candidate = {"name": "A0", "headline": "", "linkedin": profiles[0]["linkedin_url"]}
+
+    async def scenario():
+        try:
+            ids, added = await asyncio.gather(
+                db_ops_async.bulk_insert_contacts(profiles, user_id),
+                db_ops_async.add_to_queue(candidate, user_id),
+            )
+            again = await db_ops_async.add_to_queue(candidate, user_id)
+            queue = await db_ops_async.fetch_queue(user_id)
+            count = await db_ops_async.count_contacts(user_id)
+            return ids, added, again, queue, count
+        finally:
+            await db_ops_async.dispose_engine()
+
+    ids, added, again, queue, count = asyncio.run(scenario())
+
+    assert len(ids) == 3 and count == 3
+    assert added is True and again is False
+    assert [q.linkedin_url for q in queue] == [candidate["linkedin"]]
+    # Sync API sees the same rows
+    assert db_ops.count_contacts(user_id) == 3
+    assert len(db_ops.fetch_queue(user_id)) == 1
+
+    _cleanup(user_id)
+
+
+def test_dispose_engine_allows_a_new_event_loop():
+    async def count():
+        try:
+            return await db_ops_async.count_contacts("test_async_dispose_user")
+        finally:
+            await db_ops_async.dispose_engine()
+
+    assert asyncio.run(count()) == 0
+    # A second loop gets its own engine instead of the disposed one
+    assert asyncio.run(count()) == 0
+    assert db_ops_async._engine is None
@@ -0,0 +1,56 @@
+import logic.draft_cache as draft_cache
+import logic.llm_ops as llm_ops
+from logic.db_models import session_scope, DraftCache
+
+CANDIDATE = {"name": "Cache Person", "headline": "PM at CacheCo", "linkedin": "https://linkedin.com/in/cache"}
+
+
+def test_cached_draft_outreach_calls_llm_once_until_regenerated(monkeypatch):
+    calls = []
+
+    def fake_draft(purpose, candidate, priority=None):
+        calls.append(purpose)
+        return {"reason": ["r"], "drafted_dm": f"dm {len(calls)}", "email_subject": "s", "email_body": "b"}
+
+    monkeypatch.setattr(llm_ops, "draft_outreach", fake_draft)
+    key = draft_cache.draft_cache_key("test purpose", CANDIDATE)
+    with session_scope() as s:
+        s.query(DraftCache).filter(DraftCache.cache_key == key).delete()
+
+    try:
+        first = draft_cache.cached_draft_outreach("test purpose", CANDIDATE)
+        assert draft_cache.cached_draft_outreach("test purpose", CANDIDATE) == first
+        assert calls == ["test purpose"]
+
+        assert draft_cache.cached_draft_outreach("test purpose", CANDIDATE, refresh=True)["drafted_dm"] == "dm 2"
+        assert draft_cache.cached_draft_outreach("test purpose", CANDIDATE)["drafted_dm"] == "dm 2"
+
+        # A new prompt version is a different key
+        monkeypatch.setattr(llm_ops, "PROMPT_VERSION", "test-v2")
+        assert draft_cache.get_cached_draft("test purpose", CANDIDATE) is None
+    finally:
+        with session_scope() as s:
+            s.query(DraftCache).filter(DraftCache.purpose == "test purpose").delete()
+
+
+def test_incomplete_drafts_are_not_cached(monkeypatch):
+    replies = iter([
+        {"reason": [], "drafted_dm": "", "email_subject": "", "email_body": ""},      # unparseable
+        {"reason": ["r"], "drafted_dm": "dm", "email_subject": "s", "email_body": ""},  # cut short
+        {"reason": ["r"], "drafted_dm": "dm", "email_subject": "s", "email_body": "b"},
+    ])
+    monkeypatch.setattr(llm_ops, "draft_outreach", lambda purpose, candidate, priority=None: next(replies))
+    key = draft_cache.draft_cache_key("incomplete purpose", CANDIDATE)
+    with session_scope() as s:
+        s.query(DraftCache).filter(DraftCache.cache_key == key).delete()
+
+    try:
+        assert draft_cache.cached_draft_outreach("incomplete purpose", CANDIDATE)["drafted_dm"] == ""
+        assert draft_cache.get_cached_draft("incomplete purpose", CANDIDATE) is None
+        assert draft_cache.cached_draft_outreach("incomplete purpose", CANDIDATE)["email_body"] == ""
+        assert draft_cache.get_cached_draft("incomplete purpose", CANDIDATE) is None
+        assert draft_cache.cached_draft_outreach("incomplete purpose", CANDIDATE)["email_body"] == "b"
+        assert draft_cache.get_cached_draft("incomplete purpose", CANDIDATE)["drafted_dm"] == "dm"
+    finally:
+        with session_scope() as s:
+            s.query(DraftCache).filter(DraftCache.cache_key == key).delete()
@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+import logic.embeddings as embeddings
+import logic.embedding_cache as embedding_cache_module
+from logic.embedding_cache import EmbeddingCache, QueryCache, text_hash
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def create(self, model, input):
+        self.calls.append(list(input))
+        data = [
+            SimpleNamespace(index=i, embedding=[float(len(t))] * embeddings.EMBED_DIM)
+            for i, t in enumerate(input)
+        ]
+        return SimpleNamespace(data=data)
+
+
+def test_cache_roundtrip_and_counters(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.db"))
+    h = text_hash("hello")
+
+    assert cache.get_many("m", [h]) == {}
+    cache.put_many("m", [h], [np.array([1.0, 2.0], dtype=np.float32)])
+
+    found = cache.get_many("m", [h])
+    assert np.allclose(found[h], [1.0, 2.0])
+    # Different model → different key
+    assert cache.get_many("other", [h]) == {}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.db"), max_entries=2)
+    vec = np.zeros(2, dtype=np.float32)
+
+    cache.put_many("m", ["a"], [vec])
+    cache.put_many("m", ["b"], [vec])
+    cache.get_many("m", ["a"])          # "b" is now least recently used
+    cache.put_many("m", ["c"], [vec])
+
+    assert len(cache) == 2
+    assert set(cache.get_many("m", ["a", "b", "c"])) == {"a", "c"}
+
+
+def test_embed_only_calls_api_for_misses(tmp_path, monkeypatch):
+    fake = FakeEmbeddings()
+    monkeypatch.setattr(embeddings, "client", SimpleNamespace(embeddings=fake))
+    monkeypatch.setattr(embeddings, "embedding_cache", EmbeddingCache(path=str(tmp_path / "cache.db")))
+
+    first = embeddings.embed(["a", "bb", "a"])
+    assert fake.calls == [["a", "bb"]]
+    assert first.shape == (3, embeddings.EMBED_DIM)
+
+    second = embeddings.embed(["bb", "a"])
+    assert len(fake.calls) == 1
+    assert np.allclose(second, first[[1, 0]])
+
+
+def test_query_cache_normalizes_and_expires(monkeypatch):
+    cache = QueryCache(max_size=2, ttl=10)
+    now = [100.0]
+    monkeypatch.setattr(embedding_cache_module.time, "monotonic", lambda: now[0])
+
+    cache.put("m", "  NYC   Product Manager ", [1.0])
+    assert cache.get("m", "nyc product manager") is not None
+    assert cache.get("other-model", "nyc product manager") is None
+
+    now[0] += 11
+    assert cache.get("m", "nyc product manager") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_query_cache_is_bounded_lru():
+    cache = QueryCache(max_size=2, ttl=60)
+    cache.put("m", "a", [1.0])
+    cache.put("m", "b", [2.0])
+    cache.get("m", "a")
+    cache.put("m", "c", [3.0])
+
+    assert len(cache) == 2
+    assert cache.get("m", "b") is None
+
+
+def test_embed_query_hits_cache_on_repeat(tmp_path, monkeypatch):
+    fake = FakeEmbeddings()
+    monkeypatch.setattr(embeddings, "client", SimpleNamespace(embeddings=fake))
+    monkeypatch.setattr(embeddings, "embedding_cache", EmbeddingCache(path=str(tmp_path / "cache.db")))
+    monkeypatch.setattr(embeddings, "query_cache", QueryCache())
+
+    embeddings.embed_query("Fintech PM")
+    embeddings.embed_query("fintech  pm")
+    # Cached under the normalized form, but the model sees the query as typed
+    assert fake.calls == [["Fintech PM"]]
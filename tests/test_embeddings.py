@@ -0,0 +1,141 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import logic.embeddings as embeddings
+import logic.rate_limit as rate_limit
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class FlakyEmbeddings:
+    """Fake embeddings endpoint: vector = [len(text), ...]; fails once per listed text."""
+
+    def __init__(self, fail_on=()):
+        self.calls = []
+        self.fail_on = set(fail_on)
+
+    def create(self, model, input):
+        self.calls.append(list(input))
+        failing = self.fail_on.intersection(input)
+        if failing:
+            self.fail_on -= failing
+            raise RateLimitError("rate limited")
+        # Return out of order to make sure callers sort by index
+        data = [
+            SimpleNamespace(index=i, embedding=[float(len(t))] * embeddings.EMBED_DIM)
+            for i, t in enumerate(input)
+        ]
+        return SimpleNamespace(data=list(reversed(data)))
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    def install(fake):
+        monkeypatch.setattr(embeddings, "client", SimpleNamespace(embeddings=fake))
+        monkeypatch.setattr(rate_limit.time, "sleep", lambda s: None)
+        return fake
+    return install
+
+
+def test_plan_batches_respects_item_and_token_limits():
+    texts = ["x" * 40] * 10            # ~11 estimated tokens each
+    assert embeddings._plan_batches(texts, max_items=4, max_tokens=10_000) == [(0, 4), (4, 8), (8, 10)]
+    assert embeddings._plan_batches(texts, max_items=100, max_tokens=25) == [(0, 2), (2, 4), (4, 6), (6, 8), (8, 10)]
+    # A single oversized text still gets its own batch
+    assert embeddings._plan_batches(["x" * 1000], max_items=10, max_tokens=5) == [(0, 1)]
+
+
+def test_embed_uncached_keeps_order_and_retries_failed_batch(fake_client, monkeypatch):
+    monkeypatch.setattr(embeddings.backend, "max_items", 3)
+    fake = fake_client(FlakyEmbeddings(fail_on={"aaaa"}))
+    texts = ["a" * n for n in range(1, 11)]
+
+    out = embeddings._embed_uncached(texts)
+
+    assert out.dtype == np.float32 and out.flags["C_CONTIGUOUS"]
+    assert out[:, 0].tolist() == [float(n) for n in range(1, 11)]
+    # 4 batches + one retry of the failing batch only
+    assert len(fake.calls) == 5
+    assert sorted(map(len, fake.calls)) == [1, 3, 3, 3, 3]
+
+
+def test_embed_caches_completed_batches_when_another_fails(fake_client, monkeypatch):
+    class BadRequest(Exception):
+        status_code = 400   # not retried
+
+    class FailsOnce(FlakyEmbeddings):
+        def create(self, model, input):
+            if self.fail_on.intersection(input):
+                self.fail_on -= set(input)
+                self.calls.append(list(input))
+                raise BadRequest("bad batch")
+            return super().create(model, input)
+
+    monkeypatch.setattr(embeddings.backend, "max_items", 2)
+    monkeypatch.setattr(embeddings.backend, "workers", 1)
+    fake = fake_client(FailsOnce(fail_on={"persist-b-1"}))
+    texts = ["persist-a-0", "persist-a-01", "persist-b-1", "persist-b-12"]
+
+    with pytest.raises(BadRequest):
+        embeddings.embed(texts)
+    fake.calls.clear()
+    out = embeddings.embed(texts)
+
+    # The first batch was cached before the second failed
+    assert fake.calls == [["persist-b-1", "persist-b-12"]]
+    assert out[:, 0].tolist() == [float(len(t)) for t in texts]
+
+
+def test_embedding_batches_use_their_own_bucket():
+    assert embeddings.OpenAIBackend.provider in rate_limit.PROVIDER_LIMITS
+    _, tpm = rate_limit.PROVIDER_LIMITS[embeddings.OpenAIBackend.provider]
+    assert embeddings.MAX_BATCH_TOKENS * embeddings.EMBED_WORKERS < tpm
+
+
+def test_table_name_and_schema_follow_backend_dimension(monkeypatch):
+    assert embeddings.contacts_table_name("u1") == "u1_contacts"
+    assert embeddings.contacts_table_name() == "contacts"
+
+    monkeypatch.setattr(embeddings, "EMBED_DIM", 384)
+    assert embeddings.contacts_table_name("u1") == "u1_contacts_384"
+    assert embeddings.lancedb_schema().field("vector").type.list_size == 384
+
+
+def test_local_dimension_comes_from_the_model():
+    def loaded(expected_dim=None):
+        b = embeddings.OnnxBackend(model="fake-model", expected_dim=expected_dim)
+        b._st_model = SimpleNamespace(get_sentence_embedding_dimension=lambda: 768)
+        return b
+
+    assert loaded().dim == 768
+    assert loaded(expected_dim=768).dim == 768
+    with pytest.raises(ValueError, match="EMBED_LOCAL_DIM=384"):
+        loaded(expected_dim=384).dim
+
+
+def test_make_backend_rejects_unknown_name():
+    assert isinstance(embeddings.make_backend("onnx"), embeddings.OnnxBackend)
+    with pytest.raises(ValueError):
+        embeddings.make_backend("nope")
+
+
+def test_hash_backend_is_deterministic_and_normalised():
+    backend = embeddings.make_backend("hash")
+    vecs = backend.embed_batch(["fintech product manager", "fintech product manager", "pastry chef", ""])
+
+    assert vecs.shape == (4, backend.dim)
+    assert np.array_equal(vecs[0], vecs[1])
+    assert np.allclose(np.linalg.norm(vecs, axis=1), 1.0)
+    assert vecs[0] @ backend.embed_batch(["product manager"])[0] > vecs[2] @ backend.embed_batch(["product manager"])[0]
+
+
+def test_openai_clients_leave_retries_to_rate_limit():
+    import logic.llm_ops as llm_ops
+
+    # SDK retries would stack under rate_limit.call's own backoff
+    assert embeddings.client.max_retries == 0
+    assert llm_ops.client.max_retries == 0
@@ -0,0 +1,29 @@
+import pyarrow as pa
+import lancedb
+
+import logic.lance_store as lance_store
+from logic.lance_store import LanceRegistry, get_registry
+
+
+SCHEMA = pa.schema([("id", pa.string())])
+
+
+def test_registry_reuses_connection_and_handles(tmp_path):
+    reg = LanceRegistry(str(tmp_path))
+    assert not reg.has_table("t")
+
+    created = reg.create_table("t", schema=SCHEMA)
+    assert reg.has_table("t")
+    assert reg.open_table("t") is created
+    assert get_registry(str(tmp_path)) is get_registry(str(tmp_path))
+
+
+def test_registry_picks_up_external_writes_after_interval(tmp_path, monkeypatch):
+    reg = LanceRegistry(str(tmp_path))
+    reg.create_table("t", schema=SCHEMA)
+
+    # Another connection (e.g. another process) appends a row
+    lancedb.connect(str(tmp_path)).open_table("t").add(pa.table({"id": ["1"]}))
+
+    monkeypatch.setattr(lance_store, "REFRESH_INTERVAL", -1)
+    assert reg.open_table("t").count_rows() == 1
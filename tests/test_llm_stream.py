@@ -0,0 +1,57 @@
+import json
+from types import SimpleNamespace
+
+import logic.llm_ops as llm_ops
+from logic.llm_ops import _partial_json_object
+
+
+class FakeStreamingCompletions:
+    def __init__(self, text, size=3):
+        self.text = text
+        self.size = size
+
+    def create(self, model, messages, stream=False):
+        assert stream
+        return (
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=self.text[i:i + self.size]))])
+            for i in range(0, len(self.text), self.size)
+        )
+
+
+def _fake_client(monkeypatch, text):
+    completions = FakeStreamingCompletions(text)
+    monkeypatch.setattr(llm_ops, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+
+
+def test_partial_json_object_parses_prefixes():
+    assert _partial_json_object('```json\n') == {}
+    assert _partial_json_object('{"reason": ["a", "b') == {"reason": ["a", "b"]}
+    assert _partial_json_object('{"reason": [], "drafted_') == {"reason": []}
+    assert _partial_json_object('{"drafted_dm": "Hi\\') == {"drafted_dm": "Hi"}
+    assert _partial_json_object('{"drafted_dm": "caf\\u00') == {"drafted_dm": "caf"}
+    assert _partial_json_object('{"drafted_dm": "x"}\n```') == {"drafted_dm": "x"}
+
+
+def test_draft_outreach_stream_grows_fields_and_ends_complete(monkeypatch):
+    final = {
+        "reason": ["shared school", "same industry"],
+        "drafted_dm": "Hi — \"quick\" question about fintech.",
+        "email_subject": "Hello",
+        "email_body": "Hi there,\n\nLong body.\n\nBest regards,",
+    }
+    _fake_client(monkeypatch, "```json\n" + json.dumps(final) + "\n```")
+
+    drafts = list(llm_ops.draft_outreach_stream("networking", {"name": "X"}))
+    dms = [d["drafted_dm"] for d in drafts]
+
+    assert drafts[-1] == final
+    assert len(drafts) > 5
+    # The DM only ever grows while it streams
+    assert all(final["drafted_dm"].startswith(dm) for dm in dms)
+
+
+def test_chat_refine_stream_yields_text_chunks(monkeypatch):
+    _fake_client(monkeypatch, "\n  Rewritten email body.")
+    chunks = list(llm_ops.chat_refine_stream("warmer", {"dm": "", "email_body": "Old"}))
+    assert len(chunks) > 1
+    assert "".join(chunks) == "Rewritten email body."
@@ -0,0 +1,134 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from logic.db_config import make_engine
+from logic.db_models import Base, contact_content_hash
+from logic.migrations import MIGRATIONS, run_migrations, schema_version, _index_columns
+from logic.summary_codec import decompress_text
+
+# Schema as created by the original models
+LEGACY_DDL = [
+    """CREATE TABLE daily_queue (
+        id INTEGER NOT NULL, linkedin_url VARCHAR(500), full_name VARCHAR(255),
+        headline VARCHAR(700), reason TEXT, drafted_dm TEXT, drafted_email TEXT,
+        added_at DATETIME, sent BOOLEAN, user_id VARCHAR,
+        PRIMARY KEY (id), UNIQUE (linkedin_url))""",
+    "CREATE INDEX ix_daily_queue_user_id ON daily_queue (user_id)",
+    """CREATE TABLE outbox (
+        id INTEGER NOT NULL, day VARCHAR(10), email_to VARCHAR(320), "query" TEXT,
+        source VARCHAR(32), linkedin_url VARCHAR(500), full_name VARCHAR(255),
+        headline VARCHAR(700), summary TEXT, match_pct INTEGER, reason TEXT,
+        drafted_dm TEXT, email_subject TEXT, email_body TEXT, created_at DATETIME,
+        sent BOOLEAN, user_id VARCHAR, PRIMARY KEY (id))""",
+    "CREATE INDEX ix_outbox_user_id ON outbox (user_id)",
+    """CREATE TABLE contacts (
+        id INTEGER NOT NULL, user_id VARCHAR, full_name VARCHAR, linkedin_url VARCHAR,
+        headline VARCHAR, profile_summary VARCHAR, first_seen_at DATETIME,
+        PRIMARY KEY (id), CONSTRAINT uq_linkedin_user UNIQUE (linkedin_url, user_id))""",
+]
+
+
+def test_migrations_upgrade_legacy_database(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        for ddl in LEGACY_DDL:
+            conn.exec_driver_sql(ddl)
+        conn.exec_driver_sql("INSERT INTO daily_queue (linkedin_url, user_id, sent) VALUES ('u1', 'a', 0)")
+        conn.exec_driver_sql("INSERT INTO outbox (day, user_id) VALUES ('2025-01-01', 'a'), ('2025-01-01', 'a')")
+        conn.exec_driver_sql("INSERT INTO contacts (user_id, linkedin_url, profile_summary) VALUES ('a', 'u1', 'hello')")
+
+    assert run_migrations(engine) == MIGRATIONS[-1][0]
+
+    with engine.begin() as conn:
+        indexes = _index_columns(conn, "daily_queue")
+        assert indexes["ix_daily_queue_user_sent_added"] == (False, ["user_id", "sent", "added_at"])
+        assert indexes["uq_daily_queue_user_linkedin"] == (True, ["user_id", "linkedin_url"])
+        # Same URL is fine for another user now
+        conn.exec_driver_sql("INSERT INTO daily_queue (linkedin_url, user_id, sent) VALUES ('u1', 'b', 0)")
+        assert conn.execute(text("SELECT COUNT(*) FROM outbox")).scalar() == 1
+        # The dropped duplicate is kept aside
+        assert conn.execute(text("SELECT id FROM outbox_m002_duplicates")).scalars().all() == [1]
+        blob = conn.execute(text("SELECT profile_summary_z FROM contacts")).scalar()
+        assert decompress_text(blob, {}) == "hello"
+        # Backfilled sync markers: hashed, and checked against Lance once
+        h, pending = conn.execute(text("SELECT content_hash, lance_pending FROM contacts")).one()
+        assert h == contact_content_hash(None, None, "u1", "hello") and pending == 1
+
+    with pytest.raises(IntegrityError):
+        with engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO daily_queue (linkedin_url, user_id, sent) VALUES ('u1', 'a', 0)")
+
+    # Re-running is a no-op
+    assert run_migrations(engine) == schema_version(engine)
+
+
+def test_migrations_are_noops_on_fresh_schema(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+
+    with engine.connect() as conn:
+        uniques = [cols for unique, cols in _index_columns(conn, "daily_queue").values() if unique]
+    assert uniques == [["user_id", "linkedin_url"]]
+
+
+def test_archive_tables_get_surrogate_keys(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'archive.db'}")
+    with engine.begin() as conn:
+        # daily_queue_archive as first shipped: the hot row's id was the key
+        conn.exec_driver_sql("""CREATE TABLE daily_queue_archive (
+            id INTEGER NOT NULL, linkedin_url VARCHAR(500), full_name VARCHAR(255),
+            headline VARCHAR(700), reason TEXT, drafted_dm TEXT, drafted_email TEXT,
+            email_subject TEXT, added_at DATETIME, sent BOOLEAN, user_id VARCHAR,
+            archived_at DATETIME, PRIMARY KEY (id))""")
+        conn.exec_driver_sql("CREATE INDEX ix_daily_queue_archive_user_added ON daily_queue_archive (user_id, added_at)")
+        conn.exec_driver_sql("INSERT INTO daily_queue_archive (id, user_id, full_name) VALUES (7, 'a', 'Old')")
+        conn.exec_driver_sql("PRAGMA user_version = 5")
+
+    run_migrations(engine)
+
+    with engine.begin() as conn:
+        rows = conn.exec_driver_sql("SELECT source_id, full_name FROM daily_queue_archive").fetchall()
+        assert rows == [(7, "Old")]
+        # A second archived row with the same hot id no longer collides
+        conn.exec_driver_sql("INSERT INTO daily_queue_archive (source_id, user_id) VALUES (7, 'a')")
+        assert "ix_daily_queue_archive_user_added" in _index_columns(conn, "daily_queue_archive")
+
+
+def test_failed_step_rolls_back_its_ddl(tmp_path, monkeypatch):
+    import logic.migrations as migrations
+
+    engine = make_engine(f"sqlite:///{tmp_path / 'failed.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (a INTEGER)")
+
+    def half_done(conn):
+        conn.exec_driver_sql("CREATE INDEX ix_t_a ON t (a)")
+        raise RuntimeError("step failed")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", [(1, half_done)])
+    with pytest.raises(RuntimeError):
+        run_migrations(engine)
+
+    with engine.connect() as conn:
+        assert _index_columns(conn, "t") == {}
+    assert schema_version(engine) == 0
+
+
+def test_summary_column_kept_when_compression_does_not_round_trip(tmp_path, monkeypatch):
+    import logic.summary_codec as summary_codec
+
+    engine = make_engine(f"sqlite:///{tmp_path / 'lossy.db'}")
+    with engine.begin() as conn:
+        for ddl in LEGACY_DDL:
+            conn.exec_driver_sql(ddl)
+        conn.exec_driver_sql("INSERT INTO contacts (user_id, linkedin_url, profile_summary) VALUES ('a', 'u1', 'hello')")
+
+    monkeypatch.setattr(summary_codec, "decompress_text", lambda blob, dicts: "garbled")
+    with pytest.raises(RuntimeError):
+        run_migrations(engine)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT profile_summary FROM contacts")).scalar() == "hello"
+    assert schema_version(engine) == 3
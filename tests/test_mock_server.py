@@ -0,0 +1,78 @@
+
+import numpy as np
+import pytest
+from exa_py import Exa
+from openai import OpenAI
+
+from logic.hash_embeddings import hash_embed
+from mock_server import start_server
+
+
+@pytest.fixture(scope="module")
+def mock_url():
+    server, url = start_server(profile="instant")
+    yield url
+    server.shutdown()
+
+
+def test_embeddings_are_deterministic_and_similarity_preserving(mock_url):
+    client = OpenAI(api_key="x", base_url=f"{mock_url}/v1")
+    texts = ["fintech product manager", "fintech product manager", "pastry chef in paris"]
+    resp = client.embeddings.create(model="text-embedding-3-small", input=texts)
+    vecs = np.array([e.embedding for e in resp.data], dtype=np.float32)
+
+    assert vecs.shape == (3, 1536)
+    assert np.allclose(vecs[0], vecs[1])
+    assert np.allclose(vecs[0], hash_embed(texts[:1], 1536)[0], atol=1e-6)
+    query = hash_embed(["product manager"], 1536)[0]
+    close = query @ vecs[0]
+    far = query @ vecs[2]
+    assert close > far
+
+
+def test_full_pipeline_runs_offline(mock_url, tmp_path, monkeypatch):
+    import logic.db_ops as db_ops
+    import logic.email_ops as email_ops
+    import logic.embeddings as embeddings
+    import logic.endpoints as endpoints
+    import logic.exa_search as exa_search
+    import logic.llm_ops as llm_ops
+    from logic.db_models import session_scope, Contact
+    from logic.embedding_cache import EmbeddingCache, QueryCache
+
+    user_id = "test_mock_pipeline_user"
+    openai_client = OpenAI(api_key="x", base_url=f"{mock_url}/v1")
+    monkeypatch.setattr(embeddings, "client", openai_client)
+    monkeypatch.setattr(embeddings, "embedding_cache", EmbeddingCache(path=str(tmp_path / "cache.db")))
+    monkeypatch.setattr(embeddings, "query_cache", QueryCache())
+    monkeypatch.setattr(embeddings, "DB_DIR", str(tmp_path / "lance"))
+    monkeypatch.setattr(llm_ops, "client", openai_client)
+    monkeypatch.setattr(exa_search, "exa", Exa("x", base_url=mock_url))
+    monkeypatch.setattr(endpoints, "MOCK_URL", mock_url)
+    monkeypatch.setattr(endpoints, "GMAIL_API_BASE", mock_url)
+    monkeypatch.setenv("GMAIL_TOKEN", endpoints.MOCK_SECRET)
+
+    with session_scope() as s:
+        s.query(Contact).filter(Contact.user_id == user_id).delete()
+    try:
+        profiles = exa_search.run_exa("fintech product manager")
+        assert len(profiles) == 10 and all(p["summary"] for p in profiles)
+
+        new_ids = db_ops.bulk_insert_contacts(profiles, user_id=user_id)
+        assert db_ops.ingest_lancedb(user_id=user_id)["added"] == len(new_ids) == 10
+
+        df = db_ops.search_lancedb("fintech product manager", user_id=user_id, n=3)
+        assert len(df) == 3
+        meta = df.iloc[0]["meta"]
+        candidate = {"name": meta["name"], "headline": meta["headline"], "linkedin": meta["linkedin"]}
+
+        drafts = llm_ops.draft_outreach("networking outreach", candidate)
+        assert drafts["drafted_dm"] and len(drafts["reason"]) == 3
+        streamed = list(llm_ops.draft_outreach_stream("networking outreach", candidate))
+        assert streamed[-1] == drafts
+
+        result = email_ops.gmail_send_email("someone@example.com", drafts["email_subject"], drafts["email_body"])
+        assert result["labelIds"] == ["SENT"]
+    finally:
+        with session_scope() as s:
+            s.query(Contact).filter(Contact.user_id == user_id).delete()
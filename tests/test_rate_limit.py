@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+import logic.rate_limit as rate_limit
+from logic.rate_limit import TokenBucket, RateLimiter, INTERACTIVE, BACKGROUND
+
+
+class ApiError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_token_bucket_refills_at_rate():
+    now = [0.0]
+    bucket = TokenBucket(60, clock=lambda: now[0])     # 1 per second
+    assert bucket.wait_time(60) == 0
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    now[0] += 0.5
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+    now[0] += 120
+    assert bucket.wait_time(60) == 0                    # capped at one minute's worth
+    assert bucket.wait_time(1000) == 0                  # oversized → one full bucket
+
+
+def test_interactive_calls_jump_the_queue():
+    limiter = RateLimiter("test", rpm=120)              # one request every 0.5 s
+    limiter.requests.drain()
+    order = []
+
+    def worker(priority, label):
+        limiter.acquire(priority=priority)
+        order.append(label)
+
+    bg = threading.Thread(target=worker, args=(BACKGROUND, "background"))
+    bg.start()
+    time.sleep(0.05)
+    fg = threading.Thread(target=worker, args=(INTERACTIVE, "interactive"))
+    fg.start()
+    bg.join()
+    fg.join()
+
+    assert order == ["interactive", "background"]
+    stats = limiter.stats()
+    assert stats["max_queue_depth"] == 2 and stats["queue_depth"] == 0
+    assert stats["calls"] == {"interactive": 1, "batch": 0, "background": 1}
+
+
+def test_call_retries_transient_errors_only(monkeypatch):
+    monkeypatch.setattr(rate_limit.time, "sleep", lambda s: None)
+    monkeypatch.setattr(rate_limit, "_limiters", {})
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ApiError(429)
+        return "ok"
+
+    assert rate_limit.call("openai", flaky, retries=5) == "ok"
+    stats = rate_limit.metrics()["openai"]
+    assert stats["retries"] == 2 and stats["throttled"] == 2
+
+    def unauthorized():
+        attempts.append(1)
+        raise ApiError(401)
+
+    attempts.clear()
+    with pytest.raises(ApiError):
+        rate_limit.call("openai", unauthorized, retries=5)
+    assert len(attempts) == 1
+    assert rate_limit.metrics()["openai"]["errors"] == 1
+
+
+def test_backoff_delay_is_jittered_and_honours_retry_after():
+    delays = {rate_limit.backoff_delay(3) for _ in range(20)}
+    assert len(delays) > 1
+    assert all(0 <= d <= rate_limit.BACKOFF_BASE * 8 for d in delays)
+    assert rate_limit.backoff_delay(0, retry_after=7) == 7
@@ -0,0 +1,214 @@
+import threading
+import time
+
+import pytest
+
+import logic.resilience as resilience
+from logic.resilience import CircuitBreaker, CircuitOpenError
+
+
+class ApiError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(resilience, "_latency", {})
+    monkeypatch.setattr(resilience, "_hedges", {})
+    monkeypatch.setattr(resilience, "_hedge_slots", {})
+    monkeypatch.setitem(resilience.PROVIDER_TIMEOUTS, "test", 2.0)
+
+
+def test_breaker_opens_then_half_opens_after_reset():
+    now = [0.0]
+    breaker = CircuitBreaker("p", failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    now[0] += 10
+    breaker.before_call()                  # the single trial call
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()              # others still fail fast
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_call_times_out_and_trips_breaker(monkeypatch):
+    monkeypatch.setattr(resilience, "BREAKER_FAILURES", 2)
+    slow = lambda: time.sleep(0.5) or "late"
+
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            resilience.call("test", slow, timeout=0.05)
+    with pytest.raises(CircuitOpenError):
+        resilience.call("test", lambda: "fast")
+    assert resilience.stats()["test"]["state"] == "open"
+
+
+def test_deadline_starts_after_rate_limit_wait(monkeypatch):
+    from logic import rate_limit
+
+    limiter = rate_limit.RateLimiter("test", rpm=600)      # one slot every 0.1s
+    limiter.requests.drain()
+    monkeypatch.setitem(rate_limit._limiters, "test", limiter)
+
+    assert resilience.call("test", lambda: "ok", timeout=0.05) == "ok"
+    assert limiter.wait_seconds[rate_limit.BACKGROUND] >= 0.05
+
+
+def test_timed_out_attempt_is_not_retried(monkeypatch):
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.3)
+
+    with pytest.raises(TimeoutError):
+        resilience.call("test", slow, timeout=0.05)
+    assert len(calls) == 1
+
+
+def test_client_errors_do_not_trip_breaker(monkeypatch):
+    monkeypatch.setattr(resilience, "BREAKER_FAILURES", 1)
+
+    def bad_request():
+        raise ApiError(400)
+
+    with pytest.raises(ApiError):
+        resilience.call("test", bad_request)
+    assert resilience.call("test", lambda: "ok") == "ok"
+
+
+def test_client_error_on_half_open_trial_frees_the_trial(monkeypatch):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01)
+    monkeypatch.setitem(resilience._breakers, "test", breaker)
+    breaker.record_failure()
+    time.sleep(0.02)
+
+    def bad_request():
+        raise ApiError(400)
+
+    with pytest.raises(ApiError):
+        resilience.call("test", bad_request)      # the trial, settled by neither outcome
+    assert resilience.call("test", lambda: "ok") == "ok"
+    assert breaker.state == "closed"
+
+
+def test_hedged_call_returns_the_faster_duplicate():
+    latency = resilience.get_latency("test")
+    for _ in range(resilience.HEDGE_MIN_SAMPLES):
+        latency.add(0.01)
+    calls = []
+
+    def first_slow():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(1.0)
+            return "slow"
+        return "hedge"
+
+    start = time.monotonic()
+    assert resilience.call("test", first_slow, hedge=True) == "hedge"
+    assert time.monotonic() - start < 0.9
+    assert resilience.stats()["test"]["hedges"] == 1
+
+
+def test_hedges_stop_once_every_slot_is_taken(monkeypatch):
+    monkeypatch.setattr(resilience, "HEDGE_MAX_INFLIGHT", 1)
+    latency = resilience.get_latency("test")
+    for _ in range(resilience.HEDGE_MIN_SAMPLES):
+        latency.add(0.01)
+    release = threading.Event()
+    calls = []
+
+    def stuck():
+        calls.append(1)
+        release.wait(2)
+        return "late"
+
+    try:
+        # First call: attempt + one hedge, both stuck past the deadline
+        with pytest.raises(TimeoutError):
+            resilience.call("test", stuck, hedge=True, timeout=0.5)
+        assert len(calls) == 2
+        # The stuck hedge still holds the only slot → no second duplicate
+        with pytest.raises(TimeoutError):
+            resilience.call("test", stuck, hedge=True, timeout=0.5)
+        assert len(calls) == 3
+        assert resilience.stats()["test"]["hedges"] == 1
+    finally:
+        release.set()
+
+
+def test_exa_requests_carry_a_socket_timeout(monkeypatch):
+    import exa_py.api
+    import requests
+    import logic.exa_search  # noqa: F401  (installs the timeout wrapper)
+
+    sent = {}
+    monkeypatch.setattr(requests, "request", lambda method, url, **kw: sent.update(kw, method=method))
+    exa_py.api.requests.post("https://exa.invalid/search", data="{}")
+    assert sent["method"] == "POST"
+    assert sent["timeout"] == resilience.PROVIDER_TIMEOUTS["exa"]
+
+
+def test_providers_get_separate_pools():
+    assert resilience.get_pool("test") is resilience.get_pool("test")
+    assert resilience.get_pool("test") is not resilience.get_pool("other")
+
+
+def test_search_falls_back_to_keyword_match(monkeypatch):
+    import logic.db_ops as db_ops
+    from logic.db_models import session_scope, Contact
+
+    user_id = "test_fallback_user"
+
+    def unavailable(query):
+        raise CircuitOpenError("openai circuit is open")
+
+    monkeypatch.setattr(db_ops, "embed_query", unavailable)
+    with session_scope() as s:
+        s.query(Contact).filter(Contact.user_id == user_id).delete()
+    db_ops.insert_contacts(
+        [{"full_name": "Ada Lovelace", "linkedin_url": "https://l/ada"},
+         {"full_name": "Bob", "headline": "Fintech PM", "linkedin_url": "https://l/bob"},
+         {"full_name": "Carol", "headline": "Chef", "linkedin_url": "https://l/carol"}],
+        user_id=user_id,
+    )
+    try:
+        df = db_ops.search_lancedb("fintech ada", user_id=user_id)
+        assert sorted(m["name"] for m in df["meta"]) == ["Ada Lovelace", "Bob"]
+        assert list(df.columns) == db_ops.SEARCH_COLUMNS
+    finally:
+        with session_scope() as s:
+            s.query(Contact).filter(Contact.user_id == user_id).delete()
+
+
+def test_search_survives_failed_stale_resync(monkeypatch):
+    import logic.db_ops as db_ops
+    from logic.db_models import session_scope, Contact
+
+    user_id = "test_resync_fallback_user"
+
+    def unavailable(user_id):
+        raise TimeoutError("openai call exceeded 30s")
+
+    monkeypatch.setattr(db_ops, "embed_query", lambda query: [0.0] * 8)
+    monkeypatch.setattr(db_ops, "ingest_lancedb", unavailable)
+    with session_scope() as s:
+        s.query(Contact).filter(Contact.user_id == user_id).delete()
+    db_ops.insert_contacts([{"full_name": "Dana", "headline": "Fintech PM", "linkedin_url": "https://l/dana"}],
+                           user_id=user_id)
+    try:
+        df = db_ops.search_lancedb("fintech", user_id=user_id)
+        assert [m["name"] for m in df["meta"]] == ["Dana"]
+    finally:
+        with session_scope() as s:
+            s.query(Contact).filter(Contact.user_id == user_id).delete()
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta, timezone
+
+from logic.db_models import session_scope, DailyQueue, Outbox, DailyQueueArchive, OutboxArchive
+from logic.retention import (
+    archive_sent_queue,
+    archive_outbox,
+    fetch_queue_history,
+    fetch_outbox_history,
+)
+
+USER = "retention_test_user"
+
+
+def _cleanup():
+    with session_scope() as s:
+        for model in (DailyQueue, Outbox, DailyQueueArchive, OutboxArchive):
+            s.query(model).filter(model.user_id == USER).delete()
+
+
+def test_archive_moves_only_old_sent_rows_and_history_reads_both():
+    _cleanup()
+    now = datetime.now(timezone.utc)
+    old = now - timedelta(days=40)
+    with session_scope() as s:
+        s.add_all([
+            DailyQueue(user_id=USER, linkedin_url="https://l/old-sent", full_name="Old Sent",
+                       added_at=old, sent=True),
+            DailyQueue(user_id=USER, linkedin_url="https://l/old-unsent", full_name="Old Unsent",
+                       added_at=old, sent=False),
+            DailyQueue(user_id=USER, linkedin_url="https://l/new-sent", full_name="New Sent",
+                       added_at=now, sent=True),
+            Outbox(user_id=USER, day=old.date().isoformat(), full_name="Old Day"),
+            Outbox(user_id=USER, day=now.date().isoformat(), full_name="Today"),
+        ])
+
+    try:
+        assert archive_sent_queue(older_than_days=30, user_id=USER) == 1
+        assert archive_outbox(older_than_days=30, user_id=USER) == 1
+
+        with session_scope() as s:
+            hot = {r.full_name for r in s.query(DailyQueue).filter(DailyQueue.user_id == USER)}
+            cold = {r.full_name for r in s.query(DailyQueueArchive).filter(DailyQueueArchive.user_id == USER)}
+            hot_days = {r.full_name for r in s.query(Outbox).filter(Outbox.user_id == USER)}
+        assert hot == {"Old Unsent", "New Sent"}
+        assert cold == {"Old Sent"}
+        assert hot_days == {"Today"}
+
+        history = fetch_queue_history(USER)
+        assert {r.full_name for r in history} == {"Old Sent", "Old Unsent", "New Sent"}
+        assert [r.full_name for r in fetch_outbox_history(USER)] == ["Today", "Old Day"]
+        assert [r.full_name for r in fetch_outbox_history(USER, end_day=old.date().isoformat())] == ["Old Day"]
+    finally:
+        _cleanup()
+
+
+def test_archiving_again_after_rowids_are_reused():
+    _cleanup()
+    old = datetime.now(timezone.utc) - timedelta(days=40)
+
+    def add_sent(url):
+        with session_scope() as s:
+            row = DailyQueue(user_id=USER, linkedin_url=url, full_name=url, added_at=old, sent=True)
+            s.add(row)
+        return row.id
+
+    try:
+        first_id = add_sent("https://l/first")
+        assert archive_sent_queue(older_than_days=30, user_id=USER) == 1
+        # SQLite hands the freed rowid out again
+        second_id = add_sent("https://l/second")
+        assert archive_sent_queue(older_than_days=30, user_id=USER) == 1
+
+        with session_scope() as s:
+            archived = s.query(DailyQueueArchive).filter(DailyQueueArchive.user_id == USER).all()
+        assert sorted((r.source_id, r.full_name) for r in archived) == sorted(
+            [(first_id, "https://l/first"), (second_id, "https://l/second")]
+        )
+    finally:
+        _cleanup()
@@ -0,0 +1,63 @@
+import random
+
+import logic.summary_codec as summary_codec
+from logic.summary_codec import compress_text, decompress_text, frame_dict_id, train_dictionary
+
+
+def _summaries(n):
+    rng = random.Random(0)
+    roles = ["Product Manager", "Software Engineer", "Data Scientist", "Designer"]
+    cities = ["New York", "San Francisco", "London", "Berlin"]
+    return [
+        f"{rng.choice(roles)} at Company{rng.randint(1, 500)} in {rng.choice(cities)}. "
+        f"Experience: {rng.randint(1, 20)} years building fintech products. "
+        "Education: MBA, Yale School of Management. Skills: roadmapping, SQL, "
+        f"stakeholder management, A/B testing. Contact id {i}."
+        for i in range(n)
+    ]
+
+
+def test_roundtrip_without_dictionary():
+    assert compress_text("") is None
+    assert decompress_text(None, {}) == ""
+    blob = compress_text("héllo " * 50)
+    assert frame_dict_id(blob) == 0
+    assert decompress_text(blob, {}) == "héllo " * 50
+
+
+def test_dictionary_shrinks_short_summaries(monkeypatch):
+    monkeypatch.setattr(summary_codec, "DICT_MIN_SAMPLES", 100)
+    texts = _summaries(400)
+    assert train_dictionary(texts[:10]) is None
+
+    zdict = train_dictionary(texts[:300])
+    held_out = texts[300:]
+    plain = sum(len(compress_text(t)) for t in held_out)
+    with_dict = sum(len(compress_text(t, zdict)) for t in held_out)
+    assert with_dict * 2 < plain
+
+    blob = compress_text(held_out[0], zdict)
+    assert frame_dict_id(blob) == zdict.dict_id()
+    assert decompress_text(blob, {zdict.dict_id(): zdict}) == held_out[0]
+
+
+def test_contact_summary_is_stored_compressed():
+    from logic.db_models import session_scope, Contact
+    from logic.db_ops import bulk_insert_contacts, get_contact_summaries
+
+    user_id = "test_summary_user"
+    text = "Long profile text. " * 200
+    with session_scope() as s:
+        s.query(Contact).filter(Contact.user_id == user_id).delete()
+
+    [cid] = bulk_insert_contacts([{"linkedin_url": "https://l/summary", "text": text}], user_id=user_id)
+    try:
+        with session_scope() as s:
+            row = s.get(Contact, cid)
+        assert len(row.profile_summary_z) * 10 < len(text)
+        assert row.profile_summary == text
+        assert get_contact_summaries([str(cid)], user_id) == {str(cid): text}
+        assert get_contact_summaries([str(cid)], "someone_else") == {}
+    finally:
+        with session_scope() as s:
+            s.query(Contact).filter(Contact.user_id == user_id).delete()
@@ -0,0 +1,97 @@
+import json
+import threading
+
+import logic.telemetry as telemetry
+
+
+def test_spans_nest_into_one_trace_with_waterfall_offsets():
+    @telemetry.traced
+    def inner():
+        with telemetry.span("inner.step", rows=3):
+            pass
+
+    with telemetry.span("test.request") as root:
+        inner()
+        inner()
+
+    trace = telemetry.get_trace(root.trace.id)
+    names = [(s["depth"], s["name"]) for s in trace["spans"]]
+    assert names == [
+        (0, "test.request"),
+        (1, "test_telemetry.inner"), (2, "inner.step"),
+        (1, "test_telemetry.inner"), (2, "inner.step"),
+    ]
+    starts = [s["start_ms"] for s in trace["spans"]]
+    assert starts == sorted(starts) and starts[0] == 0
+    assert trace["spans"][2]["attrs"] == {"rows": 3}
+    assert telemetry.last_trace("test.request")["trace_id"] == root.trace.id
+
+
+def test_generator_span_covers_iteration_but_not_the_consumer():
+    @telemetry.traced
+    def numbers():
+        yield 1
+        yield 2
+
+    with telemetry.span("test.stream") as root:
+        for _ in numbers():
+            with telemetry.span("consumer.step"):
+                pass
+
+    spans = {s["name"]: s for s in telemetry.get_trace(root.trace.id)["spans"]}
+    assert spans["test_telemetry.numbers"]["depth"] == 1
+    assert spans["consumer.step"]["parent_id"] == spans["test.stream"]["span_id"]
+
+
+def test_propagate_carries_the_span_into_worker_threads():
+    seen = []
+    with telemetry.span("test.parent") as root:
+        worker = telemetry.propagate(lambda: seen.append(telemetry.current_trace_id()))
+        t = threading.Thread(target=worker)
+        t.start()
+        t.join()
+    assert seen == [root.trace.id]
+
+
+def test_errors_counters_and_prometheus_export():
+    try:
+        with telemetry.span("test.failing"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    telemetry.incr("cache_hits_total", 2, cache="test")
+
+    text = telemetry.prometheus_text()
+    assert 'agent_carter_span_seconds_count{span="test.failing"} ' in text
+    assert 'agent_carter_span_errors_total{error="ValueError",span="test.failing"}' in text
+    assert 'agent_carter_cache_hits_total{cache="test"}' in text
+    assert telemetry.last_trace("test.failing")["spans"][0]["error"] == "ValueError"
+
+
+def test_json_logs_and_jsonl_trace_export(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(telemetry, "TELEMETRY_JSONL", str(path))
+
+    with telemetry.span("test.logged") as root:
+        telemetry.log("test.event", rows=5)
+
+    record = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert record["event"] == "test.event" and record["rows"] == 5
+    assert record["trace_id"] == root.trace.id
+    exported = json.loads(path.read_text().splitlines()[-1])
+    assert exported["name"] == "test.logged" and exported["spans"][0]["name"] == "test.logged"
+
+
+def test_recent_traces_filter_by_session():
+    with telemetry.span("test.session_request", session_id="session-a") as a:
+        with telemetry.span("test.child"):
+            pass
+    with telemetry.span("test.session_request", session_id="session-b"):
+        pass
+    with telemetry.span("test.session_request"):
+        pass
+
+    mine = telemetry.recent_traces(session_id="session-a")
+    assert [t["trace_id"] for t in mine] == [a.trace.id]
+    assert mine[0]["session_id"] == "session-a"
+    assert telemetry.recent_traces(session_id="session-unknown") == []
@@ -0,0 +1,69 @@
+import numpy as np
+import pyarrow as pa
+import lancedb
+
+from logic.db_models import SessionLocal, VectorIndexState
+from logic.vector_index import index_params, needs_index, ensure_vector_index, request_index, wait_for_index_builds
+
+
+def test_index_params_scale_with_rows_and_dim():
+    assert index_params(10_000, 1536) == (100, 96)
+    assert index_params(1_000_000, 384) == (1000, 24)
+    assert index_params(50_000_000, 1536)[0] == 4096
+
+
+def test_needs_index_thresholds():
+    assert not needs_index(100, 0, min_rows=500)
+    assert needs_index(500, 0, min_rows=500)
+    assert not needs_index(1100, 1000, min_rows=500)   # < 20% growth
+    assert needs_index(1200, 1000, min_rows=500)
+
+
+def test_ensure_vector_index_builds_once(tmp_path):
+    dim, n = 32, 300
+    db = lancedb.connect(str(tmp_path))
+    vecs = np.random.default_rng(0).random((n, dim), dtype=np.float32)
+    tbl = db.create_table(
+        "idx_test_contacts",
+        data=pa.table({
+            "id": pa.array([str(i) for i in range(n)]),
+            "vector": pa.FixedSizeListArray.from_arrays(pa.array(vecs.ravel()), dim),
+        }),
+    )
+
+    try:
+        assert ensure_vector_index(tbl, min_rows=256) is True
+        assert ensure_vector_index(tbl, min_rows=256) is False
+        assert len(tbl.list_indices()) == 1
+    finally:
+        s = SessionLocal()
+        s.query(VectorIndexState).filter(VectorIndexState.table_name == "idx_test_contacts").delete()
+        s.commit()
+        s.close()
+
+
+def test_request_index_builds_in_the_background(tmp_path):
+    dim, n = 32, 300
+    db = lancedb.connect(str(tmp_path))
+    vecs = np.random.default_rng(1).random((n, dim), dtype=np.float32)
+    tbl = db.create_table(
+        "idx_bg_contacts",
+        data=pa.table({
+            "id": pa.array([str(i) for i in range(n)]),
+            "vector": pa.FixedSizeListArray.from_arrays(pa.array(vecs.ravel()), dim),
+        }),
+    )
+
+    try:
+        assert request_index(tbl, min_rows=1000) is False      # below the threshold
+        assert request_index(tbl, min_rows=256) is True
+        # The caller is not held up: searches run (flat) while it builds
+        assert len(tbl.search(vecs[0]).limit(3).to_list()) == 3
+        wait_for_index_builds(timeout=60)
+        assert len(tbl.list_indices()) == 1
+        assert request_index(tbl, min_rows=256) is False       # already built
+    finally:
+        s = SessionLocal()
+        s.query(VectorIndexState).filter(VectorIndexState.table_name == "idx_bg_contacts").delete()
+        s.commit()
+        s.close()